@@ -25,8 +25,16 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 # ----------------------------------------------------------------------------------
 
-from hdf5_converter import app
+from multiprocessing import freeze_support
 
 
 if __name__ == "__main__":
+    # Required by the encoder worker processes in the frozen application
+    freeze_support()
+
+    # The worker processes import this file too, so the GUI is only imported and built here
+    from hdf5_converter.controller import MainController
+
+    # Application controller
+    app = MainController()
     app.run()
@@ -38,11 +38,12 @@ a = Analysis(
     pathex=[os.getcwd()],
     binaries=[],
     datas=[],
-    hiddenimports=collect_submodules("fabio"),
+    # fabio is imported on demand, its command line applications are left out since they bring in scipy
+    hiddenimports=collect_submodules("fabio", filter=lambda name: not name.startswith("fabio.app")),
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=["scipy"],
     noarchive=False,
     optimize=0,
 )
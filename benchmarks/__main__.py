@@ -0,0 +1,238 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: benchmarks/__main__.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This file runs the benchmark suite: it writes the fixtures, measures every
+# case in a process of its own and saves the results as JSON, which can then be
+# compared with the results of another version. It also measures the start of the
+# application.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from benchmarks.fixtures import FIXTURES, make_fixture
+from benchmarks.runner import ENGINES
+from benchmarks.startup import CASES, DEFAULT_BUDGET, measure, problems
+from hdf5_converter.model.format_registry_model import FORMATS
+from hdf5_converter.model.frame_encoder_model import default_workers
+
+
+# Exit status codes
+EXIT_SUCCESS = 0
+EXIT_REGRESSION = 1
+
+# The slowdown reported as a regression by default, in percent
+DEFAULT_THRESHOLD = 10.0
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    """Creates the argument parser of the benchmark suite."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Measures the conversion performance on synthetic HDF5 detector files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the benchmarks and write their results")
+    run.add_argument("-o", "--output", default="benchmark_results.json", help="JSON file of the results (default: %(default)s)")
+    run.add_argument("--fixtures", default=",".join(FIXTURES), help="comma separated fixtures (default: all)")
+    run.add_argument("--formats", default=",".join(FORMATS.names()), help="comma separated output formats (default: all)")
+    run.add_argument("--workers", default=f"1,{default_workers()}", help="comma separated worker counts (default: %(default)s)")
+    run.add_argument("--engines", default="convert", help=f"comma separated engines, of {', '.join(ENGINES)} (default: %(default)s)")
+    run.add_argument("--scale", type=float, default=1.0, help="multiply the frames of every fixture, e.g. 0.1 for a quick run (default: %(default)s)")
+    run.add_argument("--data-dir", help="directory keeping the fixtures between runs (default: a temporary directory)")
+    run.add_argument("--repeat", type=int, default=1, help="runs of every case, the fastest is kept (default: %(default)s)")
+
+    startup = commands.add_parser("startup", help="measure the start of the package, the command line and the GUI")
+    startup.add_argument("-o", "--output", default="startup_results.json", help="JSON file of the results (default: %(default)s)")
+    startup.add_argument("--cases", default=",".join(CASES), help="comma separated cases (default: all)")
+    startup.add_argument("--repeat", type=int, default=5, help="starts of every case, the fastest is kept (default: %(default)s)")
+    startup.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="seconds any case may take to start (default: %(default)s)")
+
+    compare = commands.add_parser("compare", help="compare the results of two runs")
+    compare.add_argument("baseline", help="results of the reference version")
+    compare.add_argument("candidate", help="results of the version to check")
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="slowdown reported as a regression, in percent (default: %(default)s)")
+    return parser
+
+
+def _metadata() -> dict:
+    """Returns the versions and the machine the benchmarks run on."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=Path(__file__).parent).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or None,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "h5py": h5py.__version__,
+        "hdf5": h5py.version.hdf5_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _run_case(case: dict) -> dict:
+    """Measures a case in a new process and returns its result."""
+    process = subprocess.run([sys.executable, "-m", "benchmarks.runner", json.dumps(case)], capture_output=True, text=True, cwd=Path(__file__).parent.parent)
+    if process.returncode != 0:
+        return {"error": process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"exit status {process.returncode}"}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def run(args: argparse.Namespace) -> int:
+    """Runs the benchmark cases and writes their results."""
+    names = [name for name in args.fixtures.split(",") if name]
+    unknown = [name for name in names if name not in FIXTURES]
+    if unknown:
+        raise SystemExit(f"Unknown fixtures: {', '.join(unknown)}, expected some of {', '.join(FIXTURES)}")
+    formats = [FORMATS.get(name).name for name in args.formats.split(",") if name]
+    workers = [int(count) for count in args.workers.split(",") if count]
+    engines = [engine for engine in args.engines.split(",") if engine]
+
+    with tempfile.TemporaryDirectory(prefix="hdf5converter-benchmarks-") as temp_dir:
+        data_dir = Path(args.data_dir or temp_dir)
+        data_dir.mkdir(parents=True, exist_ok=True)
+        results = []
+
+        for name in names:
+            spec = FIXTURES[name].scaled(args.scale)
+            if not spec.available:
+                print(f"{name}: skipped, the {spec.compression} filter needs hdf5plugin", file=sys.stderr)
+                continue
+            fixture, dataset = make_fixture(spec, data_dir)
+
+            for output_type in formats:
+                if not FORMATS.get(output_type).supports(np.dtype(spec.dtype)):
+                    continue
+                for engine in engines:
+                    for count in workers:
+                        case = {"fixture": str(fixture), "dataset": dataset, "output_type": output_type, "workers": count, "engine": engine}
+                        case["work_dir"] = str(Path(temp_dir) / "work")
+
+                        # The fastest run is kept, the others mostly measure the noise of the machine
+                        runs = [_run_case(case) for _ in range(max(1, args.repeat))]
+                        result = min(runs, key=lambda run: run.get("seconds", float("inf")))
+                        result.update({"fixture": name, "format": output_type, "workers": count, "engine": engine, "shape": list(spec.shape)})
+                        results.append(result)
+                        print(_format_result(result), file=sys.stderr)
+
+    Path(args.output).write_text(json.dumps({"metadata": _metadata(), "results": results}, indent=2))
+    print(f"Results written to {args.output}", file=sys.stderr)
+    return EXIT_SUCCESS
+
+
+def startup(args: argparse.Namespace) -> int:
+    """Measures the start of every case and writes the results, and returns a failure status if any is too slow or loads the slow modules."""
+    cases = [case for case in args.cases.split(",") if case]
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        raise SystemExit(f"Unknown cases: {', '.join(unknown)}, expected some of {', '.join(CASES)}")
+
+    results = []
+    failures = 0
+    for case in cases:
+        result = measure(case, args.repeat)
+        found = problems(result, args.budget)
+        failures += bool(found)
+        results.append(result)
+        timing = f"{result['seconds']:6.3f}s" if "seconds" in result else "failed"
+        print(f"{case:<20} {timing}{'  ' + '; '.join(found) if found else ''}", file=sys.stderr)
+
+    Path(args.output).write_text(json.dumps({"metadata": _metadata(), "startup": results}, indent=2))
+    print(f"Results written to {args.output}", file=sys.stderr)
+    return EXIT_REGRESSION if failures else EXIT_SUCCESS
+
+
+def _case_name(fixture: str, output_type: str, engine: str, workers: int) -> str:
+    """Returns the name of a case, aligned in columns."""
+    return f"{fixture:<20} {output_type:<10} {engine:<8} {workers:>2} worker(s)"
+
+
+def _format_result(result: dict) -> str:
+    """Returns a result as a line of text."""
+    case = _case_name(result["fixture"], result["format"], result["engine"], result["workers"])
+    if "error" in result:
+        return f"{case}  error: {result['error']}"
+    stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["stages"].items() if seconds is not None)
+    rss = "" if result["peak_rss_mb"] is None else f", {result['peak_rss_mb']:.0f} MB peak"
+    return f"{case}  {result['frames_per_second']:8.1f} frames/s {result['mb_per_second']:8.1f} MB/s{rss} ({stages})"
+
+
+def compare(args: argparse.Namespace) -> int:
+    """Prints the change of throughput of every case run by both versions, and returns a failure status if any slowed down beyond the threshold."""
+
+    def load(file_name: str) -> tuple[dict, dict]:
+        content = json.loads(Path(file_name).read_text())
+        results = content.get("results", [])
+        starts = content.get("startup", [])
+        return (
+            {(result["fixture"], result["format"], result["engine"], result["workers"]): result for result in results if "error" not in result},
+            {result["case"]: result for result in starts if "error" not in result},
+        )
+
+    (baseline, baseline_starts), (candidate, candidate_starts) = load(args.baseline), load(args.candidate)
+    regressions = 0
+    for key in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[key]["mb_per_second"], candidate[key]["mb_per_second"]
+        change = (after - before) / before * 100
+        regression = change < -args.threshold
+        regressions += regression
+        flag = "  REGRESSION" if regression else ""
+        print(f"{_case_name(*key)}  {before:8.1f} -> {after:8.1f} MB/s  {change:+6.1f}%{flag}")
+
+    for key in sorted(baseline.keys() ^ candidate.keys()):
+        print(f"{_case_name(*key)}  only in {'the baseline' if key in baseline else 'the candidate'}")
+
+    # The start of the application regresses when it takes longer, unlike the throughput
+    for case in sorted(baseline_starts.keys() & candidate_starts.keys()):
+        before, after = baseline_starts[case]["seconds"], candidate_starts[case]["seconds"]
+        change = (after - before) / before * 100
+        regression = change > args.threshold
+        regressions += regression
+        flag = "  REGRESSION" if regression else ""
+        print(f"{'startup ' + case:<55}  {before:8.3f} -> {after:8.3f} s     {change:+6.1f}%{flag}")
+
+    print(f"{regressions} regression(s) beyond {args.threshold:.0f}%")
+    return EXIT_REGRESSION if regressions else EXIT_SUCCESS
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Runs the benchmark suite and returns the exit status."""
+    args = _create_parser().parse_args(argv)
+    commands = {"run": run, "startup": startup, "compare": compare}
+    return commands[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: benchmarks/fixtures.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This file contains the synthetic HDF5 detector files used by the benchmarks:
+# stacks and single frames of several shapes, data types, chunk layouts and
+# filters, with the NeXus style groups written by the detectors.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+# The detector filters are optional, the fixtures that need them are skipped when they are missing
+try:
+    import hdf5plugin
+except ImportError:
+    hdf5plugin = None
+
+
+# The filters a fixture can be compressed with
+COMPRESSIONS = ("none", "gzip", "lz4", "bslz4")
+
+
+@dataclass(frozen=True)
+class FixtureSpec:
+    """The layout of a synthetic HDF5 detector file."""
+
+    name: str
+    frames: int
+    rows: int
+    columns: int
+    dtype: str
+    # The frames per chunk, None for a contiguous dataset
+    chunk_frames: int | None = 1
+    compression: str = "none"
+    # Whether the frames are in the groups written by the detectors instead of at the root
+    nexus: bool = True
+    # Whether the frames have the gap between the modules of an Eiger detector
+    gaps: bool = False
+
+    @property
+    def is_single_frame(self) -> bool:
+        """Returns True if the file holds a single frame."""
+        return self.frames == 1
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        """Returns the shape of the dataset."""
+        return (self.rows, self.columns) if self.is_single_frame else (self.frames, self.rows, self.columns)
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the size of the frames in bytes."""
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+    @property
+    def available(self) -> bool:
+        """Returns True if the filter of the fixture can be written."""
+        return self.compression in ("none", "gzip") or hdf5plugin is not None
+
+    def scaled(self, scale: float) -> "FixtureSpec":
+        """Returns the same fixture with scale times as many frames."""
+        if self.is_single_frame:
+            return self
+        frames = max(2, int(self.frames * scale))
+        return FixtureSpec(self.name, frames, self.rows, self.columns, self.dtype, self.chunk_frames, self.compression, self.nexus, self.gaps)
+
+
+# The fixtures of the suite, from the detectors of the beamlines
+FIXTURES = {
+    spec.name: spec
+    for spec in (
+        FixtureSpec("eiger-bslz4", 200, 514, 1030, "uint32", compression="bslz4", gaps=True),
+        FixtureSpec("eiger-lz4", 200, 514, 1030, "uint16", compression="lz4", gaps=True),
+        FixtureSpec("pilatus-gzip", 100, 619, 487, "int32", compression="gzip", nexus=False),
+        FixtureSpec("raw-contiguous", 100, 512, 512, "uint16", chunk_frames=None, nexus=False),
+        FixtureSpec("multi-frame-chunks", 256, 256, 256, "uint16", chunk_frames=16, compression="gzip"),
+        FixtureSpec("float32-gzip", 50, 512, 512, "float32", compression="gzip"),
+        FixtureSpec("single-frame", 1, 2048, 2048, "uint16", chunk_frames=None, nexus=False),
+    )
+}
+
+
+def detector_frames(spec: FixtureSpec, first: int, count: int) -> np.ndarray:
+    """Returns count frames of the fixture, a low background with a few bright spots and the module gaps of an Eiger detector."""
+    rng = np.random.default_rng(first)
+    dtype = np.dtype(spec.dtype)
+    frames = rng.poisson(2.0, (count, spec.rows, spec.columns)).astype(dtype)
+
+    # Bright spots compress like the diffraction peaks of real frames
+    spots = rng.integers(0, [count, spec.rows, spec.columns], size=(count * 20, 3))
+    frames[spots[:, 0], spots[:, 1], spots[:, 2]] = rng.integers(100, 10000, len(spots)).astype(dtype)
+
+    # Eiger detectors mark the pixels between their chips with the largest value of the data type
+    if spec.gaps and dtype.kind in "ui":
+        middle = spec.columns // 2
+        frames[..., slice(middle - 1, middle + 1)] = np.iinfo(dtype).max
+    return frames
+
+
+def make_fixture(spec: FixtureSpec, directory: Path) -> tuple[Path, str]:
+    """Writes the fixture to the directory, unless it is already there, and returns the file and the path of its dataset."""
+    file_name = Path(directory) / f"{spec.name}.h5"
+    dataset = "entry/data/data" if spec.nexus else "data"
+    if file_name.exists():
+        return file_name, dataset
+
+    if spec.compression == "gzip":
+        filters = {"compression": "gzip", "compression_opts": 4}
+    elif spec.compression == "lz4":
+        filters = dict(hdf5plugin.LZ4())
+    elif spec.compression == "bslz4":
+        filters = dict(hdf5plugin.Bitshuffle(cname="lz4"))
+    else:
+        filters = {}
+
+    chunks = None
+    if spec.chunk_frames is not None:
+        chunks = (spec.rows, spec.columns) if spec.is_single_frame else (min(spec.chunk_frames, spec.frames), spec.rows, spec.columns)
+
+    # Written under a temporary name, so that an interrupted run never leaves a partial fixture behind
+    partial_file = file_name.with_suffix(".part")
+    with h5py.File(partial_file, "w") as file:
+        if spec.nexus:
+            entry = file.create_group("entry")
+            entry.attrs["NX_class"] = "NXentry"
+            detector = entry.create_group("instrument/detector")
+            detector.attrs["NX_class"] = "NXdetector"
+            detector["x_pixel_size"] = 75e-6
+            detector["y_pixel_size"] = 75e-6
+            entry.create_group("data").attrs["NX_class"] = "NXdata"
+
+        node = file.create_dataset(dataset, shape=spec.shape, dtype=spec.dtype, chunks=chunks, **filters)
+        if spec.is_single_frame:
+            node[...] = detector_frames(spec, 0, 1)[0]
+        else:
+            # Written a few frames at a time, so that large fixtures never have to fit in memory
+            step = spec.chunk_frames or 16
+            for first in range(0, spec.frames, step):
+                count = min(step, spec.frames - first)
+                node[slice(first, first + count)] = detector_frames(spec, first, count)
+
+    partial_file.rename(file_name)
+    return file_name, dataset
@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: benchmarks/runner.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This file measures a single benchmark case: the time spent indexing, reading,
+# encoding and converting a fixture, its throughput and the peak memory used.
+# Every case runs in its own process, so that it starts with an empty heap.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import h5py
+
+from hdf5_converter.api import ProfilerModel, convert
+from hdf5_converter.model.chunk_reader_model import ChunkReaderModel
+from hdf5_converter.model.converter_model import ConverterModel
+from hdf5_converter.model.dataset_index_model import DatasetIndexModel
+from hdf5_converter.model.format_registry_model import FORMATS
+from hdf5_converter.model.frame_encoder_model import encode_frame
+from hdf5_converter.model.frame_stream_model import DEFAULT_MEMORY_BUDGET, FrameStreamModel
+
+# The peak memory is only available where the resource module is
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# The engines a case can convert with: the scheduled work units or the legacy per file path
+ENGINES = ("convert", "process")
+
+
+def peak_rss_mb() -> float | None:
+    """Returns the peak resident memory of this process and of its largest finished child, in MB."""
+    if resource is None:
+        return None
+    # Linux reports kilobytes, macOS bytes
+    unit = 1 if sys.platform == "darwin" else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * unit / 1024**2
+
+
+def measure(fixture: str, dataset: str, output_type: str, workers: int, engine: str, work_dir: str) -> dict:
+    """Converts the dataset of the fixture in the work directory, and returns the time of every stage and the throughput."""
+    # The outputs are written next to the HDF5 file, so the fixture is linked into a directory of its own
+    work_dir = Path(work_dir)
+    if work_dir.exists():
+        shutil.rmtree(work_dir)
+    work_dir.mkdir(parents=True)
+    file_name = work_dir / Path(fixture).name
+    try:
+        os.link(fixture, file_name)
+    except OSError:
+        shutil.copy(fixture, file_name)
+
+    stages: dict[str, float | None] = {}
+
+    # Index: reading the metadata of the matching datasets
+    start = time.perf_counter()
+    info = next(info for info in DatasetIndexModel(None).datasets(str(file_name), "data") if info.name == dataset)
+    stages["index"] = time.perf_counter() - start
+    frames = 1 if info.is_single_frame else info.frame_count
+    nbytes = frames * info.frame_bytes
+
+    with h5py.File(file_name, "r") as file:
+        node = file[dataset]
+        stream = FrameStreamModel(DEFAULT_MEMORY_BUDGET, ChunkReaderModel())
+
+        # Read: decompressing every frame with the stream used by the converter
+        start = time.perf_counter()
+        if node.ndim == 2:
+            FrameStreamModel.read_frame(node)
+        else:
+            for _ in stream.iter_windows(node):
+                pass
+        stages["read"] = time.perf_counter() - start
+
+        # Encode: the frames encoded in memory, for the formats that write a file per frame
+        stages["encode"] = None
+        output_format = FORMATS.get(output_type)
+        if output_format.encode is not None:
+            start = time.perf_counter()
+            windows = [(0, FrameStreamModel.read_frame(node)[None])] if node.ndim == 2 else stream.iter_windows(node)
+            for _, data in windows:
+                for frame in data:
+                    encode_frame(frame, f"frame.{output_format.extension}", output_type)
+            stages["encode"] = time.perf_counter() - start
+
+    # Convert: the whole conversion, writing included, the scheduled engine also timing its own stages
+    profiler = ProfilerModel(max_events=0) if engine == "convert" else None
+    start = time.perf_counter()
+    if engine == "convert":
+        errors = convert([str(file_name)], "data", output_type, 3, workers=workers, index_cache=False, profiler=profiler)
+    else:
+        errors = []
+        converter = ConverterModel(workers=workers)
+        converter.new_status.connect(lambda: errors.append(converter.status_message))
+        converter.process(str(file_name), "data", output_type, 3)
+        converter.shutdown()
+    seconds = time.perf_counter() - start
+    stages["convert"] = seconds
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "frames": frames,
+        "bytes": nbytes,
+        "seconds": seconds,
+        "frames_per_second": frames / seconds,
+        "mb_per_second": nbytes / 1024**2 / seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+        "profile": None if profiler is None else profiler.to_dict()["stages"],
+        "errors": errors,
+    }
+
+
+if __name__ == "__main__":
+    # Run by the suite with the case as JSON arguments, the result is printed as JSON on the last line
+    print(json.dumps(measure(**json.loads(sys.argv[1]))))
@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: benchmarks/startup.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This file measures how long the application takes to start: importing the
+# package, the command line interface and building the GUI, each in a new
+# interpreter, and the slow optional modules that each of them loads.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+# The ways the application starts, measured from the start of the interpreter to its exit
+CASES = ("import", "api", "help", "list-formats", "gui")
+
+# The modules that are slow to import and only needed once frames are read or written, never loaded to start
+DEFERRED_MODULES = ("h5py", "imagecodecs", "fabio", "zarr", "blosc2", "hdf5plugin", "bitshuffle", "scipy")
+
+# The Qt bindings, only loaded by the GUI
+QT_MODULES = ("PyQt5", "PyQt6", "PySide2", "PySide6")
+
+# The modules the GUI may load to start, h5py being needed by the converter it builds with its window
+GUI_MODULES = QT_MODULES + ("h5py",)
+
+# The time any case may take to start by default, in seconds
+DEFAULT_BUDGET = 1.0
+
+
+def _start(case: str) -> None:
+    """Starts the application in this interpreter the way the case does."""
+    if case == "import":
+        import hdf5_converter  # noqa: F401
+    elif case == "api":
+        import hdf5_converter.api  # noqa: F401
+    elif case in ("help", "list-formats"):
+        from hdf5_converter.cli import main
+
+        main([f"--{case}"])
+    elif case == "gui":
+        from qtpy.QtCore import QTimer
+        from qtpy.QtWidgets import QApplication
+
+        from hdf5_converter.controller import MainController
+
+        controller = MainController()
+        # The event loop stops once the window has been shown, then the application shuts down as if it was closed
+        QTimer.singleShot(0, lambda: QApplication.exit(0))
+        controller.run()
+    else:
+        raise ValueError(f"Unknown startup case: {case}")
+
+
+def measure(case: str, repeat: int = 5) -> dict:
+    """Starts the case in new interpreters, and returns the fastest start and the slow modules it loaded."""
+    # The GUI is built without a window server, so that the case runs on any machine
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    command = [sys.executable, "-m", "benchmarks.startup", case]
+
+    seconds = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        process = subprocess.run(command, capture_output=True, text=True, cwd=Path(__file__).parent.parent, env=env)
+        seconds.append(time.perf_counter() - start)
+        if process.returncode != 0:
+            error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"exit status {process.returncode}"
+            return {"case": case, "error": error}
+
+    return {"case": case, "seconds": min(seconds), "modules": json.loads(process.stdout.strip().splitlines()[-1])}
+
+
+def problems(result: dict, budget: float = DEFAULT_BUDGET) -> list[str]:
+    """Returns what is wrong with the start of a case: too slow, or loading modules it should not."""
+    if "error" in result:
+        return [result["error"]]
+    found = []
+    if result["seconds"] > budget:
+        found.append(f"slower than {budget:.2f}s")
+    allowed = GUI_MODULES if result["case"] == "gui" else ()
+    loaded = [module for module in result["modules"] if module not in allowed]
+    if loaded:
+        found.append(f"loads {', '.join(loaded)}")
+    return found
+
+
+if __name__ == "__main__":
+    # Run by the suite with the case as argument, the slow modules loaded are printed as JSON on the last line
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            _start(sys.argv[1])
+        except SystemExit as e:
+            if e.code:
+                raise
+    print(json.dumps(sorted(module for module in DEFERRED_MODULES + QT_MODULES if module in sys.modules)))
@@ -26,11 +26,6 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 # ----------------------------------------------------------------------------------
 
-from hdf5_converter.controller import MainController
-
-
-__all__ = ["app"]
-
-
-# Application controller
-app = MainController()
+# The application controller is created by the entry point, so that importing the package
+# (e.g. from the encoder worker processes) does not start the GUI
+__all__: list[str] = []
@@ -0,0 +1,297 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/api.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This file provides the headless Python API of the HDF5 Converter. It converts
+# HDF5 files without creating the GUI, e.g. from pipeline scripts or compute nodes.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import glob
+import json
+import os
+from pathlib import Path
+from typing import Callable, Iterable
+
+from hdf5_converter.model.dataset_rule_model import DatasetRules
+from hdf5_converter.model.frame_encoder_model import default_workers
+from hdf5_converter.model.frame_reduction_model import FrameReduction
+from hdf5_converter.model.frame_selection_model import FrameSelection
+from hdf5_converter.model.profiler_model import ProfilerModel
+from hdf5_converter.model.progress_model import Progress
+from hdf5_converter.model.settings_model import DEFAULT_DAEMON_PORT, DEFAULT_LEASE, DEFAULT_MAX_OPEN_FILES, DEFAULT_MEMORY_BUDGET, DEFAULT_PORT
+
+
+__all__ = [
+    "DatasetRules",
+    "FrameReduction",
+    "FrameSelection",
+    "ProfilerModel",
+    "Progress",
+    "cancel_job",
+    "collect_files",
+    "convert",
+    "coordinate",
+    "daemon",
+    "job_status",
+    "submit_job",
+    "watch",
+    "work",
+]
+
+
+def collect_files(patterns: Iterable[str] = (), manifest: str | None = None) -> list[str]:
+    """Expands the glob patterns and the entries of a manifest file into a sorted list of unique files."""
+    patterns = list(patterns)
+
+    if manifest is not None:
+        # One path or glob pattern per line, relative entries are resolved against the manifest
+        manifest_dir = Path(manifest).parent
+        for line in Path(manifest).read_text().splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                patterns.append(line if Path(line).is_absolute() else str(manifest_dir / line))
+
+    files: set[str] = set()
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True)
+        # Keep the literal path if nothing matches, so missing files are reported by the converter
+        files.update(matches if matches else [pattern])
+
+    return sorted(files)
+
+
+def convert(
+    files: Iterable[str],
+    search_term: str | DatasetRules = "data",
+    output_type: str = "tiff",
+    digits: int = 3,
+    workers: int | None = None,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+    index_cache: bool = True,
+    direct_chunks: bool = True,
+    compression: str | None = None,
+    sync: bool = False,
+    drop_cache: bool = False,
+    selection: FrameSelection | None = None,
+    reduction: FrameReduction | None = None,
+    on_message: Callable[[str], None] | None = None,
+    on_progress: Callable[[Progress], None] | None = None,
+    profiler: ProfilerModel | None = None,
+) -> list[str]:
+    """Converts the selected frames of the matching datasets of the files, reduced if asked and timed by profiler if given, and returns the error messages."""
+    messages: list[str] = []
+
+    def report(message: str) -> None:
+        messages.append(message)
+        if on_message is not None:
+            on_message(message)
+
+    # The models that read the HDF5 files are imported on first use, so that importing the API stays light
+    from hdf5_converter.model.dataset_index_model import DatasetIndexModel, default_cache_dir
+    from hdf5_converter.model.scheduler_model import SchedulerModel
+
+    index = DatasetIndexModel(default_cache_dir() if index_cache else None)
+    scheduler = SchedulerModel(workers, memory_budget, max_open_files, index, direct_chunks, sync, drop_cache)
+    units, plan_messages = scheduler.plan(list(files), search_term, output_type, digits, compression, selection, reduction)
+    for message in plan_messages:
+        report(message)
+
+    scheduler.run(units, report, on_progress, profiler)
+
+    return messages
+
+
+def coordinate(
+    files: Iterable[str],
+    address: tuple[str, int] = ("", DEFAULT_PORT),
+    authkey: str | bytes | None = None,
+    lease: float = DEFAULT_LEASE,
+    search_term: str | DatasetRules = "data",
+    output_type: str = "tiff",
+    digits: int = 3,
+    workers: int | None = None,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    index_cache: bool = True,
+    compression: str | None = None,
+    sync: bool = False,
+    drop_cache: bool = False,
+    selection: FrameSelection | None = None,
+    reduction: FrameReduction | None = None,
+    on_message: Callable[[str], None] | None = None,
+    on_progress: Callable[[Progress], None] | None = None,
+    profiler: ProfilerModel | None = None,
+) -> list[str]:
+    """Plans the conversion of the files like convert, for workers processes sharing memory_budget, and hands its units to the workers connecting to address."""
+    messages: list[str] = []
+
+    def report(message: str) -> None:
+        messages.append(message)
+        if on_message is not None:
+            on_message(message)
+
+    from hdf5_converter.model.coordinator_model import CoordinatorModel
+    from hdf5_converter.model.dataset_index_model import DatasetIndexModel, default_cache_dir
+    from hdf5_converter.model.scheduler_model import SchedulerModel
+
+    # The workers share the filesystem but not the working directory of the coordinator
+    files = [os.path.abspath(file_name) for file_name in files]
+    index = DatasetIndexModel(default_cache_dir() if index_cache else None)
+    scheduler = SchedulerModel(workers, memory_budget, index=index)
+    units, plan_messages = scheduler.plan(files, search_term, output_type, digits, compression, selection, reduction)
+    for message in plan_messages:
+        report(message)
+
+    coordinator = CoordinatorModel(address, authkey, lease, sync, drop_cache)
+    try:
+        coordinator.run(units, report, on_progress, profiler)
+    except KeyboardInterrupt:
+        coordinator.close()
+
+    return messages
+
+
+def work(
+    address: tuple[str, int],
+    workers: int | None = None,
+    authkey: str | bytes | None = None,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+    direct_chunks: bool = True,
+    on_message: Callable[[str], None] | None = None,
+) -> list[str]:
+    """Converts the work units handed out by the coordinator at address in workers processes, until it has none left, and returns the error messages."""
+    from hdf5_converter.model.coordinator_model import run_workers
+
+    messages = run_workers(address, default_workers() if workers is None else workers, authkey, memory_budget, max_open_files, direct_chunks)
+    if on_message is not None:
+        for message in messages:
+            on_message(message)
+    return messages
+
+
+def watch(
+    directory: str,
+    search_term: str | DatasetRules = "data",
+    output_type: str = "tiff",
+    digits: int = 3,
+    workers: int = 1,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    poll_interval: float = 0.5,
+    idle_timeout: float | None = None,
+    direct_chunks: bool = True,
+    compression: str | None = None,
+    sync: bool = False,
+    drop_cache: bool = False,
+    selection: FrameSelection | None = None,
+    reduction: FrameReduction | None = None,
+    on_message: Callable[[str], None] | None = None,
+) -> list[str]:
+    """Converts the selected frames of the files of the directory while they are written, until interrupted or idle for idle_timeout seconds."""
+    messages: list[str] = []
+
+    def report(message: str) -> None:
+        messages.append(message)
+        if on_message is not None:
+            on_message(message)
+
+    from hdf5_converter.model.watch_model import WatchModel
+
+    watcher = WatchModel(
+        directory,
+        search_term,
+        output_type,
+        digits,
+        workers,
+        memory_budget,
+        poll_interval,
+        direct_chunks,
+        compression,
+        sync,
+        drop_cache,
+        selection,
+        reduction,
+    )
+    try:
+        watcher.run(report, idle_timeout)
+    except KeyboardInterrupt:
+        watcher.stop()
+
+    return messages
+
+
+def daemon(
+    address: tuple[str, int] = ("localhost", DEFAULT_DAEMON_PORT),
+    workers: int | None = None,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+    index_cache: bool = True,
+    direct_chunks: bool = True,
+    sync: bool = False,
+    drop_cache: bool = False,
+    on_message: Callable[[str], None] | None = None,
+) -> None:
+    """Converts the jobs submitted to the job API at address on a warm pool of workers processes, until interrupted."""
+    # Listening first, so that an address in use is reported before the workers are started
+    from hdf5_converter.model.daemon_model import DaemonModel, DaemonServerModel
+
+    model = DaemonModel(workers, memory_budget, max_open_files, index_cache, direct_chunks, sync, drop_cache, on_message)
+    server = DaemonServerModel(model, address)
+    try:
+        model.start()
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        model.close()
+
+
+def submit_job(address: tuple[str, int], files: Iterable[str], **options) -> dict:
+    """Submits the conversion of the files to the daemon at address with the options of a job, e.g. output_type, digits or priority, and returns its state."""
+    return _request(address, "POST", "/jobs", {"files": [os.path.abspath(file_name) for file_name in files], **options})
+
+
+def job_status(address: tuple[str, int], job_id: int) -> dict:
+    """Returns the state of a job of the daemon at address."""
+    return _request(address, "GET", f"/jobs/{job_id}")
+
+
+def cancel_job(address: tuple[str, int], job_id: int) -> dict:
+    """Cancels a job of the daemon at address and returns its state."""
+    return _request(address, "DELETE", f"/jobs/{job_id}")
+
+
+def _request(address: tuple[str, int], method: str, path: str, content: dict | None = None) -> dict:
+    """Sends a request to the job API of the daemon at address and returns its reply, raising a ValueError with the error of a refused request."""
+    import urllib.error
+    import urllib.request
+
+    host, port = address
+    data = None if content is None else json.dumps(content).encode()
+    request = urllib.request.Request(f"http://{host or 'localhost'}:{port}{path}", data, {"Content-Type": "application/json"}, method=method)
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise ValueError(json.loads(e.read() or b"{}").get("error", str(e))) from None
@@ -0,0 +1,356 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/cli.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This file provides the command line interface of the HDF5 Converter, used to
+# convert HDF5 files in batch without a display.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import argparse
+import sys
+import time
+
+from hdf5_converter.api import (
+    DatasetRules,
+    FrameReduction,
+    FrameSelection,
+    ProfilerModel,
+    Progress,
+    collect_files,
+    convert,
+    coordinate,
+    daemon,
+    submit_job,
+    watch,
+    work,
+)
+from hdf5_converter.model.format_registry_model import FORMATS
+from hdf5_converter.model.frame_encoder_model import default_workers
+from hdf5_converter.model.frame_reduction_model import REDUCTION_DTYPES
+from hdf5_converter.model.settings_model import (
+    DEFAULT_DAEMON_PORT,
+    DEFAULT_LEASE,
+    DEFAULT_MAX_OPEN_FILES,
+    DEFAULT_MEMORY_BUDGET,
+    KEY_VARIABLE,
+    cluster_key,
+    parse_address,
+)
+
+
+# Exit status codes
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+EXIT_NO_INPUT = 2
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    """Creates the argument parser of the command line interface."""
+    parser = argparse.ArgumentParser(prog="hdf5converter", description="Converts the datasets of HDF5 files to other formats.")
+    parser.add_argument("inputs", nargs="*", help="HDF5 files or glob patterns, e.g. 'scans/**/*.h5'")
+    parser.add_argument("-m", "--manifest", help="text file listing one HDF5 file or glob pattern per line")
+    parser.add_argument(
+        "-s",
+        "--search-term",
+        default="data",
+        help="convert the datasets matching these space separated rules: a term found in the path, a glob such as 'entry/*/data', "
+        "'re:' and a regular expression, '!' before any of them to exclude (default: %(default)s)",
+    )
+    parser.add_argument("--rules", metavar="FILE", help="convert the datasets selected by a rule set saved from the dataset browser, instead of --search-term")
+    parser.add_argument("-t", "--output-type", default="tiff", choices=FORMATS.names(), help="output format (default: %(default)s)")
+    parser.add_argument("-d", "--digits", type=int, default=3, choices=range(1, 11), metavar="1-10", help="digits of the frame numbers (default: %(default)s)")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=default_workers(), help="number of worker processes, at most --max-open-files (default: %(default)s)"
+    )
+    parser.add_argument("-c", "--compression", default="none", choices=FORMATS.compressions(), help="compression of the frames (default: %(default)s)")
+    parser.add_argument(
+        "--memory-budget", type=int, default=DEFAULT_MEMORY_BUDGET // 1024**2, help="memory for the frames in flight, in MB (default: %(default)s)"
+    )
+    parser.add_argument("--frames", default="", metavar="START:STOP:STEP", help="convert only these frames of each stack, counted from 0, e.g. 100:500 or ::10")
+    parser.add_argument("--roi", default="", metavar="X,Y,WIDTH,HEIGHT", help="convert only this region of each frame, in pixels")
+    combine = parser.add_mutually_exclusive_group()
+    combine.add_argument("--sum", type=int, metavar="N", help="write the sum of every N consecutive frames")
+    combine.add_argument("--mean", type=int, metavar="N", help="write the mean of every N consecutive frames")
+    parser.add_argument("--bin", type=int, default=1, metavar="N", help="sum blocks of N x N pixels into one, e.g. 2 or 4 (default: %(default)s)")
+    parser.add_argument(
+        "--dtype",
+        choices=REDUCTION_DTYPES,
+        help="data type of the written frames, saturating (default: the type of the dataset, widened to 32 bits for --sum and --bin)",
+    )
+    parser.add_argument("--mask-invalid", action="store_true", help="keep the Eiger gap and overflow pixels out of the sums, and mark them in the output")
+    parser.add_argument("--max-open-files", type=int, default=DEFAULT_MAX_OPEN_FILES, help="HDF5 files kept open by all the workers (default: %(default)s)")
+    parser.add_argument("--no-index-cache", action="store_true", help="do not read or write the on-disk cache of the dataset index")
+    parser.add_argument("--no-direct-chunks", action="store_true", help="let HDF5 decompress every chunk instead of the built-in detector decoders")
+    parser.add_argument("--sync", action="store_true", help="flush the written frames to disk, in batches, before recording them in the manifest")
+    parser.add_argument("--drop-cache", action="store_true", help="tell the kernel not to keep the written frames in the page cache")
+    parser.add_argument("--profile", metavar="FILE", help="time every stage of the conversion and write the statistics to this JSON file")
+    parser.add_argument("--trace", metavar="FILE", help="time every stage of the conversion and write the events to this Chrome trace file")
+    parser.add_argument("--watch", metavar="DIRECTORY", help="convert the files of the directory while they are being written")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="seconds between two scans of the watched directory (default: %(default)s)")
+    parser.add_argument("--idle-timeout", type=float, help="stop watching after this many seconds without new frames")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--serve",
+        metavar="[HOST]:PORT",
+        help=f"hand the conversion out to the workers that connect to this address, authenticated by the secret in ${KEY_VARIABLE}",
+    )
+    mode.add_argument("--connect", metavar="HOST:PORT", help="convert the work units of the coordinator at this address with --workers processes, then exit")
+    mode.add_argument(
+        "--daemon",
+        metavar="[HOST]:PORT",
+        help=f"keep --workers warm worker processes and convert the jobs submitted over HTTP to this address, e.g. localhost:{DEFAULT_DAEMON_PORT}",
+    )
+    mode.add_argument("--submit", metavar="[HOST]:PORT", help="submit the inputs and the conversion options as a job to the daemon at this address, then exit")
+    parser.add_argument("--priority", type=int, default=0, help="priority of a submitted job, higher ones running first (default: %(default)s)")
+    parser.add_argument(
+        "--lease", type=float, default=DEFAULT_LEASE, help="seconds before the work unit of a silent worker is handed out again (default: %(default)s)"
+    )
+    parser.add_argument("--list-formats", action="store_true", help="list the output formats and their capabilities, then exit")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the error messages")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Runs the command line interface and returns the exit status."""
+    parser = _create_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        FORMATS.get(args.output_type).check_compression(args.compression)
+        args.selection = FrameSelection.parse(args.frames, args.roi)
+        args.rules = DatasetRules.load(args.rules) if args.rules else DatasetRules.parse(args.search_term)
+        args.reduction = FrameReduction(args.sum or args.mean or 1, args.mean is not None, args.bin, args.dtype, args.mask_invalid)
+        args.address = parse_address(args.serve or args.connect) if args.serve or args.connect else None
+        args.authkey = cluster_key() if args.address else None
+        if args.daemon or args.submit:
+            # The job API is not authenticated, so it only listens on the local host unless told otherwise
+            host, port = parse_address(args.daemon or args.submit, DEFAULT_DAEMON_PORT)
+            args.daemon_address = (host or "localhost", port)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    if args.list_formats:
+        _list_formats()
+        return EXIT_SUCCESS
+
+    if args.watch is not None:
+        return _watch(args)
+
+    if args.connect:
+        return _work(args)
+
+    if args.daemon:
+        return _daemon(args)
+
+    files = collect_files(args.inputs, args.manifest)
+    if not files:
+        print("No input files were given.", file=sys.stderr)
+        return EXIT_NO_INPUT
+
+    if args.submit:
+        return _submit(files, args)
+
+    if not args.quiet:
+        print(f"Converting {len(files)} file(s)...")
+
+    # Only a profiled conversion pays for timing its stages
+    profiler = ProfilerModel() if args.profile or args.trace else None
+
+    start_time = time.time()
+    if args.serve:
+        messages = _coordinate(files, profiler, args)
+    else:
+        messages = convert(
+            files,
+            search_term=args.rules,
+            output_type=args.output_type,
+            digits=args.digits,
+            workers=args.workers,
+            memory_budget=args.memory_budget * 1024**2,
+            max_open_files=args.max_open_files,
+            index_cache=not args.no_index_cache,
+            direct_chunks=not args.no_direct_chunks,
+            compression=args.compression,
+            sync=args.sync,
+            drop_cache=args.drop_cache,
+            selection=args.selection,
+            reduction=args.reduction,
+            on_message=lambda message: print(message, file=sys.stderr),
+            # A progress line is only drawn on a terminal, log files get the messages alone
+            on_progress=_print_progress if not args.quiet and sys.stderr.isatty() else None,
+            profiler=profiler,
+        )
+
+    if not args.quiet:
+        print(f"Conversion completed in {time.time() - start_time:.2f} seconds.")
+
+    if profiler is not None:
+        _save_profile(profiler, args)
+
+    return EXIT_FAILURE if messages else EXIT_SUCCESS
+
+
+def _print_progress(progress: Progress) -> None:
+    """Redraws the progress line on the terminal."""
+    print(f"\r{progress}", end="\n" if progress.finished else "", file=sys.stderr, flush=True)
+
+
+def _save_profile(profiler: ProfilerModel, args: argparse.Namespace) -> None:
+    """Writes the profile of the conversion to the requested files, and prints its summary."""
+    if args.profile:
+        profiler.save_json(args.profile)
+    if args.trace:
+        profiler.save_trace(args.trace)
+    if not args.quiet:
+        print(profiler.summary())
+
+
+def _list_formats() -> None:
+    """Prints the registered output formats and the capabilities declared by their writers."""
+    for output_format in FORMATS:
+        layout = "single file per stack" if output_format.multi_frame else "file per frame"
+        parallel = "parallel" if output_format.parallel_safe else "serial"
+        print(f"{output_format.name:<12} {output_format.description}")
+        print(f"{'':<12} .{output_format.extension}, {layout}, {parallel}, compression: {', '.join(output_format.compressions)}")
+
+
+def _watch(args: argparse.Namespace) -> int:
+    """Runs the watch mode and returns the exit status."""
+    if not args.quiet:
+        print(f"Watching {args.watch}, press Ctrl+C to stop...")
+
+    messages = watch(
+        args.watch,
+        search_term=args.rules,
+        output_type=args.output_type,
+        digits=args.digits,
+        workers=args.workers,
+        memory_budget=args.memory_budget * 1024**2,
+        poll_interval=args.poll_interval,
+        idle_timeout=args.idle_timeout,
+        direct_chunks=not args.no_direct_chunks,
+        compression=args.compression,
+        sync=args.sync,
+        drop_cache=args.drop_cache,
+        selection=args.selection,
+        reduction=args.reduction,
+        on_message=lambda message: print(message, file=sys.stderr),
+    )
+
+    return EXIT_FAILURE if messages else EXIT_SUCCESS
+
+
+def _coordinate(files: list[str], profiler: ProfilerModel | None, args: argparse.Namespace) -> list[str]:
+    """Hands the conversion of the files out to the workers that connect to the coordinator, and returns the error messages."""
+    host, port = args.address
+    if not args.quiet:
+        print(f"Waiting for workers on {host or '*'}:{port}, start them with: hdf5converter --connect HOST:{port}")
+
+    return coordinate(
+        files,
+        address=args.address,
+        authkey=args.authkey,
+        lease=args.lease,
+        search_term=args.rules,
+        output_type=args.output_type,
+        digits=args.digits,
+        workers=args.workers,
+        memory_budget=args.memory_budget * 1024**2,
+        index_cache=not args.no_index_cache,
+        compression=args.compression,
+        sync=args.sync,
+        drop_cache=args.drop_cache,
+        selection=args.selection,
+        reduction=args.reduction,
+        on_message=lambda message: print(message, file=sys.stderr),
+        on_progress=_print_progress if not args.quiet and sys.stderr.isatty() else None,
+        profiler=profiler,
+    )
+
+
+def _work(args: argparse.Namespace) -> int:
+    """Runs the worker processes of a coordinator and returns the exit status."""
+    host, port = args.address
+    if not args.quiet:
+        print(f"Converting the work units of {host}:{port} with {args.workers} worker(s)...")
+
+    messages = work(
+        args.address,
+        workers=args.workers,
+        authkey=args.authkey,
+        memory_budget=args.memory_budget * 1024**2,
+        max_open_files=args.max_open_files,
+        direct_chunks=not args.no_direct_chunks,
+        on_message=lambda message: print(message, file=sys.stderr),
+    )
+
+    return EXIT_FAILURE if messages else EXIT_SUCCESS
+
+
+def _daemon(args: argparse.Namespace) -> int:
+    """Runs the daemon until interrupted and returns the exit status."""
+    host, port = args.daemon_address
+    if not args.quiet:
+        print(f"Starting {args.workers} worker(s), jobs are submitted to http://{host}:{port}/jobs, press Ctrl+C to stop...")
+
+    daemon(
+        args.daemon_address,
+        workers=args.workers,
+        memory_budget=args.memory_budget * 1024**2,
+        max_open_files=args.max_open_files,
+        index_cache=not args.no_index_cache,
+        direct_chunks=not args.no_direct_chunks,
+        sync=args.sync,
+        drop_cache=args.drop_cache,
+        on_message=None if args.quiet else print,
+    )
+    return EXIT_SUCCESS
+
+
+def _submit(files: list[str], args: argparse.Namespace) -> int:
+    """Submits the conversion of the files to the daemon and returns the exit status."""
+    try:
+        status = submit_job(
+            args.daemon_address,
+            files,
+            search_term=args.rules.to_dict(),
+            output_type=args.output_type,
+            digits=args.digits,
+            compression=args.compression,
+            frames=args.frames,
+            roi=args.roi,
+            sum=args.sum,
+            mean=args.mean,
+            bin=args.bin,
+            dtype=args.dtype,
+            mask_invalid=args.mask_invalid,
+            priority=args.priority,
+        )
+    except (OSError, ValueError) as e:
+        print(f"Could not submit the job: {e}", file=sys.stderr)
+        return EXIT_FAILURE
+
+    if not args.quiet:
+        host, port = args.daemon_address
+        print(f"Submitted job {status['id']}, its state is at http://{host}:{port}/jobs/{status['id']}")
+    return EXIT_SUCCESS
@@ -27,26 +27,26 @@
 # ----------------------------------------------------------------------------------
 
 import time
-from concurrent.futures import ThreadPoolExecutor
 
-from qtpy.QtCore import Signal, QObject
+from qtpy.QtCore import QObject
 
 from hdf5_converter.view import MainView
 from hdf5_converter.model import MainModel
+from hdf5_converter.model.dataset_rule_model import DatasetRules
+from hdf5_converter.model.frame_selection_model import FrameSelection
+from hdf5_converter.model.progress_model import Progress
 
 
 class ConverterController(QObject):
     """This class is responsible for handling the conversion process."""
 
-    convertion_signal = Signal()
-
     def __init__(self, view: MainView, model: MainModel) -> None:
         """Initialize the converter controller with the view and model."""
         super(ConverterController, self).__init__()
         self._view = view
         self._model = model
         self._converting = False
-        self._processing = False
+        self._files_done: set[str] = set()
 
         # Connect signals to slots
         self._connect_signals()
@@ -56,32 +56,33 @@ class ConverterController(QObject):
         # Connect the convert button signal to the model's convert method
         self._view.converter_view.btn_convert.clicked.connect(self._trigger_conversion)
         self._model.converter.new_status.connect(self._update_status_message)
-        self.convertion_signal.connect(self._prepare_for_convertion)
-
-    def convert_files(self) -> None:
-        """Handle the conversion process."""
+        self._model.converter.progress_changed.connect(self._update_progress)
+        self._model.converter.profile_ready.connect(self._view.status_view.update_profile.emit)
+        self._model.jobs.idle.connect(self.restore_after_convertion)
+        self._view.converter_view.btn_cancel.clicked.connect(self._cancel_conversion)
+
+    def convert_files(
+        self, input_files: list[str], format: str, search_term: str | DatasetRules, digits: int, workers: int, selection: FrameSelection, profile: bool = False
+    ) -> None:
+        """Handle the conversion process of a batch of files, in the thread of the job queue."""
+        self._model.converter.workers = workers
+        self._model.converter.profiling = profile
 
-        format = self._view.converter_view.cmb_output_type.currentText()
-        search_term = self._view.converter_view.input_search_term.text()
-        digits = self._view.converter_view.spin_digits.value()
-        input_files = self._view.converter_view.btn_input.file_path
+        # Provide the initial message for the conversion starting and on what files
+        self._view.status_view.update_status.emit("Files to be converted:")
+        self._view.status_view.update_status.emit("--------------------------------------------------")
+        for file in input_files:
+            self._view.status_view.update_status.emit(file)
+        self._view.status_view.update_status.emit("--------------------------------------------------")
+        self._view.status_view.update_status.emit("Conversion in progress...")
 
-        self._processing = True
         start_time = time.time()
 
-        # Convert the files using a thread pool
-        with ThreadPoolExecutor() as executor:
-            futures = []
-            for file in input_files:
-                future = executor.submit(self._model.converter.process, file, search_term, format, digits)
-                futures.append(future)
-
-            for future in futures:
-                try:
-                    # Wait for the future to complete and handle any exceptions
-                    future.result()
-                except Exception as e:
-                    self._view.status_view.update_status.emit(f"Error processing file: {e}")
+        # Convert the selected frames of the files as frame level work units shared by the worker processes
+        try:
+            self._model.converter.convert(input_files, search_term, format, digits, selection)
+        except Exception as e:
+            self._view.status_view.update_status.emit(f"Error processing files: {e}")
 
         # Print the total time taken to convert the files in minutes or seconds based on the time taken
         end_time = time.time()
@@ -92,46 +93,81 @@ class ConverterController(QObject):
             self._view.status_view.update_status.emit(f"Conversion completed in {int(total_time // 60)} minutes and {total_time % 60:.2f} seconds.")
 
     def _prepare_for_convertion(self) -> None:
-        """Prepare the view for conversion by disabling the widgets and updating the status message."""
-        # Disable the conversion widgets
-        self._view.converter_view.togge_widget_status(False)
+        """Prepare the view for conversion, the files of further batches can still be selected and queued."""
+        # Only watching is not allowed while converting
+        self._view.converter_view.btn_watch.setEnabled(False)
+        self._view.converter_view.btn_cancel.setEnabled(True)
 
         # Clear the status view
         self._view.status_view.clear()
-
-        # Provide the initial message for the conversion starting and on what files
-        self._view.status_view.update_status.emit("Files to be converted:")
-        self._view.status_view.update_status.emit("--------------------------------------------------")
-        # Get the input files from the view
-        input_files = self._view.converter_view.btn_input.file_path
-        for file in input_files:
-            self._view.status_view.update_status.emit(file)
-        self._view.status_view.update_status.emit("--------------------------------------------------")
-        # Provide the message for the conversion starting
-        self._view.status_view.update_status.emit("Conversion in progress...")
+        self._files_done.clear()
 
     def restore_after_convertion(self) -> None:
-        """Restore the view after conversion is complete."""
+        """Restore the view after the last queued conversion is complete."""
+        # A batch queued after the queue became idle keeps the view as it is
+        if self._model.jobs.busy:
+            return
+
         # Restore the conversion widgets
         self._view.converter_view.togge_widget_status(True)
-        # Restore the helpers
+        self._view.converter_view.btn_cancel.setEnabled(False)
         self._converting = False
-        self._processing = False
 
     def _update_status_message(self) -> None:
         """Update the status message in the view."""
         self._view.status_view.update_status.emit(self._model.converter.status_message)
 
+    def _update_progress(self, progress: Progress) -> None:
+        """Update the progress bar, and report the files whose frames are all converted."""
+        self._view.status_view.update_progress.emit(progress)
+        for file_name, (done, total) in progress.files.items():
+            if done >= total and file_name not in self._files_done:
+                self._files_done.add(file_name)
+                self._view.status_view.update_status.emit(f"Converted {total} frame(s) of {file_name}")
+
+    def _cancel_conversion(self) -> None:
+        """Cancel the running conversion and the queued ones, the running one stopping after the frames being written."""
+        self._view.converter_view.btn_cancel.setEnabled(False)
+        queued = self._model.jobs.cancel_pending()
+        self._view.status_view.update_status.emit(f"Cancelling the conversion{f' and {queued} queued batch(es)' if queued else ''}...")
+        self._model.converter.cancel()
+
     def _trigger_conversion(self) -> None:
-        """Trigger the conversion process."""
-        self._converting = True
+        """Queue the conversion of the selected files with the current settings, starting it right away if nothing else is converting."""
+        converter_view = self._view.converter_view
+        try:
+            selection = FrameSelection.parse(converter_view.input_frames.text(), converter_view.input_roi.text())
+            rules = DatasetRules.parse(converter_view.input_search_term.text())
+        except ValueError as e:
+            self._view.status_view.update_status.emit(f"Error: {e}")
+            return
+
+        if not self._converting:
+            self._prepare_for_convertion()
+            self._converting = True
+        elif self._model.jobs.busy:
+            self._view.status_view.update_status.emit(f"Queued {len(converter_view.btn_input.file_path)} file(s), converted after the current batch.")
+
+        # The settings are read now, so that they can be changed for the next batch while this one waits
+        self._model.jobs.submit(
+            self.convert_files,
+            list(converter_view.btn_input.file_path),
+            converter_view.cmb_output_type.currentText(),
+            rules,
+            converter_view.spin_digits.value(),
+            int(converter_view.spin_workers.value()),
+            selection,
+            converter_view.chk_profile.isChecked(),
+        )
+
+    def shutdown(self) -> None:
+        """Cancel the queued and running conversions, and wait for the job queue to exit."""
+        self._model.jobs.cancel_pending()
+        if self._model.jobs.busy:
+            self._model.converter.cancel()
+        self._model.jobs.close()
 
     @property
     def converting(self) -> bool:
-        """Check if the conversion process is currently running."""
+        """Check if a conversion is running or queued."""
         return self._converting
-
-    @property
-    def processing(self) -> bool:
-        """Check if the conversion process is currently running."""
-        return self._processing
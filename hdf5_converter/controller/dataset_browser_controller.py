@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/controller/dataset_browser_controller.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the dataset browser controller of the HDF5 Converter GUI. It is
+# responsible for expanding the tree of the browsed file on demand, previewing its
+# datasets and editing the rules that select the datasets to convert.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+from qtpy.QtCore import QObject
+from qtpy.QtWidgets import QTreeWidgetItem
+
+from hdf5_converter.view import MainView
+from hdf5_converter.view.dataset_browser_view import PREVIEW_PIXELS
+from hdf5_converter.model import MainModel
+from hdf5_converter.model.dataset_browser_model import DatasetBrowserModel
+from hdf5_converter.model.dataset_rule_model import DatasetRule, DatasetRules
+
+
+class DatasetBrowserController(QObject):
+    """This class is responsible for handling the dataset browser."""
+
+    def __init__(self, view: MainView, model: MainModel) -> None:
+        """Initialize the dataset browser controller with the view and model."""
+        super(DatasetBrowserController, self).__init__()
+        self._view = view
+        self._model = model
+        self._browser: DatasetBrowserModel | None = None
+
+        # Connect signals to slots
+        self._connect_signals()
+
+    def _connect_signals(self) -> None:
+        """Connect signals from the views to the browser methods."""
+        browser_view = self._view.browser_view
+        self._view.converter_view.btn_browse.clicked.connect(self._open_browser)
+        browser_view.cmb_file.currentTextChanged.connect(self._open_file)
+        browser_view.tree.itemExpanded.connect(self._expand)
+        browser_view.tree.currentItemChanged.connect(self._show_node)
+        browser_view.spin_frame.valueChanged.connect(self._show_preview)
+        browser_view.input_rules.textChanged.connect(self._update_rules)
+        browser_view.btn_include.clicked.connect(lambda: self._add_rule(exclude=False))
+        browser_view.btn_exclude.clicked.connect(lambda: self._add_rule(exclude=True))
+        browser_view.btn_load_rules.clicked.connect(self._load_rules)
+        browser_view.btn_save_rules.clicked.connect(self._save_rules)
+        browser_view.btn_apply.clicked.connect(self._apply_rules)
+        browser_view.finished.connect(self._close_file)
+
+    def _open_browser(self) -> None:
+        """Open the browser on the loaded files, with the rules of the converter view."""
+        files = list(self._view.converter_view.btn_input.file_path or [])
+        if not files:
+            self._view.status_view.update_status.emit("Load the HDF5 file(s) to browse first.")
+            return
+
+        browser_view = self._view.browser_view
+        browser_view.input_rules.setText(self._view.converter_view.input_search_term.text())
+        # Filling the files opens the first one
+        browser_view.cmb_file.blockSignals(True)
+        browser_view.cmb_file.clear()
+        browser_view.cmb_file.addItems(files)
+        browser_view.cmb_file.blockSignals(False)
+        self._open_file(files[0])
+        browser_view.show()
+
+    def _open_file(self, file_name: str) -> None:
+        """Browse the file, reading the members of its root group only."""
+        self._close_file()
+        browser_view = self._view.browser_view
+        if not file_name:
+            return
+        try:
+            self._browser = DatasetBrowserModel(file_name)
+            browser_view.add_nodes(self._browser.children())
+        except Exception as e:
+            browser_view.lbl_info.setText(f"Error opening {file_name}: {e}")
+            return
+        self._update_rules()
+
+    def _close_file(self) -> None:
+        """Close the browsed file and clear the browser."""
+        if self._browser is not None:
+            self._browser.close()
+            self._browser = None
+        self._view.browser_view.clear()
+
+    def _expand(self, item: QTreeWidgetItem) -> None:
+        """Read the members of a group the first time it is expanded."""
+        node = self._view.browser_view.node(item)
+        if self._browser is None or node is None or item.childCount() or not node.has_children:
+            return
+        try:
+            self._view.browser_view.add_nodes(self._browser.children(node.name), item)
+        except Exception as e:
+            self._view.browser_view.lbl_info.setText(f"Error reading {node.name}: {e}")
+            return
+        self._update_rules()
+
+    def _show_node(self, item: QTreeWidgetItem | None) -> None:
+        """Show the metadata of the current node, and a preview of its first frame if it is a stack of frames."""
+        browser_view = self._view.browser_view
+        node = browser_view.node(item)
+        if node is None:
+            return
+        browser_view.lbl_info.setText(f"{node.name}\n{node.describe()}")
+
+        frames = node.info.frame_count if node.info is not None and node.info.ndim >= 2 else 0
+        browser_view.spin_frame.blockSignals(True)
+        browser_view.spin_frame.setMaximum(max(0, frames - 1))
+        browser_view.spin_frame.setValue(0)
+        browser_view.spin_frame.blockSignals(False)
+        self._show_preview()
+
+    def _show_preview(self) -> None:
+        """Show the selected frame of the current dataset, decimated to the size of the preview."""
+        browser_view = self._view.browser_view
+        node = browser_view.node(browser_view.tree.currentItem())
+        if self._browser is None or node is None or node.info is None or node.info.ndim < 2 or node.info.dtype.kind not in "uifb":
+            browser_view.show_preview(None)
+            return
+        try:
+            frame = self._browser.preview(node.name, browser_view.spin_frame.value(), PREVIEW_PIXELS)
+        except Exception as e:
+            browser_view.lbl_info.setText(f"{node.name}\nError reading a preview: {e}")
+            browser_view.show_preview(None)
+            return
+        browser_view.show_preview(DatasetBrowserModel.preview_image(frame))
+
+    def _rules(self) -> DatasetRules | None:
+        """Returns the rules of the browser, or None if they are invalid."""
+        try:
+            return DatasetRules.parse(self._view.browser_view.input_rules.text())
+        except ValueError as e:
+            self._view.browser_view.lbl_rules_status.setText(f"Error: {e}")
+            return None
+
+    def _update_rules(self) -> None:
+        """Mark the datasets of the tree selected by the rules."""
+        rules = self._rules()
+        if rules is None:
+            return
+        selected = self._view.browser_view.mark_selected(rules)
+        self._view.browser_view.lbl_rules_status.setText(f"{selected} of the datasets shown selected")
+
+    def _add_rule(self, exclude: bool) -> None:
+        """Add a rule selecting or excluding the current dataset, or every dataset of the current group."""
+        browser_view = self._view.browser_view
+        node = browser_view.node(browser_view.tree.currentItem())
+        if node is None or node.kind == "missing":
+            return
+        rule = DatasetRule.for_node(node.rule_name, group=node.kind == "group", exclude=exclude)
+        text = browser_view.input_rules.text().strip()
+        browser_view.input_rules.setText(f"{text} {rule}" if text else str(rule))
+
+    def _load_rules(self) -> None:
+        """Load the rules of a saved rule set."""
+        file_name = self._view.browser_view.ask_rules_file(save=False)
+        if not file_name:
+            return
+        try:
+            rules = DatasetRules.load(file_name)
+        except (OSError, ValueError) as e:
+            self._view.browser_view.lbl_rules_status.setText(f"Error: {e}")
+            return
+        self._view.browser_view.input_rules.setText(str(rules))
+
+    def _save_rules(self) -> None:
+        """Save the rules as a rule set, for later conversions and the command line."""
+        rules = self._rules()
+        if rules is None:
+            return
+        file_name = self._view.browser_view.ask_rules_file(save=True)
+        if not file_name:
+            return
+        try:
+            rules.save(file_name)
+        except OSError as e:
+            self._view.browser_view.lbl_rules_status.setText(f"Error: {e}")
+            return
+        self._view.browser_view.lbl_rules_status.setText(f"Rules saved to {file_name}")
+
+    def _apply_rules(self) -> None:
+        """Use the rules for the next conversions, and close the browser."""
+        rules = self._rules()
+        if rules is None:
+            return
+        self._view.converter_view.input_search_term.setText(str(rules))
+        self._view.browser_view.accept()
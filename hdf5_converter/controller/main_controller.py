@@ -26,13 +26,15 @@
 # ----------------------------------------------------------------------------------
 
 import sys
-import time
 
 from qtpy.QtWidgets import QApplication
 
 from hdf5_converter.view import MainView
-from hdf5_converter.model import MainModel, QtWorkerModel
+from hdf5_converter.model import MainModel
+from hdf5_converter.model.format_registry_model import FORMATS
 from hdf5_converter.controller.converter_controller import ConverterController
+from hdf5_converter.controller.dataset_browser_controller import DatasetBrowserController
+from hdf5_converter.controller.watch_controller import WatchController
 
 
 class MainController:
@@ -43,35 +45,31 @@ class MainController:
         self._view = MainView()
         self._model = MainModel()
 
+        # The output types come from the registered formats, including the ones of installed plugins
+        self._view.converter_view.set_output_types(FORMATS.names())
+
         # Initialize the converter controller
         self._converter_controller = ConverterController(self._view, self._model)
 
-        # Initialize the worker model
-        self._worker_model = QtWorkerModel(self._worker_methods, ())  # Ensure worker runs in a separate thread
-        self._worker_model.start()
+        # Initialize the dataset browser controller, the browsed files are only opened once asked for
+        self._browser_controller = DatasetBrowserController(self._view, self._model)
+
+        # Initialize the watch controller
+        self._watch_controller = WatchController(self._view, self._model)
+
+        # Start the job queue, its thread sleeps until a conversion is queued
+        self._model.jobs.start()
 
     def run(self) -> None:
         """Runs the main application."""
         # Display the main view
         self._view.display_window()
 
-        # Start the Qt app and return the status code
-        sys.exit(self._app.exec())
-
-    def _worker_methods(self) -> None:
-        """This method is responsible for running the worker methods."""
-
-        # Run the conversion process
-        while not self._view.terminated:
-
-            if self._converter_controller._converting:
-                if not self._converter_controller.processing:
-                    self._converter_controller.convertion_signal.emit()
-                    self._converter_controller.convert_files()
-
-                self._converter_controller.restore_after_convertion()
-
-            time.sleep(0.1)
+        # Start the Qt app
+        status = self._app.exec()
 
-        # Set as finished so the GUI can exit
-        self._view.worker_finished = True
+        # Stop watching, cancel the conversions and wait for their thread, release the encoder workers and return the status code
+        self._watch_controller.stop_watching()
+        self._converter_controller.shutdown()
+        self._model.converter.shutdown()
+        sys.exit(status)
@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/controller/watch_controller.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the watch controller of the HDF5 Converter GUI. It is responsible for
+# starting and stopping the conversion of a watched folder.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+from pathlib import Path
+
+from qtpy.QtCore import QObject
+
+from hdf5_converter.view import MainView
+from hdf5_converter.model import MainModel, QtWorkerModel
+from hdf5_converter.model.frame_selection_model import FrameSelection
+from hdf5_converter.model.watch_model import WatchModel
+
+
+class WatchController(QObject):
+    """This class is responsible for handling the watch folder mode."""
+
+    def __init__(self, view: MainView, model: MainModel) -> None:
+        """Initialize the watch controller with the view and model."""
+        super(WatchController, self).__init__()
+        self._view = view
+        self._model = model
+        self._watcher: WatchModel | None = None
+        self._worker_model: QtWorkerModel | None = None
+
+        # Connect signals to slots
+        self._connect_signals()
+
+    def _connect_signals(self) -> None:
+        """Connect signals from the view to the watch methods."""
+        self._view.converter_view.btn_watch.directory_changed.connect(self._start_watching)
+        self._view.converter_view.btn_stop_watch.clicked.connect(self.stop_watching)
+
+    def _start_watching(self) -> None:
+        """Start converting the files of the selected folder in a worker thread."""
+        converter_view = self._view.converter_view
+        directory = converter_view.btn_watch.directory
+
+        try:
+            self._watcher = WatchModel(
+                directory,
+                converter_view.input_search_term.text(),
+                converter_view.cmb_output_type.currentText(),
+                converter_view.spin_digits.value(),
+                int(converter_view.spin_workers.value()),
+                self._model.converter.memory_budget,
+                selection=FrameSelection.parse(converter_view.input_frames.text(), converter_view.input_roi.text()),
+            )
+        except ValueError as e:
+            self._view.status_view.update_status.emit(f"Error: {e}")
+            return
+
+        # Disable the conversion widgets, only stopping is allowed while watching
+        converter_view.togge_widget_status(False)
+        converter_view.btn_stop_watch.setEnabled(True)
+        converter_view.btn_watch.setText(f"Watching {Path(directory).name}")
+
+        self._view.status_view.clear()
+        self._view.status_view.update_status.emit(f"Watching folder: {directory}")
+
+        self._worker_model = QtWorkerModel(self._watcher.run, (self._view.status_view.update_status.emit,))
+        self._worker_model.finished.connect(self._restore_after_watching)
+        self._worker_model.start()
+
+    def stop_watching(self) -> None:
+        """Stop watching the folder and wait for the worker thread to finish."""
+        if self._watcher is not None:
+            self._watcher.stop()
+        if self._worker_model is not None:
+            self._worker_model.wait()
+
+    def _restore_after_watching(self) -> None:
+        """Restore the view after watching has stopped."""
+        converter_view = self._view.converter_view
+        converter_view.togge_widget_status(True)
+        converter_view.btn_stop_watch.setEnabled(False)
+        converter_view.btn_watch.setText("Watch Folder")
+
+        self._view.status_view.update_status.emit("Stopped watching.")
+        self._watcher = None
+        self._worker_model = None
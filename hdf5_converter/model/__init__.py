@@ -26,8 +26,17 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 # ----------------------------------------------------------------------------------
 
-from hdf5_converter.model.main_model import MainModel
-from hdf5_converter.model.qt_worker_model import QtWorkerModel
+from importlib import import_module
 
 
-__all__ = ["MainModel", "QtWorkerModel"]
+__all__ = ["JobQueueModel", "MainModel", "QtWorkerModel"]
+
+# The models of the GUI need Qt, so they are only imported when asked for, and the headless conversions and their worker processes never load it
+_MODULES = {"JobQueueModel": "job_queue_model", "MainModel": "main_model", "QtWorkerModel": "qt_worker_model"}
+
+
+def __getattr__(name: str) -> type:
+    """Imports the model of the GUI with the given name on first use."""
+    if name not in _MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(f"{__name__}.{_MODULES[name]}"), name)
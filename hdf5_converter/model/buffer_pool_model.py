@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/buffer_pool_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the buffer pool model of the HDF5 Converter. It is responsible for a bounded
+# set of shared memory frame buffers that the reader fills and the encoder workers give
+# back, so that the memory used by a conversion stays the same however long it runs.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import threading
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+
+class BufferPoolModel:
+    """This class is responsible for lending a bounded number of shared memory frame buffers."""
+
+    def __init__(self, capacity: int) -> None:
+        """Initialises the buffer pool model, the buffers being created on first use."""
+        self._capacity = max(1, int(capacity))
+        self._buffers: list[SharedMemory] = []
+        self._free: list[SharedMemory] = []
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def acquire(self, nbytes: int) -> SharedMemory:
+        """Returns a free buffer of at least nbytes, waiting for one to be released when they are all in use."""
+        nbytes = max(1, int(nbytes))
+        with self._condition:
+            while not self._free and len(self._buffers) >= self._capacity:
+                if self._closed:
+                    raise RuntimeError("The buffer pool is closed.")
+                self._condition.wait()
+            if self._closed:
+                raise RuntimeError("The buffer pool is closed.")
+
+            if self._free:
+                buffer = self._free.pop()
+                if buffer.size >= nbytes:
+                    return buffer
+                # Frames larger than before replace the buffer, so the pool grows only to the largest frame
+                self._buffers.remove(buffer)
+                self._destroy(buffer)
+
+            buffer = SharedMemory(create=True, size=nbytes)
+            self._buffers.append(buffer)
+            return buffer
+
+    def release(self, buffer: SharedMemory) -> None:
+        """Gives a buffer back to the pool and wakes up a waiting reader."""
+        with self._condition:
+            if self._closed:
+                self._buffers.remove(buffer)
+                self._destroy(buffer)
+                return
+            self._free.append(buffer)
+            self._condition.notify()
+
+    @staticmethod
+    def view(buffer: SharedMemory, shape: tuple, dtype: np.dtype) -> np.ndarray:
+        """Returns an array of the given shape and data type over the start of a buffer."""
+        return np.ndarray(shape, dtype=dtype, buffer=buffer.buf)
+
+    @staticmethod
+    def _destroy(buffer: SharedMemory) -> None:
+        """Closes and removes a shared memory buffer."""
+        buffer.close()
+        buffer.unlink()
+
+    def close(self) -> None:
+        """Removes the free buffers, the buffers still lent out being removed when they are released."""
+        with self._condition:
+            self._closed = True
+            for buffer in self._free:
+                self._buffers.remove(buffer)
+                self._destroy(buffer)
+            self._free.clear()
+            self._condition.notify_all()
+
+    @property
+    def capacity(self) -> int:
+        """Returns the maximum number of buffers."""
+        return self._capacity
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the shared memory currently held by the pool, in bytes."""
+        with self._condition:
+            return sum(buffer.size for buffer in self._buffers)
@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/cbf_writer_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the CBF writer model of the HDF5 Converter. It is responsible for writing
+# integer frames as byte offset compressed CBF files, encoding whole frames with NumPy
+# and filling a header template that is built once per frame shape and data type.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import base64
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+
+
+# The element types of the CBF binary section, the 64 bit unsigned integers are left to fabio
+CBF_ELEMENT_TYPES = {
+    "int8": "signed 8-bit integer",
+    "int16": "signed 16-bit integer",
+    "int32": "signed 32-bit integer",
+    "int64": "signed 64-bit integer",
+    "uint8": "unsigned 8-bit integer",
+    "uint16": "unsigned 16-bit integer",
+    "uint32": "unsigned 32-bit integer",
+}
+
+# The bytes that open the binary data of a CBF file
+CBF_STARTER = b"\x0c\x1a\x04\xd5"
+
+# The pixels encoded at a time, small enough for the temporary arrays to stay in the CPU cache
+ENCODE_BLOCK = 64 * 1024
+
+# The bytes that follow the leading 0x80 of the 16, 32 and 64 bit differences
+_ESCAPES = ((127, b""), (32767, b"\x00\x80"), (2147483647, b"\x00\x80\x00\x00\x00\x80"))
+
+
+def supports_cbf(dtype: np.dtype) -> bool:
+    """Returns True if frames of the data type can be written by the CBF writer."""
+    return np.dtype(dtype).name in CBF_ELEMENT_TYPES
+
+
+def _encode_block(delta: np.ndarray) -> np.ndarray:
+    """Encodes the differences between neighbouring pixels with the CBF byte offset scheme."""
+    # Every difference takes a byte, the large ones become 0x80 followed by the rest of their escape sequence
+    output = delta.astype(np.int8).view(np.uint8)
+    large = np.flatnonzero((delta > 127) | (delta < -127))
+    if not large.size:
+        return output
+    output[large] = 0x80
+
+    values = delta[large]
+    magnitude = np.abs(values.astype(np.int64))
+    positions, payloads = [], []
+    for index, (lower, escape) in enumerate(_ESCAPES):
+        upper = _ESCAPES[index + 1][0] if index + 1 < len(_ESCAPES) else None
+        selected = magnitude > lower if upper is None else (magnitude > lower) & (magnitude <= upper)
+        if not selected.any():
+            continue
+
+        # The rest of the escape sequence and the little endian value, for each selected difference
+        width = 2 ** (index + 1)
+        value_bytes = values[selected].astype(f"<i{width}").view(np.uint8).reshape(-1, width)
+        prefix = np.broadcast_to(np.frombuffer(escape, dtype=np.uint8), (value_bytes.shape[0], len(escape)))
+        payload = np.concatenate([prefix, value_bytes], axis=1)
+        positions.append(np.repeat(large[selected] + 1, payload.shape[1]))
+        payloads.append(payload.reshape(-1))
+
+    # A single insertion pass, the bytes inserted at the same position keeping their order
+    return np.insert(output, np.concatenate(positions), np.concatenate(payloads))
+
+
+def _encode_blocks(frame: np.ndarray) -> list[bytes]:
+    """Returns the byte offset compressed pixels of a frame, one block of pixels at a time."""
+    # Like fabio, the differences of up to 32 bit pixels wrap around in 32 bits and never need the 64 bit escape
+    work_dtype = np.int64 if frame.dtype.itemsize > 4 else np.int32
+    pixels = frame.reshape(-1)
+    blocks = []
+    previous = work_dtype(0)
+    with np.errstate(over="ignore"):
+        for start in range(0, pixels.size, ENCODE_BLOCK):
+            block = pixels[start:][:ENCODE_BLOCK].astype(work_dtype)
+            delta = np.empty_like(block)
+            delta[0] = block[0] - previous
+            np.subtract(block[1:], block[:-1], out=delta[1:])
+            previous = block[-1]
+            blocks.append(_encode_block(delta).tobytes())
+    return blocks
+
+
+def byte_offset_encode(frame: np.ndarray) -> bytes:
+    """Returns the byte offset compressed pixels of a frame, identical to the encoding of fabio."""
+    return b"".join(_encode_blocks(frame))
+
+
+@lru_cache(maxsize=32)
+def _header_template(shape: tuple[int, int], dtype_name: str) -> tuple[bytes, bytes]:
+    """Returns the header and trailer of the CBF files of a frame shape and data type, with the name, size and checksum left as fields."""
+    rows, columns = shape
+    header = b"\r\n".join(
+        [
+            b"###CBF: VERSION 1.5, HDF5 Converter",
+            b"data_%s",
+            b"_array_data.data",
+            b";",
+            b"--CIF-BINARY-FORMAT-SECTION--",
+            b"Content-Type: application/octet-stream;",
+            b'     conversions="x-CBF_BYTE_OFFSET"',
+            b"Content-Transfer-Encoding: BINARY",
+            b"X-Binary-Size: %d",
+            b"X-Binary-ID: 1",
+            f'X-Binary-Element-Type: "{CBF_ELEMENT_TYPES[dtype_name]}"'.encode("ascii"),
+            b"X-Binary-Element-Byte-Order: LITTLE_ENDIAN",
+            b"Content-MD5: %s",
+            f"X-Binary-Number-of-Elements: {rows * columns}".encode("ascii"),
+            f"X-Binary-Size-Fastest-Dimension: {columns}".encode("ascii"),
+            f"X-Binary-Size-Second-Dimension: {rows}".encode("ascii"),
+            b"X-Binary-Size-Padding: 1",
+            b"",
+            CBF_STARTER,
+        ]
+    )
+    trailer = b"\r\n\r\n--CIF-BINARY-FORMAT-SECTION----\r\n;"
+    return header, trailer
+
+
+def encode_cbf(frame: np.ndarray, name: str) -> bytes:
+    """Returns the bytes of a byte offset compressed CBF file holding a single frame, with name as its data block."""
+    if frame.ndim != 2:
+        raise ValueError(f"Only 2D frames can be written as CBF, got shape {frame.shape}")
+    if not supports_cbf(frame.dtype):
+        raise ValueError(f"Unsupported CBF data type: {frame.dtype}")
+
+    blocks = _encode_blocks(frame)
+    header, trailer = _header_template(frame.shape, frame.dtype.name)
+    md5 = hashlib.md5()
+    for block in blocks:
+        md5.update(block)
+    checksum = base64.b64encode(md5.digest())
+
+    header = header % (name.encode("ascii", "replace"), sum(len(block) for block in blocks), checksum)
+    return b"".join((header, *blocks, trailer))
+
+
+def write_cbf(file_name: str, frame: np.ndarray, name: str) -> None:
+    """Writes a single frame as a byte offset compressed CBF file, with name as its data block."""
+    data = encode_cbf(frame, name)
+    with open(file_name, "wb") as file:
+        file.write(data)
@@ -0,0 +1,233 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/chunk_reader_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the chunk reader model of the HDF5 Converter. It is responsible for reading
+# the raw chunks of compressed detector datasets with read_direct_chunk and decompressing
+# them in a thread pool straight into preallocated NumPy buffers.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import functools
+import os
+import struct
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+from typing import Callable
+
+import h5py
+import numpy as np
+
+from hdf5_converter.model.profiler_model import span
+
+
+# The detector filters are optional and slow to import, so they are only imported once the first frames are read
+@functools.cache
+def load_filters() -> bool:
+    """Registers the filters of hdf5plugin with HDF5 for the regular read path, once, and returns whether it is installed."""
+    try:
+        import hdf5plugin  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# The HDF5 filter identifiers
+FILTER_DEFLATE = 1
+FILTER_BLOSC = 32001
+FILTER_LZ4 = 32004
+FILTER_BITSHUFFLE = 32008
+
+# The compression options of the bitshuffle filter
+BITSHUFFLE_LZ4 = 2
+BITSHUFFLE_ZSTD = 3
+
+
+def _decode_deflate(raw: bytes, cd_values: tuple, dest: np.ndarray) -> None:
+    """Decompresses a deflate (gzip) chunk."""
+    dest.reshape(-1).view(np.uint8)[:] = np.frombuffer(zlib.decompress(raw), dtype=np.uint8)
+
+
+def _decode_blosc(raw: bytes, cd_values: tuple, dest: np.ndarray) -> None:
+    """Decompresses a blosc chunk directly into the destination."""
+    import blosc2
+
+    blosc2.decompress(raw, dst=dest)
+
+
+def _decode_lz4(raw: bytes, cd_values: tuple, dest: np.ndarray) -> None:
+    """Decompresses a chunk of the HDF5 LZ4 filter, made of independently compressed blocks."""
+    import lz4.block
+
+    total_size, block_size = struct.unpack(">QI", raw[:12])
+    target = dest.reshape(-1).view(np.uint8)
+
+    position = 12
+    offset = 0
+    while offset < total_size:
+        size = min(block_size, total_size - offset)
+        (compressed_size,) = struct.unpack_from(">I", raw, position)
+        position += 4
+        end = position + compressed_size
+        block = raw[position:end]
+        position = end
+
+        # Blocks that did not compress are stored as they are
+        data = block if compressed_size == size else lz4.block.decompress(block, uncompressed_size=size)
+        end = offset + size
+        target[offset:end] = np.frombuffer(data, dtype=np.uint8)
+        offset = end
+
+
+def _decode_bitshuffle(raw: bytes, cd_values: tuple, dest: np.ndarray) -> None:
+    """Decompresses a bitshuffle/LZ4 or bitshuffle/zstd chunk."""
+    import bitshuffle
+
+    _, block_bytes = struct.unpack(">QI", raw[:12])
+    data = np.frombuffer(raw, dtype=np.uint8, offset=12)
+    block_size = block_bytes // dest.dtype.itemsize
+
+    if cd_values[4] == BITSHUFFLE_ZSTD:
+        dest[...] = bitshuffle.decompress_zstd(data, dest.shape, dest.dtype, block_size)
+    else:
+        dest[...] = bitshuffle.decompress_lz4(data, dest.shape, dest.dtype, block_size)
+
+
+@functools.cache
+def _decoders() -> dict[int, Callable[[bytes, tuple, np.ndarray], None]]:
+    """Returns the decoders of the filters whose decompression library is installed, the regular read path is used for the others."""
+    decoders = {FILTER_DEFLATE: _decode_deflate}
+    if find_spec("blosc2") is not None:
+        decoders[FILTER_BLOSC] = _decode_blosc
+    if find_spec("lz4") is not None:
+        decoders[FILTER_LZ4] = _decode_lz4
+    if find_spec("bitshuffle") is not None:
+        decoders[FILTER_BITSHUFFLE] = _decode_bitshuffle
+    return decoders
+
+
+class ChunkReaderModel:
+    """This class is responsible for the fast read path of datasets stored as compressed chunks of whole frames."""
+
+    def __init__(self, threads: int | None = None) -> None:
+        """Initialises the chunk reader model, decompressing on one thread per CPU unless told otherwise."""
+        self._threads = max(1, threads if threads is not None else os.cpu_count() or 1)
+        self._decoders = _decoders()
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _filter(self, dataset: h5py.Dataset) -> tuple[int, tuple] | None:
+        """Returns the single filter of the dataset and its options, or None if it has none or several."""
+        plist = dataset.id.get_create_plist()
+        if plist.get_nfilters() != 1:
+            return None
+        code, _, cd_values, _ = plist.get_filter(0)
+        return code, tuple(cd_values)
+
+    def supports(self, dataset: h5py.Dataset) -> bool:
+        """Returns True if the dataset is chunked in whole frames with a single filter that can be decoded here."""
+        if dataset.chunks is None or dataset.ndim < 3 or tuple(dataset.chunks[1:]) != tuple(dataset.shape[1:]):
+            return False
+        if dataset.dtype.kind not in "uif":
+            return False
+
+        pipeline = self._filter(dataset)
+        if pipeline is None or pipeline[0] not in self._decoders:
+            return False
+
+        # Only the LZ4 and zstd variants of bitshuffle are compressed chunks with a header
+        code, cd_values = pipeline
+        return code != FILTER_BITSHUFFLE or (len(cd_values) > 4 and cd_values[4] in (BITSHUFFLE_LZ4, BITSHUFFLE_ZSTD))
+
+    def read(self, dataset: h5py.Dataset, start: int, stop: int, out: np.ndarray, step: int = 1, region: tuple[slice, slice] | None = None) -> np.ndarray:
+        """Reads every step frames of [start, stop) of a supported dataset, or their (rows, columns) region, into out, and returns it."""
+        code, cd_values = self._filter(dataset)
+        decoder = self._decoders[code]
+        chunk_frames = dataset.chunks[0]
+        chunk_shape = (chunk_frames, *dataset.shape[1:])
+
+        def decode(task: tuple) -> None:
+            raw, filter_mask, chunk_start, first, last = task
+            target = out[slice((first - start) // step, (last - start + step - 1) // step)]
+
+            if raw is None:
+                target[...] = dataset.fillvalue
+                return
+
+            with span("decode", target.nbytes):
+                # Decode straight into the output when the whole chunk is selected
+                whole = step == 1 and region is None and first == chunk_start and last == chunk_start + chunk_frames
+                dest = target if whole else np.empty(chunk_shape, dtype=dataset.dtype)
+                if filter_mask & 1:
+                    # The filter was skipped for this chunk, the data is stored uncompressed
+                    dest.reshape(-1).view(np.uint8)[:] = np.frombuffer(raw, dtype=np.uint8)
+                else:
+                    decoder(raw, cd_values, dest)
+                if not whole:
+                    frames = dest[slice(first - chunk_start, last - chunk_start, step)]
+                    target[...] = frames if region is None else frames[(Ellipsis, *region)]
+
+        # The raw reads go through the HDF5 library one at a time, while the chunks already read are decompressed in parallel
+        executor = self._get_executor() if self._threads > 1 and stop - start > chunk_frames else None
+        futures = []
+        index = start
+        while index < stop:
+            chunk_start = index - index % chunk_frames
+            first = index
+            last = min(stop, chunk_start + chunk_frames)
+            with span("read") as timed:
+                try:
+                    filter_mask, raw = dataset.id.read_direct_chunk((chunk_start,) + (0,) * (dataset.ndim - 1))
+                    timed.nbytes = len(raw)
+                except (KeyError, OSError, RuntimeError):
+                    # The chunk was never written, so it holds the fill value
+                    filter_mask, raw = None, None
+
+            task = (raw, filter_mask, chunk_start, first, last)
+            if executor is None:
+                decode(task)
+            else:
+                futures.append(executor.submit(decode, task))
+
+            # The next selected frame, skipping the chunks that hold none
+            index = first + -(-(last - first) // step) * step
+
+        for future in futures:
+            future.result()
+
+        return out
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Returns the decompression thread pool, creating it on first use."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._threads)
+            return self._executor
+
+    def shutdown(self) -> None:
+        """Shuts down the decompression thread pool, if it was started."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -26,118 +26,349 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 # ----------------------------------------------------------------------------------
 
+from contextlib import ExitStack
 from pathlib import Path
+from typing import Callable, Iterator
 
-import fabio
 import h5py
+import numpy as np
 from qtpy.QtCore import Signal, QObject
 
+from hdf5_converter.model.chunk_reader_model import ChunkReaderModel
+from hdf5_converter.model.dataset_rule_model import DatasetRules
+from hdf5_converter.model.format_registry_model import FORMATS
+from hdf5_converter.model.frame_encoder_model import FrameEncoderModel, frame_file, write_frame, write_stack
+from hdf5_converter.model.frame_reduction_model import FrameReduction, reduce_windows
+from hdf5_converter.model.frame_selection_model import FrameSelection
+from hdf5_converter.model.frame_stream_model import FrameStreamModel, DEFAULT_MEMORY_BUDGET
+from hdf5_converter.model.manifest_model import FrameStatus, ManifestModel
+from hdf5_converter.model.profiler_model import ProfilerModel
+from hdf5_converter.model.scheduler_model import SchedulerModel
+
 
 class ConverterModel(QObject):
     """This class is responsible for handling the conversion process."""
 
     new_status = Signal()
+    # Emitted with a Progress at most a few times per second while converting
+    progress_changed = Signal(object)
+    # Emitted with the ProfilerModel of a profiled conversion once it is done
+    profile_ready = Signal(object)
 
-    def __init__(self) -> None:
+    def __init__(
+        self, memory_budget: int = DEFAULT_MEMORY_BUDGET, workers: int = 1, direct_chunks: bool = True, sync: bool = False, drop_cache: bool = False
+    ) -> None:
         """Initialises the converter model."""
         super(ConverterModel, self).__init__()
 
         self._status_message = ""
+        self._chunk_reader = ChunkReaderModel() if direct_chunks else None
+        self._stream = FrameStreamModel(memory_budget, self._chunk_reader)
+        self._encoder = FrameEncoderModel(workers, sync=sync, drop_cache=drop_cache)
+        self._scheduler = SchedulerModel(workers, memory_budget, direct_chunks=direct_chunks, sync=sync, drop_cache=drop_cache)
+        self._profiling = False
 
     def set_status_message(self, message: str) -> None:
         """Sets the status message."""
         self._status_message = message
         self.new_status.emit()
 
-    def save_data(self, data: list, output_file: str, is_single_frame: bool = False, digits: int = 4, format: str = "tiff") -> None:
-        """Saves the data in the specified format."""
+    def save_data(
+        self,
+        data: list,
+        output_file: str,
+        is_single_frame: bool = False,
+        digits: int = 4,
+        format: str = "tiff",
+        first_frame: int = 0,
+        source: tuple[str, str] | None = None,
+        step: int = 1,
+    ) -> bool:
+        """Saves the data in the specified format and returns False if the conversion has to stop."""
 
         digits = int(digits)
 
-        # The available formats
-        format_mapping = {"tiff": fabio.tifimage.tifimage, "cbf": fabio.cbfimage.cbfimage}
+        if FORMATS.get(format).multi_frame:
+            raise ValueError(f"The {format} format stores whole stacks and cannot write single frames.")
+
+        # Given the (file, dataset) source, the frames verified by the manifest of the output directory are skipped
+        manifest = ManifestModel(Path(output_file).parent) if source is not None else None
+
+        if is_single_frame or data.ndim == 2:
+            # Single image
+            status = self._frame_status(manifest, output_file, source, 0)
+            if status is FrameStatus.CONFLICT:
+                self.set_status_message(f"Error: The file or directory '{output_file}' already exists. Conversion stopped to prevent data loss.")
+                return False
+            if status is FrameStatus.MISSING:
+                write_frame(data if data.ndim == 2 else data[0], output_file, format, self._frame_source(source, 0), self.compression)
+            return True
+
+        # Stack of images
+        indices, output_files, sources = [], [], []
+        for i in range(data.shape[0]):
+            # Append frame number to the file name with leading zeros, the frames of the window being step frames apart
+            frame = first_frame + i * step
+            output_file_with_frame = frame_file(output_file, frame, digits, format)
+            status = self._frame_status(manifest, output_file_with_frame, source, frame)
+
+            if status is FrameStatus.CONFLICT:
+                # Still write the frames that precede the existing file
+                self._write_frames(data, indices, output_files, format, sources)
+                self.set_status_message(f"Error: The file '{output_file_with_frame}' already exists. Conversion stopped to prevent data loss.")
+                return False
 
-        if format not in format_mapping:
-            raise ValueError(f"Unsupported format: {format}")
+            if status is FrameStatus.MISSING:
+                indices.append(i)
+                output_files.append(output_file_with_frame)
+                sources.append(self._frame_source(source, frame))
 
-        image_class = format_mapping[format]
+        self._write_frames(data, indices, output_files, format, sources)
 
-        output_path = Path(output_file)
+        return True
 
-        if output_path.exists():
+    def save_stack(
+        self,
+        node: h5py.Dataset,
+        output_file: str,
+        format: str,
+        source: tuple[str, str] | None = None,
+        selection: FrameSelection | None = None,
+        reduction: FrameReduction | None = None,
+        sources: tuple[tuple[str, str, int, int], ...] = (),
+        open_block: Callable[[str, str], h5py.Dataset] | None = None,
+    ) -> bool:
+        """Saves a whole dataset, or a stack stored in the given blocks of which node is the first, to a single file of a multi-frame format."""
+        manifest = ManifestModel(Path(output_file).parent) if source is not None else None
+        status = self._frame_status(manifest, output_file, source, 0)
+        if status is FrameStatus.CONFLICT:
             self.set_status_message(f"Error: The file or directory '{output_file}' already exists. Conversion stopped to prevent data loss.")
+            return False
+        if status is FrameStatus.COMPLETE:
+            return True
+
+        dtype = node.dtype if reduction is None else reduction.output_dtype(node.dtype)
+        if node.ndim == 2:
+            frame = FrameStreamModel.read_frame(node, selection)
+            frame = frame if reduction is None else reduction.reduce_frame(frame)
+            write_stack([frame[np.newaxis]], (1, *frame.shape), dtype, output_file, format, source, self.compression)
+            return True
+
+        frame_count = self._frame_count(node, sources)
+        frames = range(frame_count) if selection is None else selection.frames(frame_count)
+        group = 1 if reduction is None else reduction.frames
+        if len(frames) < group or not frames:
+            self.set_status_message(f"Not enough frames of dataset {source[1] if source else node.name} are selected.")
+            return True
+
+        # Stream the selected frames in bounded windows, reduced on the way, the writer appending them to the same file
+        frame_shape = node.shape[1:] if selection is None else selection.frame_shape(node.shape[1:])
+        shape = (len(frames) // group, *(frame_shape if reduction is None else reduction.output_shape(frame_shape)))
+        read = self._iter_windows(node, selection, group, sources, open_block)
+        windows = (data for _, data in reduce_windows(read, frames, reduction))
+        write_stack(windows, shape, dtype, output_file, format, source, self.compression)
+        return True
+
+    def _iter_windows(
+        self,
+        node: h5py.Dataset,
+        selection: FrameSelection | None,
+        group: int,
+        sources: tuple[tuple[str, str, int, int], ...] = (),
+        open_block: Callable[[str, str], h5py.Dataset] | None = None,
+    ) -> Iterator[tuple[int, np.ndarray]]:
+        """Yields the windows of the selected frames of the dataset, or of the stack stored in the blocks, the next one read while this one is written."""
+        if sources:
+            return self._stream.iter_linked_windows(sources, open_block, prefetch=True, selection=selection, group=group)
+        return self._stream.iter_windows(node, prefetch=True, selection=selection, group=group)
+
+    @staticmethod
+    def _frame_count(node: h5py.Dataset, sources: tuple[tuple[str, str, int, int], ...] = ()) -> int:
+        """Returns the number of frames of the dataset, or of the stack stored in the blocks."""
+        return sum(source[3] for source in sources) if sources else node.shape[0]
+
+    @staticmethod
+    def _frame_status(manifest: ManifestModel | None, output_file: str, source: tuple[str, str] | None, frame: int) -> FrameStatus:
+        """Returns the status of an output frame, any existing file being a conflict when there is no manifest."""
+        if manifest is None:
+            return FrameStatus.CONFLICT if Path(output_file).exists() else FrameStatus.MISSING
+        return manifest.status(output_file, *source, frame)
+
+    @staticmethod
+    def _frame_source(source: tuple[str, str] | None, frame: int) -> tuple[str, str, int] | None:
+        """Returns the (file, dataset, frame) source recorded in the manifest, if any."""
+        return None if source is None else (*source, frame)
+
+    def _write_frames(self, data: list, indices: list[int], output_files: list[str], format: str, sources: list) -> None:
+        """Writes the frames of the window at the given indices."""
+        if not indices:
             return
+        # The frames are passed as views of the window, the encoder copies them into its own buffers
+        self._encoder.write_frames((data[i] for i in indices), output_files, format, sources)
 
-        if is_single_frame or data.ndim == 2:
-            # Single image
-            image = image_class(data if data.ndim == 2 else data[0])
-            image.write(output_file)
-        else:
-            # Stack of images
-            for i in range(data.shape[0]):
-                image = image_class(data[i])
-                # Append frame number to the file name with leading zeros
-                frame_number = str(i + 1).zfill(digits) if digits > 1 else str(i + 1)
-                output_file_with_frame = f"{output_file}_{frame_number}.{format}"
-                output_frame_path = Path(output_file_with_frame)
-
-                if output_frame_path.exists():
-                    self.set_status_message(f"Error: The file '{output_file_with_frame}' already exists. Conversion stopped to prevent data loss.")
-                    return
-
-                image.write(output_file_with_frame)
-
-    def process(self, file_name: str, search_term: str, output_type: str, digits: int) -> None:
+    def process(
+        self,
+        file_name: str,
+        search_term: str | DatasetRules,
+        output_type: str,
+        digits: int,
+        selection: FrameSelection | None = None,
+        reduction: FrameReduction | None = None,
+    ) -> None:
         """Processes the HDF5 file and converts the datasets to the specified format."""
 
         image_count = 0
         frame_count = 0
 
-        # Get the base name and parent directory of the file
+        # Get the base name and parent directory of the file, reduced outputs being named after their reduction
         parent_dir = Path(file_name).parent
+        reduction = None if reduction is None or reduction.is_identity else reduction
         base_name = Path(file_name).stem
+        suffix = "" if reduction is None else f"_{reduction.suffix}"
 
-        def visit_func(name: str, node: h5py.Dataset) -> None:
+        def convert_dataset(name: str, node: h5py.Dataset, sources: tuple[tuple[str, str, int, int], ...], open_block: Callable) -> None:
             nonlocal image_count, frame_count
-            if isinstance(node, h5py.Dataset) and search_term in name:
-                image_count += 1
-                if len(node.shape) == 2:
-                    frame_count += 1
-                elif len(node.shape) > 2:
-                    frame_count += node.shape[0]
-                try:
-                    # Read the dataset using h5py
-                    with h5py.File(file_name, "r") as f:
-                        dataset = f[name]
-                        data = dataset[:]
-
-                    if data.ndim == 2 or (data.ndim == 3 and data.shape[0] == 1):
-                        # Single frame case
-                        output_file = parent_dir / f"{base_name}.{output_type}"
-                        if output_file.exists():
-                            self.set_status_message(f"Error: The file '{output_file}' already exists. Conversion stopped to prevent data loss.")
-                            return
-                        self.save_data(data, str(output_file), is_single_frame=True, digits=digits, format=output_type)
-                    else:
-                        # Multiple frames case
-                        output_dir = parent_dir / f"{base_name}_{output_type}"
-                        if output_dir.exists():
-                            self.set_status_message(f"Error: The directory '{output_dir}' already exists. Conversion stopped to prevent data loss.")
-                            return
-                        output_dir.mkdir(parents=True, exist_ok=True)
-                        output_file = output_dir / f"{base_name}"
-                        self.save_data(data, str(output_file), digits=digits, format=output_type)
-                except Exception as e:
-                    print(f"Error processing dataset {name}: {e}")
+            image_count += 1
+            if len(node.shape) == 2:
+                frame_count += 1
+            elif len(node.shape) > 2:
+                frame_count += self._frame_count(node, sources)
+            try:
+                output_format = FORMATS.get(output_type)
+                if output_format.multi_frame:
+                    # The whole dataset goes to a single container file next to the HDF5 file
+                    output_file = parent_dir / f"{base_name}{suffix}.{output_format.extension}"
+                    self.save_stack(node, str(output_file), output_type, (file_name, name), selection, reduction, sources, open_block)
+                elif node.ndim == 2 or (node.ndim == 3 and node.shape[0] == 1):
+                    # Single frame case
+                    output_file = parent_dir / f"{base_name}{suffix}.{output_format.extension}"
+                    data = FrameStreamModel.read_frame(node, selection)
+                    data = data if reduction is None else reduction.reduce_frame(data)
+                    self.save_data(data, str(output_file), is_single_frame=True, digits=digits, format=output_type, source=(file_name, name))
+                else:
+                    # Multiple frames case, an existing directory is resumed using its manifest
+                    output_dir = parent_dir / f"{base_name}_{output_type}{suffix}"
+                    output_dir.mkdir(parents=True, exist_ok=True)
+                    output_file = output_dir / f"{base_name}"
+
+                    # Stream the frames in bounded windows instead of reading the whole dataset, the next one read while this one is written
+                    count = self._frame_count(node, sources)
+                    frames = range(count) if selection is None else selection.frames(count)
+                    group = 1 if reduction is None else reduction.frames
+                    read = self._iter_windows(node, selection, group, sources, open_block)
+                    for outputs, data in reduce_windows(read, frames, reduction):
+                        source = (file_name, name)
+                        first_frame, step = outputs.start, outputs.step
+                        if not self.save_data(data, str(output_file), digits=digits, format=output_type, first_frame=first_frame, source=source, step=step):
+                            break
+
+                    # Wait for the frames still being written, reporting their errors with the dataset
+                    self._encoder.flush()
+            except Exception as e:
+                print(f"Error processing dataset {name}: {e}")
 
         if not Path(file_name).is_file():
             self.set_status_message(f"File {file_name} does not exist or cannot be accessed.")
             return
 
-        with h5py.File(file_name, "r") as file:
-            file.visititems(visit_func)
+        # The matching datasets come from the index, so the file is not traversed again
+        datasets = self._scheduler.index.datasets(file_name, search_term)
+        with h5py.File(file_name, "r") as file, ExitStack() as block_files:
+            # The blocks of a stack stored in other files are read from those files, each opened once
+            opened: dict[str, h5py.File] = {}
+
+            def open_block(block_file: str, name: str) -> h5py.Dataset:
+                if block_file not in opened:
+                    opened[block_file] = block_files.enter_context(h5py.File(block_file, "r"))
+                return opened[block_file][name]
+
+            for info in datasets:
+                node = open_block(*info.sources[0][:2]) if info.sources else file[info.name]
+                convert_dataset(info.name, node, info.sources, open_block)
+
+    def convert(
+        self,
+        file_names: list[str],
+        search_term: str | DatasetRules,
+        output_type: str,
+        digits: int,
+        selection: FrameSelection | None = None,
+        reduction: FrameReduction | None = None,
+    ) -> None:
+        """Converts the selected frames of a batch of files as frame level work units, balanced across the worker processes."""
+        # A cancel pressed from here on, while the files are indexed too, stops this conversion
+        self._scheduler.reset()
+        units, messages = self._scheduler.plan(file_names, search_term, output_type, digits, self.compression, selection, reduction)
+        for message in messages:
+            self.set_status_message(message)
+
+        # Estimate the size of the conversion from the indexed dataset shapes
+        datasets = len({(unit.file_name, unit.dataset) for unit in units})
+        frames = sum(len(unit.frames) for unit in units)
+        size = sum(unit.nbytes for unit in units) / 1024**2
+        self.set_status_message(f"Converting {frames} frame(s) ({size:.1f} MB) from {datasets} dataset(s).")
+
+        # Only a profiled conversion pays for timing its stages
+        profiler = ProfilerModel() if self.profiling else None
+        self._scheduler.run(units, self.set_status_message, self.progress_changed.emit, profiler)
+        if profiler is not None:
+            self.profile_ready.emit(profiler)
+
+    def cancel(self) -> None:
+        """Cancels the running conversion, which stops after the frames being written."""
+        self._scheduler.cancel()
+
+    def shutdown(self) -> None:
+        """Releases the encoder workers and the decompression threads, raising the first error of the frames written meanwhile."""
+        try:
+            self._encoder.shutdown()
+        finally:
+            if self._chunk_reader is not None:
+                self._chunk_reader.shutdown()
 
     @property
     def status_message(self) -> str:
         """Returns the status message."""
         return self._status_message
+
+    @property
+    def memory_budget(self) -> int:
+        """Returns the memory budget used while reading the datasets, in bytes."""
+        return self._stream.memory_budget
+
+    @memory_budget.setter
+    def memory_budget(self, value: int) -> None:
+        """Sets the memory budget used while reading the datasets, in bytes."""
+        self._stream.memory_budget = value
+        self._scheduler.memory_budget = value
+
+    @property
+    def workers(self) -> int:
+        """Returns the number of processes used to convert and encode the frames."""
+        return self._encoder.workers
+
+    @workers.setter
+    def workers(self, value: int) -> None:
+        """Sets the number of processes used to convert and encode the frames."""
+        self._encoder.workers = value
+        self._scheduler.workers = value
+
+    @property
+    def profiling(self) -> bool:
+        """Returns True if the stages of the conversions are timed."""
+        return self._profiling
+
+    @profiling.setter
+    def profiling(self, value: bool) -> None:
+        """Sets whether the stages of the conversions are timed."""
+        self._profiling = bool(value)
+
+    @property
+    def compression(self) -> str | None:
+        """Returns the compression of the TIFF frames."""
+        return self._encoder.compression
+
+    @compression.setter
+    def compression(self, value: str | None) -> None:
+        """Sets the compression of the TIFF frames."""
+        self._encoder.compression = value
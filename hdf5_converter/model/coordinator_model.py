@@ -0,0 +1,490 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/coordinator_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the coordinator model of the HDF5 Converter. It is responsible for handing
+# out the work units of a conversion to worker processes on any number of hosts,
+# leasing each unit so that the units of a lost worker are converted again.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Callable
+
+from hdf5_converter.model.format_registry_model import FORMATS
+from hdf5_converter.model.profiler_model import ProfilerModel
+from hdf5_converter.model.progress_model import Progress, ProgressModel
+from hdf5_converter.model.scheduler_model import WorkUnit, close_files, init_worker, run_profiled_unit, run_unit
+from hdf5_converter.model.settings_model import DEFAULT_LEASE, DEFAULT_MAX_OPEN_FILES, DEFAULT_MEMORY_BUDGET, DEFAULT_PORT, cluster_key
+
+
+# Default seconds a worker keeps trying to reach a coordinator that is not listening yet
+DEFAULT_CONNECT_TIMEOUT = 30.0
+
+# Times the lease of a work unit may be lost before the unit is given up
+MAX_ATTEMPTS = 3
+
+# Seconds a worker waits before asking again while every remaining unit is leased
+WAIT_INTERVAL = 1.0
+
+# Seconds between two lease renewals of a worker, which also carry its progress
+RENEW_INTERVAL = 0.5
+
+
+@dataclass
+class Lease:
+    """A work unit handed out to a worker, with the progress the worker reported for it."""
+
+    index: int
+    # The connection of the worker holding the unit
+    owner: int
+    deadline: float
+    frames: int = 0
+    nbytes: int = 0
+
+
+class CoordinatorModel:
+    """This class is responsible for handing out work units to the workers that connect to it, and for handing out again the units of lost workers."""
+
+    def __init__(
+        self,
+        address: tuple[str, int] = ("", DEFAULT_PORT),
+        authkey: str | bytes | None = None,
+        lease: float = DEFAULT_LEASE,
+        sync: bool = False,
+        drop_cache: bool = False,
+    ) -> None:
+        """Initialises the coordinator model and starts listening, the workers only being served once the units are run."""
+        self._listener = Listener(address, authkey=cluster_key(authkey))
+        self._address = self._listener.address
+        self._lease = max(RENEW_INTERVAL, lease)
+        self._sync = sync
+        self._drop_cache = drop_cache
+        self._profile = False
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._closed = threading.Event()
+        # The progress, messages and profiles of the workers, passed on by the thread running the units
+        self._events: queue.Queue = queue.Queue()
+        self._units: list[WorkUnit] = []
+        self._pending: list[int] = []
+        self._leases: dict[int, Lease] = {}
+        self._attempts: dict[int, int] = {}
+        self._next_lease = 0
+        self._connections = 0
+        self._reassigned = 0
+
+    def run(
+        self,
+        units: list[WorkUnit],
+        on_message: Callable[[str], None],
+        on_progress: Callable[[Progress], None] | None = None,
+        profiler: ProfilerModel | None = None,
+    ) -> None:
+        """Hands out the work units until the workers converted all of them, reporting the progress and merging the worker profiles if given a profiler."""
+        if profiler is not None:
+            profiler.start()
+
+        totals: dict[str, tuple[int, int]] = {}
+        for unit in units:
+            frames, nbytes = totals.get(unit.file_name, (0, 0))
+            totals[unit.file_name] = (frames + len(unit.frames), nbytes + unit.nbytes)
+        progress = ProgressModel(on_progress)
+        progress.start(totals)
+
+        with self._lock:
+            self._units = list(units)
+            # The most expensive first, popped from the end, so that the workers finish together
+            self._pending = sorted(reversed(range(len(units))), key=lambda index: units[index].cost)
+            self._profile = profiler is not None
+        threading.Thread(target=self._accept, daemon=True).start()
+
+        try:
+            while True:
+                with self._lock:
+                    self._expire([lease_id for lease_id, lease in self._leases.items() if lease.deadline < time.monotonic()])
+                    # A cancelled conversion hands out no new units, and waits for the leased ones to stop
+                    if self._cancel.is_set():
+                        self._pending.clear()
+                    finished = not self._pending and not self._leases
+                    running = len(self._leases)
+                if profiler is not None:
+                    profiler.sample("units", running)
+                self._drain(progress, on_message, profiler, 0.0 if finished else progress.interval)
+                if finished:
+                    break
+            self._linger()
+        finally:
+            self.close()
+
+        if self.cancelled:
+            snapshot = progress.snapshot()
+            on_message(f"Conversion cancelled after {snapshot.frames_done} of {snapshot.frames_total} frames, converting again resumes it.")
+        progress.finish()
+        if profiler is not None:
+            profiler.stop()
+
+    def cancel(self) -> None:
+        """Stops the conversion, the workers finishing the frame they are writing."""
+        self._cancel.set()
+
+    def close(self) -> None:
+        """Stops listening and serving the workers."""
+        self._closed.set()
+        self._listener.close()
+
+    def _accept(self) -> None:
+        """Serves every worker that connects with the shared secret in a thread of its own."""
+        while not self._closed.is_set():
+            try:
+                connection = self._listener.accept()
+            except (OSError, EOFError, multiprocessing.AuthenticationError):
+                # The listener was closed, or a client without the secret was turned away
+                continue
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection: Connection) -> None:
+        """Answers the requests of a worker until it disconnects, handing out again the units it held."""
+        owner = id(connection)
+        with self._lock:
+            self._connections += 1
+        try:
+            while not self._closed.is_set():
+                if connection.poll(RENEW_INTERVAL):
+                    connection.send(self._handle(owner, *connection.recv()))
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self._expire([lease_id for lease_id, lease in self._leases.items() if lease.owner == owner])
+                self._connections -= 1
+            connection.close()
+
+    def _handle(self, owner: int, request: str, *args) -> tuple:
+        """Returns the reply to a request of a worker."""
+        with self._lock:
+            if request == "hello":
+                return ("settings", {"sync": self._sync, "drop_cache": self._drop_cache, "profile": self._profile, "lease": self._lease})
+            if request == "lease":
+                return self._hand_out(owner)
+            if request == "renew":
+                return self._renew(*args)
+            if request == "result":
+                return self._finish(*args)
+        return ("error", f"Unknown request '{request}'.")
+
+    def _hand_out(self, owner: int) -> tuple:
+        """Leases the next work unit to a worker, or tells it to wait for the leased units or to stop."""
+        if self._cancel.is_set() or not (self._pending or self._leases):
+            return ("done",)
+
+        # The units of the writers that are not safe to run in several processes are converted by one worker at a time
+        serial = any(not FORMATS.get(self._units[lease.index].output_type).parallel_safe for lease in self._leases.values())
+        for position in reversed(range(len(self._pending))):
+            index = self._pending[position]
+            if not serial or FORMATS.get(self._units[index].output_type).parallel_safe:
+                del self._pending[position]
+                lease_id = self._next_lease
+                self._next_lease += 1
+                self._leases[lease_id] = Lease(index, owner, time.monotonic() + self._lease)
+                return ("unit", lease_id, self._units[index])
+        return ("wait", WAIT_INTERVAL)
+
+    def _renew(self, lease_id: int, events: list[tuple[str, int, int]]) -> tuple:
+        """Extends the lease of a work unit and records the progress reported with it, telling the worker if the unit was lost or cancelled."""
+        lease = self._leases.get(lease_id)
+        if lease is None:
+            return ("lost",)
+        self._record(lease, events)
+        lease.deadline = time.monotonic() + self._lease
+        return ("cancel",) if self._cancel.is_set() else ("ok",)
+
+    def _finish(self, lease_id: int, error: str | None, exception: str | None, profile: dict | None, events: list[tuple[str, int, int]]) -> tuple:
+        """Records the outcome of a work unit, unless its lease was lost and the unit handed out again."""
+        lease = self._leases.pop(lease_id, None)
+        if lease is None:
+            return ("ok",)
+        self._record(lease, events)
+        unit = self._units[lease.index]
+        if exception is not None:
+            self._events.put(("message", f"Error processing dataset {unit.dataset} of {unit.file_name}: {exception}"))
+        elif error is not None:
+            self._events.put(("message", error))
+        if profile is not None:
+            self._events.put(("profile", profile))
+        return ("ok",)
+
+    def _record(self, lease: Lease, events: list[tuple[str, int, int]]) -> None:
+        """Records the (file name, frames, bytes) progress of a leased work unit."""
+        for file_name, frames, nbytes in events:
+            lease.frames += frames
+            lease.nbytes += nbytes
+            self._events.put(("progress", (file_name, frames, nbytes)))
+
+    def _expire(self, lease_ids: list[int]) -> None:
+        """Takes back the leased work units, handing them out again unless they were lost too many times or the conversion was cancelled."""
+        for lease_id in lease_ids:
+            lease = self._leases.pop(lease_id)
+            unit = self._units[lease.index]
+            # The next worker reports the frames again, those already recorded as it verifies them
+            self._events.put(("progress", (unit.file_name, -lease.frames, -lease.nbytes)))
+            attempts = self._attempts[lease.index] = self._attempts.get(lease.index, 0) + 1
+            if attempts >= MAX_ATTEMPTS:
+                self._events.put(("message", f"Error processing dataset {unit.dataset} of {unit.file_name}: {attempts} workers were lost while converting it."))
+            elif not self._cancel.is_set():
+                self._pending.append(lease.index)
+                self._reassigned += 1
+
+    def _drain(self, progress: ProgressModel, on_message: Callable[[str], None], profiler: ProfilerModel | None, timeout: float) -> None:
+        """Passes the events of the workers on, waiting up to timeout seconds for the first one."""
+        try:
+            kind, value = self._events.get(timeout=timeout) if timeout > 0 else self._events.get_nowait()
+            while True:
+                if kind == "progress":
+                    progress.put(value)
+                elif kind == "message":
+                    on_message(value)
+                elif profiler is not None:
+                    profiler.merge(value)
+                kind, value = self._events.get_nowait()
+        except queue.Empty:
+            return
+
+    def _linger(self) -> None:
+        """Keeps serving the connected workers for a moment, so that the ones waiting for a unit learn that there are none left."""
+        deadline = time.monotonic() + 2 * WAIT_INTERVAL
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self._connections == 0:
+                    return
+            time.sleep(RENEW_INTERVAL / 5)
+
+    @property
+    def address(self) -> tuple[str, int]:
+        """Returns the (host, port) the coordinator listens on."""
+        return self._address
+
+    @property
+    def cancelled(self) -> bool:
+        """Returns True if the last conversion was cancelled."""
+        return self._cancel.is_set()
+
+    @property
+    def reassigned(self) -> int:
+        """Returns the number of times a work unit was handed out again after its worker was lost."""
+        return self._reassigned
+
+
+class RemoteWorkerModel:
+    """This class is responsible for converting the work units handed out by a coordinator, renewing their leases while it converts them."""
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        authkey: str | bytes | None = None,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+        direct_chunks: bool = True,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    ) -> None:
+        """Initialises the remote worker model."""
+        self._address = address
+        self._authkey = cluster_key(authkey)
+        self._memory_budget = memory_budget
+        self._max_open_files = max_open_files
+        self._direct_chunks = direct_chunks
+        self._connect_timeout = connect_timeout
+        self._name = f"{socket.gethostname()}:{os.getpid()}"
+        self._connection: Connection | None = None
+        # The send and reply of a request are never interleaved with the lease renewals
+        self._lock = threading.Lock()
+        # The progress of the unit being converted, sent with the next renewal
+        self._events: queue.SimpleQueue = queue.SimpleQueue()
+        # Set when the coordinator cancels the conversion or hands the unit being converted out again
+        self._cancel = threading.Event()
+        self._stopped = False
+
+    def run(self) -> list[str]:
+        """Converts work units until the coordinator has none left, and returns the error messages."""
+        host, port = self._address
+        try:
+            self._connection = self._connect()
+        except (OSError, multiprocessing.AuthenticationError) as e:
+            return [f"Could not connect to the coordinator at {host}:{port}: {e}"]
+
+        try:
+            _, settings = self._request("hello", self._name)
+            init_worker(
+                self._max_open_files,
+                self._memory_budget,
+                self._direct_chunks,
+                1,
+                settings["sync"],
+                settings["drop_cache"],
+                self._events,
+                self._cancel,
+                settings["profile"],
+            )
+            while True:
+                reply = self._request("lease")
+                if reply[0] == "done":
+                    return []
+                if reply[0] == "wait":
+                    time.sleep(reply[1])
+                    continue
+                _, lease_id, unit = reply
+                self._convert(lease_id, unit, settings)
+        except (EOFError, OSError) as e:
+            return [f"Lost the connection to the coordinator at {host}:{port}: {str(e) or 'closed by the coordinator'}"]
+        finally:
+            close_files()
+            self._connection.close()
+
+    def _connect(self) -> Connection:
+        """Connects to the coordinator, waiting for it to start listening if needed."""
+        deadline = time.monotonic() + self._connect_timeout
+        while True:
+            try:
+                return Client(self._address, authkey=self._authkey)
+            except ConnectionRefusedError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(WAIT_INTERVAL)
+
+    def _request(self, *request) -> tuple:
+        """Sends a request to the coordinator and returns its reply."""
+        with self._lock:
+            self._connection.send(request)
+            return self._connection.recv()
+
+    def _convert(self, lease_id: int, unit: WorkUnit, settings: dict) -> None:
+        """Converts a leased work unit, renewing its lease in a second thread, and reports its outcome."""
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(lease_id, stop, min(RENEW_INTERVAL, settings["lease"] / 3)), daemon=True)
+        heartbeat.start()
+        error = exception = profile = None
+        try:
+            if settings["profile"]:
+                error, profile = run_profiled_unit(unit)
+            else:
+                error = run_unit(unit)
+        except Exception as e:
+            exception = str(e)
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        self._request("result", lease_id, error, exception, profile, self._drain())
+        # A unit stopped because it was handed out again leaves the worker free for the next one
+        if not self._stopped:
+            self._cancel.clear()
+
+    def _heartbeat(self, lease_id: int, stop: threading.Event, interval: float) -> None:
+        """Renews the lease of a work unit with its progress until stopped, stopping the unit if the lease was lost or the conversion cancelled."""
+        while not stop.wait(interval):
+            try:
+                reply = self._request("renew", lease_id, self._drain())
+            except (EOFError, OSError):
+                # Another worker is given the unit once its lease expires, so this one stops writing it
+                self._cancel.set()
+                return
+            if reply[0] != "ok":
+                self._stopped = self._stopped or reply[0] == "cancel"
+                self._cancel.set()
+
+    def _drain(self) -> list[tuple[str, int, int]]:
+        """Returns the progress events reported since the last request."""
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+
+def run_worker(
+    address: tuple[str, int],
+    authkey: str | bytes | None = None,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+    direct_chunks: bool = True,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+) -> list[str]:
+    """Converts the work units of the coordinator at address in the current process, and returns the error messages."""
+    return RemoteWorkerModel(address, authkey, memory_budget, max_open_files, direct_chunks, connect_timeout).run()
+
+
+def run_workers(
+    address: tuple[str, int],
+    workers: int = 1,
+    authkey: str | bytes | None = None,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+    direct_chunks: bool = True,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+) -> list[str]:
+    """Converts the work units of the coordinator at address in worker processes sharing the memory budget and open files, and returns the error messages."""
+    authkey = cluster_key(authkey)
+    # Every worker keeps at least one HDF5 file open, so there are never more workers than open files
+    workers = max(1, min(workers, max_open_files))
+    if workers <= 1:
+        return run_worker(address, authkey, memory_budget, max_open_files, direct_chunks, connect_timeout)
+
+    # Processes of their own rather than a pool, so that they stop with the coordinator even if this process is killed
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=_run_worker_process,
+            args=(results, address, authkey, memory_budget // workers, max_open_files // workers, direct_chunks, connect_timeout),
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    messages: list[str] = []
+    reported = 0
+    while reported < workers:
+        try:
+            messages.extend(results.get(timeout=WAIT_INTERVAL))
+            reported += 1
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+    for process in processes:
+        process.join()
+        if process.exitcode:
+            messages.append(f"A worker process stopped with exit code {process.exitcode}.")
+    return messages
+
+
+def _run_worker_process(results: multiprocessing.Queue, *args) -> None:
+    """Runs a worker in a process of its own, putting its error messages in results."""
+    results.put(run_worker(*args))
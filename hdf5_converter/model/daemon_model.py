@@ -0,0 +1,385 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/daemon_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the daemon model of the HDF5 Converter. It is responsible for running the
+# conversion jobs submitted to a long-running process on a warm pool of workers,
+# and for serving their submission, status and cancellation over HTTP.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import glob
+import heapq
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+from hdf5_converter.model.dataset_index_model import DatasetIndexModel, default_cache_dir
+from hdf5_converter.model.dataset_rule_model import DatasetRules
+from hdf5_converter.model.format_registry_model import FORMATS
+from hdf5_converter.model.frame_reduction_model import FrameReduction
+from hdf5_converter.model.frame_selection_model import FrameSelection
+from hdf5_converter.model.progress_model import Progress
+from hdf5_converter.model.scheduler_model import SchedulerModel
+from hdf5_converter.model.settings_model import DEFAULT_DAEMON_PORT, DEFAULT_MAX_OPEN_FILES, DEFAULT_MEMORY_BUDGET
+
+
+# Finished jobs kept for the status queries, the oldest being forgotten first
+MAX_FINISHED_JOBS = 1000
+
+# Largest job accepted by the job API, in bytes
+MAX_JOB_SIZE = 1024 * 1024
+
+# The options of a job and their defaults, those of a conversion of the command line interface
+JOB_OPTIONS = {
+    "files": [],
+    "search_term": "data",
+    "output_type": "tiff",
+    "digits": 3,
+    "compression": None,
+    "frames": "",
+    "roi": "",
+    "sum": None,
+    "mean": None,
+    "bin": 1,
+    "dtype": None,
+    "mask_invalid": False,
+    "priority": 0,
+}
+
+
+class JobState(Enum):
+    """The state of a job submitted to the daemon."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+@dataclass
+class Job:
+    """A conversion submitted to the daemon, with the options of ConverterModel.process and its state."""
+
+    id: int
+    files: list[str]
+    search_term: DatasetRules
+    output_type: str
+    digits: int
+    compression: str | None = None
+    selection: FrameSelection | None = None
+    reduction: FrameReduction | None = None
+    # Jobs of a higher priority run first, those of the same priority in the order they were submitted
+    priority: int = 0
+    state: JobState = JobState.QUEUED
+    messages: list[str] = field(default_factory=list)
+    progress: Progress | None = None
+    cancel_requested: bool = False
+    submitted: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+
+    @classmethod
+    def from_dict(cls, job_id: int, options: dict) -> "Job":
+        """Returns the job of the options of a submitted JSON object, raising a ValueError if any of them is invalid."""
+        if not isinstance(options, dict):
+            raise ValueError("A job is a JSON object of conversion options.")
+        unknown = sorted(set(options) - set(JOB_OPTIONS))
+        if unknown:
+            raise ValueError(f"Unknown job options: {', '.join(unknown)}.")
+        options = {**JOB_OPTIONS, **options}
+
+        files = [options["files"]] if isinstance(options["files"], str) else options["files"]
+        if not files or not isinstance(files, list) or not all(isinstance(file_name, str) for file_name in files):
+            raise ValueError("A job needs a list of HDF5 files or glob patterns.")
+        # The rules are given in the text notation, or as a rule set saved from the dataset browser
+        search_term = options["search_term"]
+        rules = DatasetRules.from_dict(search_term) if isinstance(search_term, dict) else DatasetRules.parse(str(search_term))
+        FORMATS.get(options["output_type"]).check_compression(options["compression"])
+        try:
+            digits, priority = int(options["digits"]), int(options["priority"])
+        except (TypeError, ValueError):
+            raise ValueError("The digits and the priority of a job are integers.") from None
+        if not 1 <= digits <= 10:
+            raise ValueError("The digits of the frame numbers must be from 1 to 10.")
+        if options["sum"] and options["mean"]:
+            raise ValueError("A job either sums or averages the frames, not both.")
+
+        selection = FrameSelection.parse(str(options["frames"]), str(options["roi"]))
+        frames = options["sum"] or options["mean"] or 1
+        reduction = FrameReduction(int(frames), bool(options["mean"]), int(options["bin"]), options["dtype"], bool(options["mask_invalid"]))
+        return cls(job_id, files, rules, options["output_type"], digits, options["compression"], selection, reduction, priority)
+
+    def to_dict(self) -> dict:
+        """Returns the options and the state of the job as a JSON object."""
+        progress = self.progress
+        return {
+            "id": self.id,
+            "state": self.state.value,
+            "priority": self.priority,
+            "files": self.files,
+            "search_term": str(self.search_term),
+            "output_type": self.output_type,
+            "digits": self.digits,
+            "frames_done": 0 if progress is None else progress.frames_done,
+            "frames_total": 0 if progress is None else progress.frames_total,
+            "mb_per_second": 0.0 if progress is None else round(progress.mb_per_second, 2),
+            "eta": None if progress is None or progress.eta is None else round(progress.eta, 1),
+            "messages": list(self.messages),
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class DaemonModel:
+    """This class is responsible for running the submitted conversion jobs one at a time on a warm pool of worker processes, the highest priority first."""
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+        index_cache: bool = True,
+        direct_chunks: bool = True,
+        sync: bool = False,
+        drop_cache: bool = False,
+        on_message: Callable[[str], None] | None = None,
+    ) -> None:
+        """Initialises the daemon model, reporting the messages of the jobs to on_message."""
+        index = DatasetIndexModel(default_cache_dir() if index_cache else None)
+        # The worker processes, their libraries and their open HDF5 files are kept from one job to the next
+        self._scheduler = SchedulerModel(workers, memory_budget, max_open_files, index, direct_chunks, sync, drop_cache, persistent=True)
+        self._on_message = on_message
+        self._lock = threading.Condition()
+        self._jobs: dict[int, Job] = {}
+        # The (negated priority, id) of the queued jobs
+        self._queue: list[tuple[int, int]] = []
+        self._next_id = 1
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        """Starts the worker processes and loads their libraries, then starts running the jobs."""
+        self._scheduler.warm_up()
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stops the running job after the frames being written, and stops the worker processes."""
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+        self._scheduler.cancel()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._scheduler.shutdown()
+
+    def submit(self, options: dict) -> dict:
+        """Queues a job with the options of a submitted JSON object, and returns its state."""
+        with self._lock:
+            try:
+                job = Job.from_dict(self._next_id, options)
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"Invalid job options: {e}") from None
+            self._next_id += 1
+            self._jobs[job.id] = job
+            heapq.heappush(self._queue, (-job.priority, job.id))
+            self._lock.notify_all()
+            return job.to_dict()
+
+    def status(self, job_id: int) -> dict:
+        """Returns the state of a job, raising a KeyError if there is no such job."""
+        with self._lock:
+            return self._jobs[job_id].to_dict()
+
+    def statuses(self) -> list[dict]:
+        """Returns the state of every job kept by the daemon, in the order they were submitted."""
+        with self._lock:
+            return [job.to_dict() for job in self._jobs.values()]
+
+    def cancel(self, job_id: int) -> dict:
+        """Cancels a queued job, or stops a running one after the frames being written, and returns its state."""
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.state is JobState.QUEUED:
+                job.state = JobState.CANCELLED
+                job.finished = time.time()
+            elif job.state is JobState.RUNNING:
+                job.cancel_requested = True
+                self._scheduler.cancel()
+            return job.to_dict()
+
+    def _run(self) -> None:
+        """Runs the queued jobs, the highest priority first, until the daemon is closed."""
+        while True:
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._lock.wait()
+                if self._closed:
+                    return
+                _, job_id = heapq.heappop(self._queue)
+                job = self._jobs.get(job_id)
+                # Jobs cancelled while they were queued are skipped
+                if job is None or job.state is not JobState.QUEUED:
+                    continue
+                job.state = JobState.RUNNING
+                job.started = time.time()
+                # Cleared with the lock held, so that a cancel of the job from now on stops it, even while it is planned
+                self._scheduler.reset()
+
+            self._convert(job)
+
+            with self._lock:
+                job.finished = time.time()
+                if job.cancel_requested:
+                    job.state = JobState.CANCELLED
+                else:
+                    job.state = JobState.FAILED if job.messages else JobState.COMPLETED
+                self._forget_finished()
+            self._report(f"Job {job.id} {job.state.value} in {job.finished - job.started:.2f} seconds.")
+
+    def _convert(self, job: Job) -> None:
+        """Converts the files of a job on the warm pool, recording its messages and progress."""
+
+        def report(message: str) -> None:
+            with self._lock:
+                job.messages.append(message)
+            self._report(f"Job {job.id}: {message}")
+
+        def update(progress: Progress) -> None:
+            with self._lock:
+                job.progress = progress
+
+        # The patterns are expanded when the job starts, so that it finds the files written since it was queued
+        files: set[str] = set()
+        for pattern in job.files:
+            matches = glob.glob(pattern, recursive=True)
+            files.update(os.path.abspath(file_name) for file_name in (matches if matches else [pattern]))
+
+        try:
+            units, messages = self._scheduler.plan(sorted(files), job.search_term, job.output_type, job.digits, job.compression, job.selection, job.reduction)
+            for message in messages:
+                report(message)
+            self._scheduler.run(units, report, update)
+        except Exception as e:
+            report(f"Error running job {job.id}: {e}")
+
+    def _forget_finished(self) -> None:
+        """Forgets the oldest finished jobs beyond the number kept for the status queries."""
+        finished = [job.id for job in self._jobs.values() if job.finished is not None]
+        for job_id in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _report(self, message: str) -> None:
+        """Passes a message to the callback, if any."""
+        if self._on_message is not None:
+            self._on_message(message)
+
+    @property
+    def workers(self) -> int:
+        """Returns the number of worker processes of the warm pool."""
+        return self._scheduler.pool_workers
+
+
+class DaemonServerModel(ThreadingHTTPServer):
+    """This class is responsible for serving the job API of a daemon over HTTP: POST /jobs, GET /jobs, GET /jobs/ID and DELETE /jobs/ID."""
+
+    def __init__(self, daemon: DaemonModel, address: tuple[str, int] = ("localhost", DEFAULT_DAEMON_PORT)) -> None:
+        """Initialises the daemon server model and starts listening on address."""
+        super(DaemonServerModel, self).__init__(address, JobRequestHandler)
+        self.daemon = daemon
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """This class is responsible for answering a request to the job API with a JSON object."""
+
+    server: DaemonServerModel
+
+    def do_GET(self) -> None:
+        """Returns the state of every job, or of a single one."""
+        job_id = self._job_id()
+        if self.path.rstrip("/") == "/jobs":
+            self._reply(HTTPStatus.OK, {"workers": self.server.daemon.workers, "jobs": self.server.daemon.statuses()})
+        elif job_id is not None:
+            self._call(HTTPStatus.OK, self.server.daemon.status, job_id)
+        else:
+            self._reply(HTTPStatus.NOT_FOUND, {"error": f"No such resource: {self.path}"})
+
+    def do_POST(self) -> None:
+        """Queues the job in the body of the request."""
+        if self.path.rstrip("/") != "/jobs":
+            self._reply(HTTPStatus.NOT_FOUND, {"error": f"No such resource: {self.path}"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_JOB_SIZE:
+            self._reply(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": f"A job is at most {MAX_JOB_SIZE} bytes."})
+            return
+        try:
+            options = json.loads(self.rfile.read(length) or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            self._reply(HTTPStatus.BAD_REQUEST, {"error": f"Invalid JSON: {e}"})
+            return
+        self._call(HTTPStatus.CREATED, self.server.daemon.submit, options)
+
+    def do_DELETE(self) -> None:
+        """Cancels a job."""
+        job_id = self._job_id()
+        if job_id is None:
+            self._reply(HTTPStatus.NOT_FOUND, {"error": f"No such resource: {self.path}"})
+            return
+        self._call(HTTPStatus.OK, self.server.daemon.cancel, job_id)
+
+    def _job_id(self) -> int | None:
+        """Returns the id of the job of a /jobs/ID path, None for any other path."""
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+            return int(parts[1])
+        return None
+
+    def _call(self, status: HTTPStatus, method: Callable, argument: int | dict) -> None:
+        """Replies with the result of a method of the daemon, or with the error it raised."""
+        try:
+            self._reply(status, method(argument))
+        except KeyError:
+            self._reply(HTTPStatus.NOT_FOUND, {"error": f"No such job: {argument}"})
+        except (TypeError, ValueError) as e:
+            self._reply(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+
+    def _reply(self, status: HTTPStatus, content: dict | list) -> None:
+        """Sends a JSON reply."""
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """Keeps the requests out of the output of the daemon, which only reports the jobs."""
@@ -0,0 +1,158 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/dataset_browser_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the dataset browser model of the HDF5 Converter. It is responsible for
+# reading the metadata of the nodes of an HDF5 file only when they are opened, and
+# previews of their frames decimated by a strided read.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import math
+from dataclasses import dataclass
+
+import h5py
+import numpy as np
+
+from hdf5_converter.model.chunk_reader_model import load_filters
+from hdf5_converter.model.dataset_index_model import BLOCK_LINK, DatasetInfo
+
+
+# The kinds of node: a group, a dataset, or a link whose target is missing
+NODE_KINDS = ("group", "dataset", "missing")
+
+# The largest side of a preview, in pixels
+PREVIEW_SIZE = 512
+
+# The percentiles of the pixels shown black and white in a preview
+PREVIEW_PERCENTILES = (1.0, 99.5)
+
+
+@dataclass(frozen=True)
+class BrowserNode:
+    """A node of an HDF5 file as shown by the dataset browser, with the metadata of a dataset."""
+
+    name: str
+    kind: str
+    info: DatasetInfo | None = None
+    has_children: bool = False
+    # The stack a numbered external link is converted as, joined with the other blocks of its group
+    stack: str | None = None
+
+    @property
+    def rule_name(self) -> str:
+        """Returns the name the dataset rules match for the node, the name of its stack for a block."""
+        return self.stack or self.name
+
+    @property
+    def base_name(self) -> str:
+        """Returns the name of the node in its group."""
+        return self.name.rsplit("/", 1)[-1]
+
+    def describe(self) -> str:
+        """Returns the shape, data type, chunks and filters of a dataset, or the kind of the other nodes."""
+        if self.info is None:
+            return "missing link target" if self.kind == "missing" else "group"
+        info = self.info
+        parts = [str(info.dtype), " x ".join(str(size) for size in info.shape) or "scalar"]
+        parts.append("contiguous" if info.chunks is None else f"chunks {' x '.join(str(size) for size in info.chunks)}")
+        # The filter names of the plugins carry their URL after a semicolon
+        parts.extend(name.split(";")[0].strip() for _, name in info.filters)
+        if self.stack is not None:
+            parts.append(f"block of {self.stack}")
+        return ", ".join(parts)
+
+
+class DatasetBrowserModel:
+    """This class is responsible for browsing an HDF5 file, reading the metadata of a group only when it is opened."""
+
+    def __init__(self, file_name: str) -> None:
+        """Initialises the dataset browser model, opening the file without reading any of its nodes."""
+        self._file_name = file_name
+        self._file = h5py.File(file_name, "r")
+
+    def children(self, name: str = "") -> list[BrowserNode]:
+        """Returns the nodes of a group, reading the metadata of its direct members only."""
+        group = self._file[name] if name else self._file
+        stacks = self._stacks(group, name)
+        nodes = []
+        for key in group:
+            path = f"{name}/{key}" if name else key
+            try:
+                node = group[key]
+            except KeyError:
+                # A soft or external link whose target is missing
+                nodes.append(BrowserNode(path, "missing"))
+                continue
+            if isinstance(node, h5py.Dataset):
+                nodes.append(BrowserNode(path, "dataset", DatasetInfo.from_dataset(path, node), stack=stacks.get(key)))
+            else:
+                nodes.append(BrowserNode(path, "group", has_children=len(node) > 0))
+        return nodes
+
+    @staticmethod
+    def _stacks(group: h5py.Group, name: str) -> dict[str, str]:
+        """Returns the stack of each numbered external link of the group that the index joins with others, like the blocks of an Eiger master file."""
+        numbered: dict[str, list[str]] = {}
+        for key in group:
+            match = BLOCK_LINK.fullmatch(key)
+            if match and isinstance(group.get(key, getlink=True), h5py.ExternalLink):
+                numbered.setdefault(f"{name}/{match['name']}" if name else match["name"], []).append(key)
+        # A single link keeps its own name
+        return {key: stack for stack, keys in numbered.items() if len(keys) > 1 for key in keys}
+
+    def preview(self, name: str, frame: int = 0, size: int = PREVIEW_SIZE) -> np.ndarray:
+        """Returns a frame of the dataset decimated to at most size pixels a side, reading only every step rows and columns."""
+        dataset = self._file[name]
+        if dataset.ndim < 2 or dataset.dtype.kind not in "uifb":
+            raise ValueError(f"{name} is not a stack of frames.")
+
+        rows, columns = dataset.shape[-2:]
+        step = max(1, math.ceil(max(rows, columns) / max(1, size)))
+        # The first axis of a stack numbers its frames, further axes are read at their first index
+        index = tuple(min(max(0, frame), dataset.shape[0] - 1) if axis == 0 else 0 for axis in range(dataset.ndim - 2))
+        load_filters()
+        return dataset[(*index, slice(None, None, step), slice(None, None, step))]
+
+    @staticmethod
+    def preview_image(frame: np.ndarray) -> np.ndarray:
+        """Returns a preview as 8 bit gray levels, stretched between percentiles and with the Eiger invalid pixels shown black."""
+        values = frame.astype(np.float32)
+        if frame.dtype.kind in "ui":
+            # The largest value of the data type marks the gaps, dead pixels and overflows of the Eiger detectors
+            values[frame == np.iinfo(frame.dtype).max] = np.nan
+        values[~np.isfinite(values)] = np.nan
+        if np.isnan(values).all():
+            return np.zeros(frame.shape, dtype=np.uint8)
+
+        low, high = np.nanpercentile(values, PREVIEW_PERCENTILES)
+        scaled = (values - low) / max(float(high - low), 1e-12) * 255
+        return np.ascontiguousarray(np.nan_to_num(np.clip(scaled, 0, 255), nan=0.0).astype(np.uint8))
+
+    def close(self) -> None:
+        """Closes the file."""
+        self._file.close()
+
+    @property
+    def file_name(self) -> str:
+        """Returns the name of the browsed file."""
+        return self._file_name
@@ -0,0 +1,322 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/dataset_index_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the dataset index model of the HDF5 Converter. It is responsible for
+# walking each HDF5 file once, recording the metadata of its datasets, including the
+# stacks split over several files by external links or virtual datasets, and caching
+# it on disk, so that planning a batch never has to traverse the same file again.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import hashlib
+import json
+import os
+import re
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from hdf5_converter.model.dataset_rule_model import DatasetRules
+
+
+# Increase when the cached records change, so that older caches are rebuilt
+INDEX_VERSION = 2
+
+# The numbered external links of a stack split in blocks, e.g. entry/data/data_000001 of an Eiger master file
+BLOCK_LINK = re.compile(r"(?P<name>.*?)_?(?P<number>\d+)")
+
+
+def default_cache_dir() -> Path:
+    """Returns the directory of the on-disk index cache, which HDF5CONVERTER_CACHE_DIR overrides."""
+    if "HDF5CONVERTER_CACHE_DIR" in os.environ:
+        return Path(os.environ["HDF5CONVERTER_CACHE_DIR"])
+    if sys.platform == "win32":
+        return Path(os.environ.get("LOCALAPPDATA", Path.home())) / "HDF5Converter" / "index"
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Caches" / "HDF5Converter" / "index"
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "hdf5converter" / "index"
+
+
+@dataclass(frozen=True)
+class DatasetInfo:
+    """The metadata of a dataset, as needed to plan and convert it without opening the file."""
+
+    name: str
+    shape: tuple[int, ...]
+    maxshape: tuple[int | None, ...]
+    dtype_str: str
+    chunks: tuple[int, ...] | None
+    compression: str | None
+    filters: tuple[tuple[int, str], ...]
+    # The (file, dataset, first frame, frames) blocks of a stack stored in other files, in frame order, empty for a dataset read as it is
+    sources: tuple[tuple[str, str, int, int], ...] = ()
+
+    @classmethod
+    def from_dataset(cls, name: str, dataset: h5py.Dataset, sources: tuple[tuple[str, str, int, int], ...] = ()) -> "DatasetInfo":
+        """Returns the metadata of an open dataset, the first block of the given sources if any."""
+        plist = dataset.id.get_create_plist()
+        filters = []
+        for i in range(plist.get_nfilters()):
+            code, _, _, filter_name = plist.get_filter(i)
+            filters.append((int(code), filter_name.decode(errors="replace") if isinstance(filter_name, bytes) else str(filter_name)))
+
+        return cls(
+            name=name,
+            shape=tuple(dataset.shape),
+            maxshape=tuple(dataset.maxshape) if dataset.maxshape is not None else tuple(dataset.shape),
+            dtype_str=dataset.dtype.str,
+            chunks=tuple(dataset.chunks) if dataset.chunks else None,
+            compression=dataset.compression,
+            filters=tuple(filters),
+            sources=sources,
+        )
+
+    @classmethod
+    def from_record(cls, record: dict) -> "DatasetInfo":
+        """Returns the metadata stored in a cache record."""
+        return cls(
+            name=record["name"],
+            shape=tuple(record["shape"]),
+            maxshape=tuple(record["maxshape"]),
+            dtype_str=record["dtype_str"],
+            chunks=tuple(record["chunks"]) if record["chunks"] else None,
+            compression=record["compression"],
+            filters=tuple(tuple(item) for item in record["filters"]),
+            sources=tuple(tuple(item) for item in record.get("sources", ())),
+        )
+
+    @property
+    def dtype(self) -> np.dtype:
+        """Returns the data type of the dataset."""
+        return np.dtype(self.dtype_str)
+
+    @property
+    def ndim(self) -> int:
+        """Returns the number of dimensions of the dataset."""
+        return len(self.shape)
+
+    @property
+    def is_single_frame(self) -> bool:
+        """Returns True if the dataset holds a single 2D frame."""
+        return self.ndim == 2 or (self.ndim == 3 and self.shape[0] == 1)
+
+    @property
+    def frame_count(self) -> int:
+        """Returns the number of frames of the dataset."""
+        if self.ndim == 2:
+            return 1
+        return self.shape[0] if self.ndim > 2 else 0
+
+    @property
+    def frame_bytes(self) -> int:
+        """Returns the size of a single frame in bytes."""
+        frame_shape = self.shape if self.ndim == 2 else self.shape[1:]
+        return max(1, int(np.prod(frame_shape, dtype=np.int64)) * self.dtype.itemsize)
+
+
+class DatasetIndexModel:
+    """This class is responsible for indexing the datasets of the HDF5 files, keyed by path, modification time and size."""
+
+    def __init__(self, cache_dir: Path | None = None) -> None:
+        """Initialises the dataset index model, a None cache directory keeping the index in memory only."""
+        self._cache_dir = cache_dir
+        self._indexes: dict[str, tuple[tuple[int, int], list[DatasetInfo], list]] = {}
+
+    def datasets(self, file_name: str, search_term: str | DatasetRules) -> list[DatasetInfo]:
+        """Returns the metadata of the datasets of the file selected by the search term or the dataset rules, from the index alone."""
+        rules = DatasetRules.of(search_term)
+        return [info for info in self.index(file_name) if rules.matches(info.name)]
+
+    def index(self, file_name: str) -> list[DatasetInfo]:
+        """Returns the metadata of every dataset of the file, walking it only if it changed since it was indexed."""
+        key = str(Path(file_name).resolve())
+        stat = os.stat(key)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        # The datasets stored in other files are indexed again whenever one of those files changes too
+        cached = self._indexes.get(key)
+        if cached is not None and cached[0] == signature and cached[2] == self._linked_signature(cached[1]):
+            return cached[1]
+
+        infos = self._load(key, signature)
+        if infos is None:
+            infos = self._walk(key)
+            self._save(key, signature, infos)
+
+        self._indexes[key] = (signature, infos, self._linked_signature(infos))
+        return infos
+
+    @staticmethod
+    def _linked_signature(infos: list[DatasetInfo]) -> list[list]:
+        """Returns the path, modification time and size of every file the datasets are read from."""
+        signature = []
+        for file_name in sorted({source[0] for info in infos for source in info.sources}):
+            try:
+                stat = os.stat(file_name)
+                signature.append([file_name, stat.st_mtime_ns, stat.st_size])
+            except OSError:
+                signature.append([file_name, None, None])
+        return signature
+
+    @classmethod
+    def _walk(cls, file_name: str) -> list[DatasetInfo]:
+        """Walks the file once, reading only the metadata of its datasets and of the datasets its external links point to."""
+        infos: list[DatasetInfo] = []
+        links: list[str] = []
+
+        def visit_func(name: str, node: h5py.Dataset) -> None:
+            if not isinstance(node, h5py.Dataset):
+                return
+            sources = cls._virtual_sources(file_name, node)
+            if not sources:
+                infos.append(DatasetInfo.from_dataset(name, node))
+                return
+            # The frames of a virtual dataset are read from its sources, so it takes their layout
+            with h5py.File(sources[0][0], "r") as source_file:
+                infos.append(cls._stack_info(name, source_file[sources[0][1]], node.shape, sources))
+
+        def visit_links(name: str, link: h5py.SoftLink | h5py.ExternalLink | h5py.HardLink) -> None:
+            if isinstance(link, h5py.ExternalLink):
+                links.append(name)
+
+        with h5py.File(file_name, "r") as file:
+            file.visititems(visit_func)
+            file.visititems_links(visit_links)
+            infos.extend(cls._linked_stacks(file, links))
+
+        return infos
+
+    @classmethod
+    def _linked_stacks(cls, file: h5py.File, links: list[str]) -> list[DatasetInfo]:
+        """Returns the stacks the external links of the file point to, the numbered links of the same group joined into one stack."""
+        blocks: dict[str, list[tuple[int, str]]] = {}
+        for name in links:
+            match = BLOCK_LINK.fullmatch(name)
+            stack, number = (match["name"], int(match["number"])) if match else (name, 0)
+            blocks.setdefault(stack, []).append((number, name))
+
+        infos = []
+        for stack, numbered in blocks.items():
+            first, sources = None, []
+            for _, name in sorted(numbered):
+                try:
+                    node = file.get(name)
+                except (KeyError, OSError):
+                    node = None
+                # A missing block ends the stack, the frames after it cannot be numbered
+                if not isinstance(node, h5py.Dataset) or node.ndim < 3:
+                    break
+                if first is not None and (node.dtype != first.dtype or node.shape[1:] != first.shape[1:]):
+                    break
+                first = first if first is not None else node
+                sources.append((str(Path(node.file.filename).resolve()), node.name, 0, node.shape[0]))
+
+            if first is None:
+                continue
+            # A single link keeps its own name
+            stack = numbered[0][1] if len(numbered) == 1 else stack
+            infos.append(cls._stack_info(stack, first, (sum(source[3] for source in sources), *first.shape[1:]), tuple(sources)))
+        return infos
+
+    @staticmethod
+    def _stack_info(name: str, first: h5py.Dataset, shape: tuple[int, ...], sources: tuple[tuple[str, str, int, int], ...]) -> DatasetInfo:
+        """Returns the metadata of a stack of the given shape stored in blocks, which takes the layout of its first block."""
+        info = DatasetInfo.from_dataset(name, first, sources)
+        return DatasetInfo(info.name, tuple(shape), tuple(shape), info.dtype_str, info.chunks, info.compression, info.filters, info.sources)
+
+    @staticmethod
+    def _virtual_sources(file_name: str, dataset: h5py.Dataset) -> tuple[tuple[str, str, int, int], ...]:
+        """Returns the blocks of a virtual dataset made of whole frames of other datasets, or nothing if HDF5 has to read it."""
+        if not dataset.is_virtual or dataset.ndim < 3 or dataset.shape[0] < 2:
+            return ()
+
+        frame_points = int(np.prod(dataset.shape[1:], dtype=np.int64))
+        sources = []
+        try:
+            for mapping in sorted(dataset.virtual_sources(), key=lambda mapping: mapping.vspace.get_select_bounds()[0][0]):
+                (start, *corner), (end, *_) = mapping.vspace.get_select_bounds()
+                frames = end - start + 1
+                # Every mapping must be a run of whole frames, following the previous one without a gap
+                if any(corner) or mapping.vspace.get_select_npoints() != frames * frame_points:
+                    return ()
+                # A source selected as a whole starts at its first frame
+                source_start = 0
+                if mapping.src_space.get_select_type() != h5py.h5s.SEL_ALL:
+                    if mapping.src_space.get_select_npoints() != frames * frame_points:
+                        return ()
+                    (source_start, *_), _ = mapping.src_space.get_select_bounds()
+                if start != sum(source[3] for source in sources):
+                    return ()
+                # Sources are found relative to the virtual dataset, "." being its own file
+                source_file = Path(file_name) if mapping.file_name == "." else Path(file_name).parent / mapping.file_name
+                if not source_file.is_file():
+                    return ()
+                sources.append((str(source_file.resolve()), mapping.dset_name, int(source_start), int(frames)))
+        except (ValueError, RuntimeError, OSError):
+            return ()
+
+        return tuple(sources) if sum(source[3] for source in sources) == dataset.shape[0] else ()
+
+    def _cache_file(self, key: str) -> Path:
+        """Returns the cache file of an indexed file."""
+        return self._cache_dir / f"{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+    def _load(self, key: str, signature: tuple[int, int]) -> list[DatasetInfo] | None:
+        """Returns the cached index of the file, or None if it is missing or outdated."""
+        if self._cache_dir is None:
+            return None
+
+        try:
+            record = json.loads(self._cache_file(key).read_text())
+        except (OSError, ValueError):
+            return None
+
+        if record.get("version") != INDEX_VERSION or record.get("path") != key or tuple(record.get("signature", ())) != signature:
+            return None
+
+        infos = [DatasetInfo.from_record(item) for item in record["datasets"]]
+        return infos if record.get("linked", []) == self._linked_signature(infos) else None
+
+    def _save(self, key: str, signature: tuple[int, int], infos: list[DatasetInfo]) -> None:
+        """Stores the index of the file in the cache, a read-only cache being silently skipped."""
+        if self._cache_dir is None:
+            return
+
+        record = {
+            "version": INDEX_VERSION,
+            "path": key,
+            "signature": list(signature),
+            "linked": self._linked_signature(infos),
+            "datasets": [asdict(info) for info in infos],
+        }
+        cache_file = self._cache_file(key)
+        try:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            partial_file = cache_file.with_suffix(f".{os.getpid()}.part")
+            partial_file.write_text(json.dumps(record))
+            os.replace(partial_file, cache_file)
+        except OSError:
+            pass
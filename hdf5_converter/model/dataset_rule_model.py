@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/dataset_rule_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the dataset rule model of the HDF5 Converter. It is responsible for the
+# rules selecting the datasets to convert by their path: plain terms, glob
+# patterns and regular expressions, with exclusions, saved as reusable rule sets.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import fnmatch
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+
+# The kinds of pattern: a term found anywhere in the path, a glob matching the whole path, or a regular expression found in it
+RULE_KINDS = ("term", "glob", "regex")
+
+# The characters that make a pattern a glob
+GLOB_CHARACTERS = "*?["
+
+# The prefixes of the text notation
+EXCLUDE_PREFIX = "!"
+REGEX_PREFIX = "re:"
+
+# The version of the saved rule sets
+RULES_VERSION = 1
+
+
+@dataclass(frozen=True)
+class DatasetRule:
+    """A pattern selecting, or excluding, the datasets whose path matches it."""
+
+    pattern: str
+    kind: str = "term"
+    exclude: bool = False
+    _regex: re.Pattern = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        """Checks and compiles the pattern."""
+        if self.kind not in RULE_KINDS:
+            raise ValueError(f"Unknown kind of dataset rule: {self.kind}, expected one of {', '.join(RULE_KINDS)}")
+        if not self.pattern:
+            raise ValueError("A dataset rule needs a pattern.")
+
+        if self.kind == "term":
+            regex = re.compile(re.escape(self.pattern))
+        elif self.kind == "glob":
+            # The paths are matched without their leading slash, and * also matches the slashes between groups
+            regex = re.compile(fnmatch.translate(self.pattern.lstrip("/")))
+        else:
+            try:
+                regex = re.compile(self.pattern)
+            except re.error as e:
+                raise ValueError(f"Invalid regular expression: {self.pattern}, {e}") from None
+        object.__setattr__(self, "_regex", regex)
+
+    @classmethod
+    def parse(cls, text: str) -> "DatasetRule":
+        """Returns the rule of a pattern in the text notation: '!' excludes, 're:' starts a regular expression, and a pattern with *, ? or [ is a glob."""
+        exclude = text.startswith(EXCLUDE_PREFIX)
+        pattern = text.removeprefix(EXCLUDE_PREFIX)
+        if pattern.startswith(REGEX_PREFIX):
+            return cls(pattern.removeprefix(REGEX_PREFIX), "regex", exclude)
+        return cls(pattern, "glob" if any(character in pattern for character in GLOB_CHARACTERS) else "term", exclude)
+
+    @classmethod
+    def for_node(cls, name: str, group: bool = False, exclude: bool = False) -> "DatasetRule":
+        """Returns the rule matching the dataset of the path exactly, or every dataset below the group of the path."""
+        # Spaces are escaped by their code, so that the rule stays a single word of the text notation
+        path = re.escape(name.lstrip("/")).replace("\\ ", "\\x20")
+        return cls(f"^{path}/" if group else f"^{path}$", "regex", exclude)
+
+    def matches(self, name: str) -> bool:
+        """Returns True if the path of the dataset matches the pattern."""
+        name = name.lstrip("/")
+        match = self._regex.match(name) if self.kind == "glob" else self._regex.search(name)
+        return match is not None
+
+    def to_dict(self) -> dict:
+        """Returns the rule as a dictionary of JSON types."""
+        return {"pattern": self.pattern, "kind": self.kind, "exclude": self.exclude}
+
+    def __str__(self) -> str:
+        """Returns the rule in the text notation."""
+        return f"{EXCLUDE_PREFIX if self.exclude else ''}{REGEX_PREFIX if self.kind == 'regex' else ''}{self.pattern}"
+
+
+@dataclass(frozen=True)
+class DatasetRules:
+    """The rules selecting the datasets to convert: those matching any included pattern and no excluded one, every dataset without included patterns."""
+
+    rules: tuple[DatasetRule, ...] = ()
+
+    @classmethod
+    def parse(cls, text: str) -> "DatasetRules":
+        """Returns the rules of whitespace separated patterns in the text notation, a single term selecting the datasets whose path contains it."""
+        return cls(tuple(DatasetRule.parse(pattern) for pattern in text.split()))
+
+    @classmethod
+    def of(cls, rules: "str | DatasetRules") -> "DatasetRules":
+        """Returns the rules, parsing them if given as text."""
+        return rules if isinstance(rules, DatasetRules) else cls.parse(rules)
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "DatasetRules":
+        """Returns the rules of a saved rule set."""
+        if not isinstance(content, dict) or content.get("version") != RULES_VERSION or not isinstance(content.get("rules"), list):
+            raise ValueError(f"Not a version {RULES_VERSION} dataset rule set.")
+        try:
+            return cls(tuple(DatasetRule(rule["pattern"], rule.get("kind", "term"), bool(rule.get("exclude", False))) for rule in content["rules"]))
+        except (KeyError, TypeError):
+            raise ValueError("Every dataset rule needs a pattern.") from None
+
+    @classmethod
+    def load(cls, file_name: str) -> "DatasetRules":
+        """Returns the rules of a rule set saved as JSON."""
+        try:
+            content = json.loads(Path(file_name).read_text())
+        except json.JSONDecodeError:
+            raise ValueError(f"Not a dataset rule set: {file_name}") from None
+        return cls.from_dict(content)
+
+    def save(self, file_name: str) -> None:
+        """Saves the rules as a JSON rule set."""
+        Path(file_name).write_text(json.dumps(self.to_dict(), indent=2))
+
+    def to_dict(self) -> dict:
+        """Returns the rules as a dictionary of JSON types."""
+        return {"version": RULES_VERSION, "rules": [rule.to_dict() for rule in self.rules]}
+
+    def matches(self, name: str) -> bool:
+        """Returns True if the dataset of the path is selected."""
+        included = [rule for rule in self.rules if not rule.exclude]
+        if included and not any(rule.matches(name) for rule in included):
+            return False
+        return not any(rule.matches(name) for rule in self.rules if rule.exclude)
+
+    def select(self, names: Iterable[str]) -> list[str]:
+        """Returns the selected paths, in their order."""
+        return [name for name in names if self.matches(name)]
+
+    def __str__(self) -> str:
+        """Returns the rules in the text notation."""
+        return " ".join(str(rule) for rule in self.rules)
@@ -0,0 +1,245 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/format_registry_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the format registry model of the HDF5 Converter. It is responsible for the
+# output formats and the capabilities declared by their writers, including the writers
+# installed by other packages through the "hdf5_converter.formats" entry points.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import warnings
+from dataclasses import dataclass, field
+from importlib.metadata import entry_points
+from pathlib import Path
+from typing import Callable, Iterator, Protocol
+
+import numpy as np
+
+from hdf5_converter.model.cbf_writer_model import encode_cbf, supports_cbf, write_cbf
+from hdf5_converter.model.stack_writer_model import ZARR_AVAILABLE, ZARR_COMPRESSION, NpyWriterModel, ZarrWriterModel, open_tiff_stack
+from hdf5_converter.model.tiff_writer_model import LZW_ACCELERATED, encode_tiff, supports_tiff, write_tiff
+
+
+# The entry point group of the writers installed by other packages
+FORMAT_ENTRY_POINT_GROUP = "hdf5_converter.formats"
+
+
+class StackWriter(Protocol):
+    """The writer of a format that stores a whole stack in a single file."""
+
+    def write(self, frame: np.ndarray) -> None: ...
+
+    def close(self) -> None: ...
+
+
+@dataclass(frozen=True)
+class OutputFormat:
+    """An output format and the capabilities declared by its writer."""
+
+    name: str
+    # Writes a single frame to a file, as write(frame, file_name, compression)
+    write: Callable[[np.ndarray, str, str], None] | None = None
+    # Encodes a frame in memory, as encode(frame, name, compression), returning None for the frames left to the frame writer
+    encode: Callable[[np.ndarray, str, str], bytes | None] | None = None
+    # Opens a file for a whole stack, as open_stack(file_name, shape, dtype, compression)
+    open_stack: Callable[[str, tuple, np.dtype, str], StackWriter] | None = None
+    extension: str = ""
+    description: str = ""
+    # The names of the NumPy data types that can be written, None meaning any
+    dtypes: frozenset[str] | None = None
+    compressions: tuple[str, ...] = ("none",)
+    # Whether frames can be written by several processes at once
+    parallel_safe: bool = True
+    # The estimated milliseconds spent writing each MB of frames, per compression
+    cost_per_mb: dict[str, float] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        """Checks that the format has exactly one kind of writer and defaults its extension to its name."""
+        if (self.write is None) == (self.open_stack is None):
+            raise ValueError(f"The {self.name} format needs either a frame writer or a stack writer.")
+        if self.encode is not None and self.write is None:
+            raise ValueError(f"The {self.name} format needs a frame writer for the frames its encoder leaves.")
+        if not self.extension:
+            object.__setattr__(self, "extension", self.name)
+
+    @property
+    def multi_frame(self) -> bool:
+        """Returns True if the format stores a whole stack in a single file."""
+        return self.open_stack is not None
+
+    def supports(self, dtype: np.dtype) -> bool:
+        """Returns True if frames of the data type can be written."""
+        return self.dtypes is None or np.dtype(dtype).name in self.dtypes
+
+    def check_compression(self, compression: str | None) -> str:
+        """Returns the compression, "none" standing for None, or raises a ValueError if the format does not offer it."""
+        compression = compression or "none"
+        if compression not in self.compressions:
+            raise ValueError(f"The {self.name} format does not support {compression} compression.")
+        return compression
+
+    def frame_cost(self, nbytes: int, compression: str | None = None) -> float:
+        """Returns the estimated seconds spent writing nbytes of frames."""
+        return self.cost_per_mb.get(compression or "none", 1.0) * nbytes / 1024**2 / 1000
+
+
+class FormatRegistryModel:
+    """This class is responsible for looking up the output formats by name."""
+
+    def __init__(self) -> None:
+        """Initialises the format registry model."""
+        self._formats: dict[str, OutputFormat] = {}
+
+    def register(self, output_format: OutputFormat, replace: bool = False) -> None:
+        """Adds an output format, refusing to replace a registered one unless asked to."""
+        if output_format.name in self._formats and not replace:
+            raise ValueError(f"The {output_format.name} format is already registered.")
+        self._formats[output_format.name] = output_format
+
+    def load_entry_points(self, group: str = FORMAT_ENTRY_POINT_GROUP) -> None:
+        """Registers the formats of the installed entry points, each being an OutputFormat or a callable returning one."""
+        for entry_point in entry_points(group=group):
+            try:
+                output_format = entry_point.load()
+                if not isinstance(output_format, OutputFormat):
+                    output_format = output_format()
+                if not isinstance(output_format, OutputFormat):
+                    raise TypeError(f"expected an OutputFormat, got {type(output_format).__name__}")
+                self.register(output_format)
+            except Exception as e:
+                # A broken plugin must not keep the built-in formats from working
+                warnings.warn(f"Could not load the output format {entry_point.name}: {e}")
+
+    def get(self, name: str) -> OutputFormat:
+        """Returns the output format of the given name."""
+        if name not in self._formats:
+            raise ValueError(f"Unsupported format: {name}")
+        return self._formats[name]
+
+    def names(self) -> list[str]:
+        """Returns the names of the registered formats, in registration order."""
+        return list(self._formats)
+
+    def compressions(self) -> list[str]:
+        """Returns the compressions offered by at least one format."""
+        return list(dict.fromkeys(compression for output_format in self for compression in output_format.compressions))
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._formats
+
+    def __iter__(self) -> Iterator[OutputFormat]:
+        return iter(self._formats.values())
+
+
+def _write_tiff(frame: np.ndarray, file_name: str, compression: str) -> None:
+    """Writes a TIFF frame natively, or through fabio for the data types the native writer does not cover."""
+    if frame.ndim == 2 and supports_tiff(frame.dtype):
+        write_tiff(file_name, frame, compression)
+    elif compression == "none":
+        # fabio is slow to import, and only needed for these rare frames
+        import fabio.tifimage
+
+        fabio.tifimage.tifimage(frame).write(file_name)
+    else:
+        raise ValueError(f"Cannot write {frame.dtype} frames as {compression} compressed tiff.")
+
+
+def _encode_tiff(frame: np.ndarray, name: str, compression: str) -> bytes | None:
+    """Returns the bytes of a TIFF frame, or None for the data types left to fabio."""
+    if frame.ndim == 2 and supports_tiff(frame.dtype):
+        return encode_tiff(frame, compression)
+    return None
+
+
+def _write_cbf(frame: np.ndarray, file_name: str, compression: str) -> None:
+    """Writes a CBF frame natively, or through fabio for the data types the native writer does not cover."""
+    # The data block is named after the frame, without the extension and the suffix of the temporary file
+    name = Path(file_name.removesuffix(".part")).stem
+    if frame.ndim == 2 and supports_cbf(frame.dtype):
+        write_cbf(file_name, frame, name)
+    else:
+        import fabio.cbfimage
+
+        fabio.cbfimage.cbfimage(frame).write(file_name)
+
+
+def _encode_cbf(frame: np.ndarray, name: str, compression: str) -> bytes | None:
+    """Returns the bytes of a CBF frame with a data block named after the file, or None for the data types left to fabio."""
+    if frame.ndim == 2 and supports_cbf(frame.dtype):
+        return encode_cbf(frame, Path(name).stem)
+    return None
+
+
+# The formats available to every conversion
+FORMATS = FormatRegistryModel()
+FORMATS.register(
+    OutputFormat(
+        name="tiff",
+        write=_write_tiff,
+        encode=_encode_tiff,
+        description="One TIFF file per frame",
+        dtypes=frozenset({"uint8", "int8", "uint16", "int16", "uint32", "int32", "float32", "float64"}),
+        compressions=("none", "deflate", "lzw"),
+        cost_per_mb={"none": 1.5, "deflate": 12.0, "lzw": 15.0 if LZW_ACCELERATED else 1500.0},
+    )
+)
+FORMATS.register(
+    OutputFormat(
+        name="cbf",
+        write=_write_cbf,
+        encode=_encode_cbf,
+        description="One byte offset compressed CBF file per frame",
+        dtypes=frozenset({"uint8", "int8", "uint16", "int16", "uint32", "int32", "int64", "uint64"}),
+        cost_per_mb={"none": 1.5},
+    )
+)
+FORMATS.register(
+    OutputFormat(
+        name="tiff-stack",
+        open_stack=open_tiff_stack,
+        extension="tif",
+        description="One multipage TIFF file per dataset, BigTIFF above 4 GB",
+        dtypes=frozenset({"uint8", "int8", "uint16", "int16", "uint32", "int32", "float32"}),
+        compressions=("none", "deflate", "lzw"),
+        cost_per_mb={"none": 1.0, "deflate": 12.0, "lzw": 15.0 if LZW_ACCELERATED else 1500.0},
+    )
+)
+FORMATS.register(
+    OutputFormat(
+        name="npy",
+        open_stack=lambda file_name, shape, dtype, compression: NpyWriterModel(file_name, shape, dtype),
+        description="One NumPy .npy file per dataset, written through a memory map",
+        cost_per_mb={"none": 1.0},
+    )
+)
+if ZARR_AVAILABLE:
+    FORMATS.register(
+        OutputFormat(
+            name="zarr",
+            open_stack=ZarrWriterModel,
+            description="One chunked Zarr directory store per dataset, a frame per chunk",
+            compressions=ZARR_COMPRESSION,
+            cost_per_mb={"none": 1.5, "zstd": 6.0, "blosc": 3.0},
+        )
+    )
+FORMATS.load_entry_points()
@@ -0,0 +1,329 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/frame_encoder_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the frame encoder model of the HDF5 Converter. It is responsible for
+# encoding and writing the frames of a stack, either serially or in parallel using
+# a pool of worker processes that read the frames from shared memory.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import multiprocessing
+import os
+import shutil
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+from hdf5_converter.model.buffer_pool_model import BufferPoolModel
+from hdf5_converter.model.format_registry_model import FORMATS
+from hdf5_converter.model.manifest_model import data_checksum, file_checksum, output_size, record_frame
+from hdf5_converter.model.profiler_model import span
+from hdf5_converter.model.write_behind_model import WriteBehindModel
+
+
+# The most processes a pool may have on Windows, where it waits on at most 63 handles including its own two
+WINDOWS_MAX_WORKERS = 61
+
+
+def pool_size(workers: int) -> int:
+    """Returns the number of processes of a pool of workers, capped to the limit of Windows."""
+    return min(workers, WINDOWS_MAX_WORKERS) if sys.platform == "win32" else workers
+
+
+def default_workers() -> int:
+    """Returns the default number of encoder workers, half of the available cores."""
+    return pool_size(max(1, (os.cpu_count() or 1) // 2))
+
+
+def frame_file(output_file: str, index: int, digits: int, format: str) -> str:
+    """Returns the file name of a frame of a stack, numbered from 1 with leading zeros."""
+    frame_number = str(index + 1).zfill(digits) if digits > 1 else str(index + 1)
+    return f"{output_file}_{frame_number}.{FORMATS.get(format).extension}"
+
+
+def encode_frame(frame: np.ndarray, output_file: str, format: str, compression: str | None = None) -> bytes | None:
+    """Encodes a single frame in memory, or returns None if the format writes it to the file itself."""
+    output_format = FORMATS.get(format)
+    if output_format.write is None:
+        raise ValueError(f"The {format} format stores whole stacks and cannot write single frames.")
+    if not output_format.supports(frame.dtype):
+        raise ValueError(f"The {format} format cannot write {frame.dtype} frames.")
+    compression = output_format.check_compression(compression)
+
+    if output_format.encode is None:
+        return None
+    with span("encode", frame.nbytes):
+        return output_format.encode(frame, output_file, compression)
+
+
+def write_frame(
+    frame: np.ndarray,
+    output_file: str,
+    format: str,
+    source: tuple[str, str, int] | None = None,
+    compression: str | None = None,
+    writer: WriteBehindModel | None = None,
+) -> None:
+    """Encodes a single frame in the specified format and writes it to the output file, recording the (file, dataset, frame) source if given."""
+    data = encode_frame(frame, output_file, format, compression)
+
+    # The encoded bytes are left to the write behind threads, if any
+    if data is not None and writer is not None:
+        writer.submit(data, output_file, source)
+        return
+
+    # Write under a temporary name, so that an interrupted write never leaves a complete looking file behind
+    partial_file = f"{output_file}.part"
+    if data is None:
+        # The format encodes the frame as it writes it
+        output_format = FORMATS.get(format)
+        with span("write", frame.nbytes):
+            output_format.write(frame, partial_file, output_format.check_compression(compression))
+    else:
+        with span("write", len(data)):
+            with open(partial_file, "wb") as file:
+                file.write(data)
+
+    with span("commit"):
+        # The frame is recorded before it gets its final name, so that an interrupted commit leaves a frame to write again rather than an unknown file
+        if source is not None:
+            if data is None:
+                record_frame(output_file, *source, output_size(partial_file), file_checksum(partial_file))
+            else:
+                record_frame(output_file, *source, len(data), data_checksum(data))
+        os.replace(partial_file, output_file)
+
+
+def write_stack(
+    windows: Iterable[np.ndarray],
+    shape: tuple,
+    dtype: np.dtype,
+    output_file: str,
+    format: str,
+    source: tuple[str, str] | None = None,
+    compression: str | None = None,
+) -> None:
+    """Writes the windows of a stack to a single output file of a multi-frame format, recording the (file, dataset) source if given."""
+    output_format = FORMATS.get(format)
+    if output_format.open_stack is None:
+        raise ValueError(f"The {format} format writes a file per frame and cannot write whole stacks.")
+    if not output_format.supports(dtype):
+        raise ValueError(f"The {format} format cannot write {dtype} frames.")
+    compression = output_format.check_compression(compression)
+
+    # Write under a temporary name, so that an interrupted write never leaves a complete looking stack behind
+    partial_file = f"{output_file}.part"
+    writer = output_format.open_stack(partial_file, tuple(shape), np.dtype(dtype), compression)
+    try:
+        for window in windows:
+            for frame in window:
+                # The stack writers encode the frames as they write them
+                with span("write", frame.nbytes):
+                    writer.write(frame)
+    finally:
+        with span("write"):
+            writer.close()
+
+    with span("commit"):
+        # The stack writers encode as they write, so only the written stack can be checked
+        if source is not None:
+            record_frame(output_file, *source, 0, output_size(partial_file), file_checksum(partial_file))
+
+        # A directory store cannot be replaced in one step, the stale one is removed first
+        if Path(output_file).is_dir():
+            shutil.rmtree(output_file)
+        os.replace(partial_file, output_file)
+
+
+# The writer of the current worker process, created by its first frame
+_worker_writer: WriteBehindModel | None = None
+
+
+def _write_shared_frame(
+    name: str,
+    shape: tuple,
+    dtype: str,
+    output_file: str,
+    format: str,
+    source: tuple[str, str, int] | None,
+    compression: str | None,
+    sync: bool = False,
+    drop_cache: bool = False,
+) -> None:
+    """Attaches to the shared memory buffer holding a frame and writes it."""
+    global _worker_writer
+    if _worker_writer is None or (_worker_writer.sync, _worker_writer.drop_cache) != (sync, drop_cache):
+        if _worker_writer is not None:
+            _worker_writer.close()
+        _worker_writer = WriteBehindModel(threads=1, sync=sync, drop_cache=drop_cache)
+
+    shared_memory = SharedMemory(name=name, track=False)
+    try:
+        frame = BufferPoolModel.view(shared_memory, shape, np.dtype(dtype))
+        write_frame(frame, output_file, format, source, compression, _worker_writer)
+        del frame
+    finally:
+        shared_memory.close()
+
+    # The frame is only reported as written once it is on disk and recorded
+    _worker_writer.flush()
+
+
+class FrameEncoderModel:
+    """This class is responsible for encoding the frames of a stack, using a process pool when more than one worker is set."""
+
+    def __init__(self, workers: int = 1, buffers: int | None = None, compression: str | None = None, sync: bool = False, drop_cache: bool = False) -> None:
+        """Initialises the frame encoder model, lending the workers two frame buffers each unless told otherwise."""
+        self._workers = max(1, int(workers))
+        self._buffers = buffers
+        self.compression = compression
+        # The frames encoded in this process are written to disk by background threads
+        self._writer = WriteBehindModel(sync=sync, drop_cache=drop_cache)
+        self._executor: ProcessPoolExecutor | None = None
+        self._pool: BufferPoolModel | None = None
+        self._pending: set[Future] = set()
+        self._errors: list[BaseException] = []
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> tuple[ProcessPoolExecutor, BufferPoolModel]:
+        """Returns the process pool and its frame buffers, creating them on first use so that idle converters cost nothing."""
+        with self._lock:
+            if self._executor is None:
+                # Spawn keeps the workers free of the parent's Qt and HDF5 state
+                context = multiprocessing.get_context("spawn")
+                self._executor = ProcessPoolExecutor(max_workers=pool_size(self._workers), mp_context=context)
+                self._pool = BufferPoolModel(self._buffers if self._buffers is not None else 2 * self._workers)
+            return self._executor, self._pool
+
+    def write_frames(self, frames: Iterable[np.ndarray], output_files: list[str], format: str, sources: list[tuple[str, str, int]] | None = None) -> None:
+        """Writes each frame to the matching output file, the frames being free to reuse as soon as this returns."""
+        sources = sources if sources is not None else [None] * len(output_files)
+        self._raise_errors()
+
+        # Writers that are not safe to run in several processes write in this one
+        if self._workers == 1 or len(output_files) == 1 or not FORMATS.get(format).parallel_safe:
+            # Keep the frames in order with the ones still being written by the workers
+            self._wait_workers()
+            for frame, output_file, source in zip(frames, output_files, sources):
+                write_frame(frame, output_file, format, source, self._compression, self._writer)
+            return
+
+        executor, pool = self._get_executor()
+        for frame, output_file, source in zip(frames, output_files, sources):
+            # Waits while every buffer is lent out, so the reader never runs ahead of the workers
+            buffer = pool.acquire(frame.nbytes)
+            try:
+                BufferPoolModel.view(buffer, frame.shape, frame.dtype)[...] = frame
+                future = executor.submit(
+                    _write_shared_frame,
+                    buffer.name,
+                    frame.shape,
+                    frame.dtype.str,
+                    output_file,
+                    format,
+                    source,
+                    self._compression,
+                    self._writer.sync,
+                    self._writer.drop_cache,
+                )
+            except BaseException:
+                pool.release(buffer)
+                raise
+
+            with self._lock:
+                self._pending.add(future)
+            future.add_done_callback(lambda future, buffer=buffer: self._frame_written(future, pool, buffer))
+
+    def _frame_written(self, future: Future, pool: BufferPoolModel, buffer: SharedMemory) -> None:
+        """Gives the buffer of a written frame back to the pool and keeps its error, if any."""
+        pool.release(buffer)
+        with self._lock:
+            self._pending.discard(future)
+            if not future.cancelled() and future.exception() is not None:
+                self._errors.append(future.exception())
+
+    def _raise_errors(self) -> None:
+        """Raises the first error of the frames written since the last check."""
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+    def _wait_workers(self) -> None:
+        """Waits for the frames in flight in the worker processes, then raises the first error."""
+        with self._lock:
+            pending = set(self._pending)
+        wait(pending)
+        self._raise_errors()
+
+    def flush(self) -> None:
+        """Waits for every frame in flight to be written, then raises the first error."""
+        self._wait_workers()
+        self._writer.flush()
+
+    def shutdown(self) -> None:
+        """Shuts down the process pool and removes its frame buffers, if they were created, and stops the writer threads, then raises the first error."""
+        with self._lock:
+            executor, pool = self._executor, self._pool
+            self._executor, self._pool = None, None
+        if executor is not None:
+            executor.shutdown()
+            pool.close()
+        with self._lock:
+            self._pending.clear()
+
+        # The frames that failed while the workers and the writer threads finished are reported rather than forgotten
+        try:
+            self._writer.close()
+        finally:
+            self._raise_errors()
+
+    @property
+    def workers(self) -> int:
+        """Returns the number of encoder workers."""
+        return self._workers
+
+    @workers.setter
+    def workers(self, value: int) -> None:
+        """Sets the number of encoder workers, restarting the pool if the number changed."""
+        value = max(1, int(value))
+        if value != self._workers:
+            self.shutdown()
+            self._workers = value
+
+    @property
+    def compression(self) -> str | None:
+        """Returns the compression of the frames."""
+        return self._compression
+
+    @compression.setter
+    def compression(self, value: str | None) -> None:
+        """Sets the compression of the frames, checked against the format when they are written."""
+        if (value or "none") not in FORMATS.compressions():
+            raise ValueError(f"Unsupported compression: {value}")
+        self._compression = None if value == "none" else value
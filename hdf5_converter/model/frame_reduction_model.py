@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/frame_reduction_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This file contains the reductions applied to the frames between reading and
+# writing them: summing or averaging consecutive frames, binning pixels, and
+# converting to a smaller data type, with the invalid pixels of Eiger detectors
+# kept out of the sums.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from hdf5_converter.model.profiler_model import span
+
+
+# The data types the frames can be reduced to
+REDUCTION_DTYPES = ("uint8", "uint16", "uint32", "int8", "int16", "int32", "float32")
+
+
+@dataclass(frozen=True)
+class FrameReduction:
+    """The reduction of the frames between reading and writing them."""
+
+    # The number of consecutive frames combined into one
+    frames: int = 1
+    # Whether the combined frames are averaged instead of summed
+    mean: bool = False
+    # The size of the square blocks of pixels summed into one
+    binning: int = 1
+    # The data type of the reduced frames, saturating, None keeping the type of the source for a mean and widening it for a sum
+    dtype: str | None = None
+    # Whether the pixels at the maximum of an integer type, which Eiger detectors use for gaps and overflows, are kept out of the sums
+    mask_invalid: bool = False
+
+    def __post_init__(self) -> None:
+        """Checks that the reduction is valid."""
+        if self.frames < 1:
+            raise ValueError("The number of frames to combine must be at least 1.")
+        if self.binning < 1:
+            raise ValueError("The binning must be at least 1.")
+        if self.dtype is not None and self.dtype not in REDUCTION_DTYPES:
+            raise ValueError(f"Unsupported data type: {self.dtype}, expected one of {', '.join(REDUCTION_DTYPES)}")
+
+    @property
+    def is_identity(self) -> bool:
+        """Returns True if the frames are written as they are read."""
+        return self.frames == 1 and self.binning == 1 and self.dtype is None and not self.mask_invalid
+
+    @property
+    def suffix(self) -> str:
+        """Returns the name of the reduction, added to the output names so that reduced and full outputs never mix."""
+        parts = []
+        if self.frames > 1:
+            parts.append(f"{'mean' if self.mean else 'sum'}{self.frames}")
+        if self.binning > 1:
+            parts.append(f"bin{self.binning}")
+        if self.dtype is not None:
+            parts.append(self.dtype)
+        if self.mask_invalid:
+            parts.append("masked")
+        return "_".join(parts)
+
+    @property
+    def is_sum(self) -> bool:
+        """Returns True if the reduced pixels are sums of source pixels, of several frames or of a block of pixels."""
+        return (self.frames > 1 and not self.mean) or self.binning > 1
+
+    def output_dtype(self, dtype: np.dtype) -> np.dtype:
+        """Returns the data type of the reduced frames of a source of the given type, summed integers being widened to 32 bits unless a type is given."""
+        if self.dtype is not None:
+            return np.dtype(self.dtype)
+
+        dtype = np.dtype(dtype)
+        if not self.is_sum or dtype.itemsize >= 4:
+            return dtype
+        # A sum of a few frames of narrow integers would saturate most real pixels, e.g. 10 frames of uint16 counts
+        if dtype.kind == "u":
+            return np.dtype(np.uint32)
+        if dtype.kind == "i":
+            return np.dtype(np.int32)
+        return np.dtype(np.float32)
+
+    def output_shape(self, frame_shape: tuple[int, ...]) -> tuple[int, ...]:
+        """Returns the shape of a reduced frame, the pixels that do not fill a whole block being dropped."""
+        rows, columns = frame_shape[-2:]
+        return (*frame_shape[:-2], rows // self.binning, columns // self.binning)
+
+    def reduce(self, frames: np.ndarray, group: int | None = None) -> np.ndarray:
+        """Returns the reduced frames of a window holding whole groups of frames, the frames of an incomplete last group being dropped."""
+        group = self.frames if group is None else group
+        count = len(frames) // group
+        grouped = frames[: count * group].reshape(count, group, *frames.shape[1:])
+
+        # The sums are accumulated in a type wide enough for any number of frames
+        source = frames.dtype
+        accumulator = np.float64 if source.kind == "f" else np.uint64 if source == np.uint64 else np.int64
+        values = grouped.sum(axis=1, dtype=accumulator)
+
+        # Invalid pixels make the whole output pixel invalid, so their values never need to be removed from the sums
+        invalid = None
+        if self.mask_invalid and source.kind in "ui":
+            invalid = (grouped == np.iinfo(source).max).any(axis=1)
+
+        if self.binning > 1:
+            values = self._bin(values).sum(axis=(-3, -1))
+            if invalid is not None:
+                invalid = self._bin(invalid).any(axis=(-3, -1))
+
+        if self.mean:
+            values = values / group
+
+        output = self.output_dtype(source)
+        if output.kind in "ui":
+            # Saturate instead of wrapping around, the maximum also marking an overflow as on the detector
+            limits = np.iinfo(output)
+            if self.mean:
+                values = np.rint(values)
+            reduced = np.clip(values, limits.min, limits.max).astype(output)
+            if invalid is not None:
+                reduced[invalid] = limits.max
+        else:
+            reduced = values.astype(output)
+            if invalid is not None:
+                reduced[invalid] = np.nan
+        return reduced
+
+    def reduce_frame(self, frame: np.ndarray) -> np.ndarray:
+        """Returns a single frame, binned and converted but not combined with other frames."""
+        return self.reduce(frame[np.newaxis], group=1)[0]
+
+    def _bin(self, values: np.ndarray) -> np.ndarray:
+        """Returns a view of the frames split into blocks of binning x binning pixels, over the second and last axes of each block."""
+        rows, columns = values.shape[-2:]
+        rows, columns = rows - rows % self.binning, columns - columns % self.binning
+        values = values[..., :rows, :columns]
+        return values.reshape(*values.shape[:-2], rows // self.binning, self.binning, columns // self.binning, self.binning)
+
+
+def reduce_windows(windows: Iterable[tuple[int, np.ndarray]], frames: range, reduction: FrameReduction | None = None) -> Iterator[tuple[range, np.ndarray]]:
+    """Yields the output numbers and the frames of each window of the selected frames, reduced if a reduction is given."""
+    for first_frame, data in windows:
+        position = frames.index(first_frame)
+        if reduction is None:
+            # The frames keep the numbers of their source frames
+            yield frames[position:][: len(data)], data
+        else:
+            # The reduced frames are numbered by group, in the order of the selected frames
+            with span("reduce", data.nbytes):
+                reduced = reduction.reduce(data)
+            first = position // reduction.frames
+            yield range(first, first + len(reduced)), reduced
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/frame_selection_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This file contains the selection of the frames of a stack and of the region of
+# each frame to convert, which is passed down to the reads so that the frames and
+# chunks outside of it are never read.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class FrameSelection:
+    """The frames of a stack and the region of each frame to convert."""
+
+    start: int = 0
+    # The frame to stop before, None meaning the end of the stack
+    stop: int | None = None
+    step: int = 1
+    # The region of each frame as (x, y, width, height) in pixels, None meaning the whole frame
+    roi: tuple[int, int, int, int] | None = None
+
+    def __post_init__(self) -> None:
+        """Checks that the selection is valid."""
+        if self.start < 0 or (self.stop is not None and self.stop < 0):
+            raise ValueError("The frame range cannot have negative frames.")
+        if self.step < 1:
+            raise ValueError("The frame step must be at least 1.")
+        if self.roi is not None:
+            if len(self.roi) != 4:
+                raise ValueError("The region must be given as x, y, width and height.")
+            x, y, width, height = self.roi
+            if x < 0 or y < 0 or width < 1 or height < 1:
+                raise ValueError(f"Invalid region: {self.roi}")
+            object.__setattr__(self, "roi", tuple(int(value) for value in self.roi))
+
+    @classmethod
+    def parse(cls, frames: str = "", roi: str = "") -> "FrameSelection":
+        """Returns the selection of a start:stop:step frame range and an x,y,width,height region, empty strings selecting everything."""
+        start, stop, step = 0, None, 1
+        if frames.strip():
+            parts = [part.strip() for part in frames.split(":")]
+            if len(parts) > 3:
+                raise ValueError(f"Invalid frame range: {frames}, expected start:stop:step")
+            try:
+                parts += [""] * (3 - len(parts))
+                start = int(parts[0]) if parts[0] else 0
+                stop = int(parts[1]) if parts[1] else None
+                step = int(parts[2]) if parts[2] else 1
+            except ValueError:
+                raise ValueError(f"Invalid frame range: {frames}, expected start:stop:step") from None
+            # A single number selects that frame only
+            if len(frames.split(":")) == 1:
+                stop = start + 1
+
+        region = None
+        if roi.strip():
+            try:
+                region = tuple(int(value) for value in roi.replace(" ", "").split(","))
+            except ValueError:
+                raise ValueError(f"Invalid region: {roi}, expected x,y,width,height") from None
+
+        return cls(start, stop, step, region)
+
+    @property
+    def is_full(self) -> bool:
+        """Returns True if every frame is selected whole."""
+        return self.start == 0 and self.stop is None and self.step == 1 and self.roi is None
+
+    def frames(self, frame_count: int) -> range:
+        """Returns the selected frames of a stack of frame_count frames."""
+        stop = frame_count if self.stop is None else min(self.stop, frame_count)
+        return range(self.start, stop, self.step)
+
+    def first_frame(self, start: int) -> int:
+        """Returns the first selected frame from start on."""
+        if start <= self.start:
+            return self.start
+        return self.start + -(-(start - self.start) // self.step) * self.step
+
+    def region(self, frame_shape: tuple[int, ...]) -> tuple[slice, slice] | None:
+        """Returns the (rows, columns) slices of the region in frames of the given shape, or None for the whole frame."""
+        if self.roi is None:
+            return None
+
+        x, y, width, height = self.roi
+        rows, columns = frame_shape[-2:]
+        if x >= columns or y >= rows:
+            raise ValueError(f"The region {self.roi} lies outside of the {columns}x{rows} frames.")
+        return slice(y, min(y + height, rows)), slice(x, min(x + width, columns))
+
+    def frame_shape(self, frame_shape: tuple[int, ...]) -> tuple[int, ...]:
+        """Returns the shape of the selected region of frames of the given shape."""
+        region = self.region(frame_shape)
+        if region is None:
+            return tuple(frame_shape)
+        rows, columns = region
+        return (*frame_shape[:-2], rows.stop - rows.start, columns.stop - columns.start)
+
+    def __str__(self) -> str:
+        """Returns the selection in the start:stop:step and x,y,width,height notation."""
+        frames = f"{self.start}:{'' if self.stop is None else self.stop}:{self.step}"
+        return frames if self.roi is None else f"{frames} roi {','.join(str(value) for value in self.roi)}"
@@ -0,0 +1,292 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/frame_stream_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the frame stream model of the HDF5 Converter. It is responsible for
+# finding the datasets to convert and reading their frames in bounded, chunk aligned
+# windows.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import math
+import queue
+import threading
+from dataclasses import replace
+from typing import Callable, Iterator
+
+import h5py
+import numpy as np
+
+from hdf5_converter.model.chunk_reader_model import ChunkReaderModel, load_filters
+from hdf5_converter.model.dataset_rule_model import DatasetRules
+from hdf5_converter.model.frame_selection_model import FrameSelection
+from hdf5_converter.model.profiler_model import sample, span
+from hdf5_converter.model.settings_model import DEFAULT_MEMORY_BUDGET
+
+
+def find_datasets(file: h5py.File, search_term: str | DatasetRules) -> list[str]:
+    """Returns the names of the datasets of the file selected by the search term or the dataset rules."""
+    names: list[str] = []
+    rules = DatasetRules.of(search_term)
+
+    def visit_func(name: str, node: h5py.Dataset) -> None:
+        if isinstance(node, h5py.Dataset) and rules.matches(name):
+            names.append(name)
+
+    file.visititems(visit_func)
+    return names
+
+
+class FrameStreamModel:
+    """This class is responsible for streaming the frames of a dataset without loading it in one piece."""
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET, chunk_reader: ChunkReaderModel | None = None) -> None:
+        """Initialises the frame stream model, using the chunk reader for the datasets it supports."""
+        self._memory_budget = max(1, int(memory_budget))
+        self._chunk_reader = chunk_reader
+
+    @staticmethod
+    def frame_bytes(dataset: h5py.Dataset, selection: FrameSelection | None = None) -> int:
+        """Returns the size of a single frame of the dataset, or of its selected region, in bytes."""
+        frame_shape = dataset.shape[1:] if selection is None else selection.frame_shape(dataset.shape[1:])
+        return max(1, int(np.prod(frame_shape, dtype=np.int64)) * dataset.dtype.itemsize)
+
+    @staticmethod
+    def read_frame(dataset: h5py.Dataset, selection: FrameSelection | None = None) -> np.ndarray:
+        """Returns the frame of a single frame dataset, reading only its selected region."""
+        region = None if selection is None else selection.region(dataset.shape)
+        index = () if dataset.ndim == 2 else (0,)
+        load_filters()
+        # The bytes come from the frame read, as a single frame dataset may have no frame axis
+        with span("read") as timed:
+            frame = dataset[index if region is None else (*index, *region)]
+            timed.nbytes = frame.nbytes
+        return frame
+
+    def window_size(self, dataset: h5py.Dataset, buffers: int = 1, selection: FrameSelection | None = None, group: int = 1) -> int:
+        """Returns the number of selected frames read at once, a multiple of group aligned to the chunk layout of the dataset (or of its indexed metadata)."""
+        frame_count = dataset.shape[0] if selection is None else len(selection.frames(dataset.shape[0]))
+        budget_frames = max(1, self._memory_budget // max(1, buffers) // self.frame_bytes(dataset, selection))
+        chunk_frames = math.lcm(self._aligned_frames(dataset, 1 if selection is None else selection.step), group)
+
+        # Read whole chunks whenever the budget allows it, otherwise fall back to the budget, never splitting a group of frames reduced together
+        if budget_frames >= chunk_frames:
+            budget_frames -= budget_frames % chunk_frames
+        else:
+            budget_frames = max(group, budget_frames - budget_frames % group)
+
+        return max(1, min(budget_frames, frame_count))
+
+    @staticmethod
+    def _aligned_frames(dataset: h5py.Dataset, step: int) -> int:
+        """Returns the smallest number of frames taken every step frames that spans whole chunks."""
+        chunk_frames = dataset.chunks[0] if dataset.chunks else 1
+        return chunk_frames // math.gcd(chunk_frames, step)
+
+    def iter_windows(
+        self,
+        dataset: h5py.Dataset,
+        start: int = 0,
+        stop: int | None = None,
+        prefetch: bool = False,
+        selection: FrameSelection | None = None,
+        group: int = 1,
+    ) -> Iterator[tuple[int, np.ndarray]]:
+        """Yields the index of the first frame and the frames of each window of whole groups of frames, reading only the selected frames and region."""
+        stop = dataset.shape[0] if stop is None else min(stop, dataset.shape[0])
+        step, region = 1, None
+        if selection is not None:
+            start = selection.first_frame(start)
+            stop = stop if selection.stop is None else min(stop, selection.stop)
+            step, region = selection.step, selection.region(dataset.shape)
+        if start >= stop:
+            return
+
+        # HDF5 needs the detector filters from the first read on
+        load_filters()
+        count = len(range(start, stop, step))
+        frame_shape = dataset.shape[1:] if selection is None else selection.frame_shape(dataset.shape[1:])
+        window = self.window_size(dataset, selection=selection, group=group)
+        direct = self._chunk_reader is not None and self._chunk_reader.supports(dataset)
+
+        if prefetch:
+            # Reading ahead splits the budget between two buffers, which is only worth it while each still holds whole chunks
+            half = self.window_size(dataset, buffers=2, selection=selection, group=group)
+            if half < count and half % self._aligned_frames(dataset, step) == 0:
+                yield from self._iter_prefetched(dataset, start, stop, step, region, frame_shape, half, direct, group)
+                return
+
+        # A single buffer is filled by every window, instead of allocating a new array per read
+        buffer = np.empty((min(window, count), *frame_shape), dtype=dataset.dtype)
+
+        for index, end in self._windows(start, stop, step, window, group):
+            out = buffer[: len(range(index, end, step))]
+            self._read(dataset, index, end, step, region, out, direct)
+            yield index, out
+
+    def iter_linked_windows(
+        self,
+        sources: tuple[tuple[str, str, int, int], ...],
+        open_dataset: Callable[[str, str], h5py.Dataset],
+        start: int = 0,
+        stop: int | None = None,
+        prefetch: bool = False,
+        selection: FrameSelection | None = None,
+        group: int = 1,
+    ) -> Iterator[tuple[int, np.ndarray]]:
+        """Yields the windows like iter_windows for a stack stored as (file, dataset, first frame, frames) blocks, numbering the frames across the blocks."""
+        windows = self._iter_blocks(sources, open_dataset, start, stop, prefetch, selection, group)
+        yield from windows if group == 1 else self._whole_groups(windows, 1 if selection is None else selection.step, group)
+
+    def _iter_blocks(
+        self,
+        sources: tuple[tuple[str, str, int, int], ...],
+        open_dataset: Callable[[str, str], h5py.Dataset],
+        start: int,
+        stop: int | None,
+        prefetch: bool,
+        selection: FrameSelection | None,
+        group: int,
+    ) -> Iterator[tuple[int, np.ndarray]]:
+        """Yields the windows of the selected frames of each block, read from the dataset of the block itself."""
+        step = 1 if selection is None else selection.step
+        offset = 0
+        done = 0
+        for file_name, name, first_frame, frames in sources:
+            block_stop = offset + frames
+            first = max(start, offset) if selection is None else selection.first_frame(max(start, offset))
+            last = block_stop if stop is None else min(block_stop, stop)
+            if selection is not None and selection.stop is not None:
+                last = min(last, selection.stop)
+            # The frames of the block are numbered from its own first frame
+            shift = offset - first_frame
+            offset = block_stop
+            if first >= last:
+                continue
+
+            dataset = open_dataset(file_name, name)
+            ranges = [(first, last)]
+            if done % group:
+                # The group started in the previous block is completed on its own, so that the windows of this block start on a group
+                split = min(last, first + (group - done % group) * step)
+                ranges = [(first, split), (split, last)]
+
+            for range_start, range_stop in ranges:
+                if range_start >= range_stop:
+                    continue
+                block_selection = None if selection is None else replace(selection, start=range_start - shift, stop=range_stop - shift)
+                for index, data in self.iter_windows(dataset, range_start - shift, range_stop - shift, prefetch, block_selection, group):
+                    done += len(data)
+                    yield index + shift, data
+
+    @staticmethod
+    def _whole_groups(windows: Iterator[tuple[int, np.ndarray]], step: int, group: int) -> Iterator[tuple[int, np.ndarray]]:
+        """Yields the windows holding whole groups of frames, joining a group split between two blocks."""
+        carry = None
+        for index, data in windows:
+            if carry is not None:
+                index, data = carry[0], np.concatenate((carry[1], data))
+            whole = len(data) - len(data) % group
+            if whole:
+                yield index, data[:whole]
+            # The window is read into a buffer that the next read overwrites, so the rest of the group is copied
+            carry = (index + whole * step, data[whole:].copy()) if whole < len(data) else None
+
+    def _iter_prefetched(
+        self, dataset: h5py.Dataset, start: int, stop: int, step: int, region: tuple | None, frame_shape: tuple, window: int, direct: bool, group: int
+    ) -> Iterator[tuple[int, np.ndarray]]:
+        """Yields the windows like iter_windows, while a reader thread fills the next window in a second buffer."""
+        free: queue.Queue = queue.Queue()
+        for _ in range(2):
+            free.put(np.empty((window, *frame_shape), dtype=dataset.dtype))
+        ready: queue.Queue = queue.Queue()
+        stopped = threading.Event()
+
+        def read() -> None:
+            try:
+                for index, end in self._windows(start, stop, step, window, group):
+                    buffer = free.get()
+                    if stopped.is_set():
+                        return
+                    out = buffer[: len(range(index, end, step))]
+                    self._read(dataset, index, end, step, region, out, direct)
+                    ready.put((index, out, buffer))
+            except BaseException as e:
+                ready.put(e)
+            finally:
+                ready.put(None)
+
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
+        try:
+            while (item := ready.get()) is not None:
+                if isinstance(item, BaseException):
+                    raise item
+                index, out, buffer = item
+                # The windows read ahead and waiting for the caller
+                sample("prefetch", ready.qsize())
+                yield index, out
+                # The caller is done with the window once it asks for the next one
+                free.put(buffer)
+        finally:
+            # Wakes the reader if it waits for a buffer, so that it stops when the caller stops early
+            stopped.set()
+            free.put(None)
+            reader.join()
+
+    @staticmethod
+    def _windows(start: int, stop: int, step: int, window: int, group: int = 1) -> Iterator[tuple[int, int]]:
+        """Yields the first and last frame of each window of window frames taken every step frames."""
+        index = start
+        while index < stop:
+            if step == 1 and group == 1:
+                # Stop at the next window boundary so reads never straddle more chunks than needed
+                end = min(stop, (index // window + 1) * window)
+            else:
+                end = min(stop, index + window * step)
+            yield index, end
+            index = end
+
+    def _read(self, dataset: h5py.Dataset, start: int, end: int, step: int, region: tuple[slice, slice] | None, out: np.ndarray, direct: bool) -> None:
+        """Reads every step frames from start to end, or their region, into out."""
+        if direct:
+            # The chunk reader times the raw reads and the decompression apart
+            self._chunk_reader.read(dataset, start, end, out, step, region)
+            return
+
+        # HDF5 decompresses the chunks as it reads them, so the read includes the decompression
+        with span("read", out.nbytes):
+            if region is None:
+                dataset.read_direct(out, np.s_[start:end:step])
+            else:
+                # A hyperslab selection, so that HDF5 only reads the chunks that overlap the region
+                dataset.read_direct(out, (slice(start, end, step), Ellipsis, *region))
+
+    @property
+    def memory_budget(self) -> int:
+        """Returns the memory budget in bytes."""
+        return self._memory_budget
+
+    @memory_budget.setter
+    def memory_budget(self, value: int) -> None:
+        """Sets the memory budget in bytes."""
+        self._memory_budget = max(1, int(value))
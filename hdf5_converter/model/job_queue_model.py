@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/job_queue_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This file contains the job queue of the GUI: a worker thread that runs the
+# submitted conversions one after the other, sleeping while there is no work.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from qtpy.QtCore import QThread, Signal
+
+
+class JobQueueModel(QThread):
+    """This class is responsible for running the submitted jobs one after the other in a worker thread."""
+
+    # Emitted once every submitted job has finished or was cancelled
+    idle = Signal()
+
+    def __init__(self) -> None:
+        """Initialises the job queue model."""
+        super(JobQueueModel, self).__init__()
+        self._jobs: queue.Queue = queue.Queue()
+        self._pending: list[Future] = []
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def submit(self, method: Callable, *args: Any) -> Future:
+        """Queues a job and returns the future of its result, the job starting as soon as the previous ones have finished."""
+        future: Future = Future()
+        with self._lock:
+            self._pending.append(future)
+            self._active += 1
+        self._jobs.put((future, method, args))
+        return future
+
+    def run(self) -> None:
+        """Runs the queued jobs until the queue is closed, blocking while it is empty."""
+        while (job := self._jobs.get()) is not None:
+            future, method, args = job
+            with self._lock:
+                self._pending.remove(future)
+
+            # Jobs cancelled while they were waiting are skipped
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(method(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self._lock:
+                self._active -= 1
+                finished = self._active == 0
+            if finished:
+                self.idle.emit()
+
+    def cancel_pending(self) -> int:
+        """Cancels the jobs that have not started yet, and returns how many were cancelled."""
+        with self._lock:
+            return sum(future.cancel() for future in self._pending)
+
+    def close(self) -> None:
+        """Cancels the jobs that have not started, and waits for the running one to finish and the thread to exit."""
+        self.cancel_pending()
+        self._jobs.put(None)
+        if self.isRunning():
+            self.wait()
+
+    @property
+    def busy(self) -> bool:
+        """Returns True while a job is running or waiting to run."""
+        with self._lock:
+            return self._active > 0
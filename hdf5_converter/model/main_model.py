@@ -27,6 +27,7 @@
 # ----------------------------------------------------------------------------------
 
 from hdf5_converter.model.converter_model import ConverterModel
+from hdf5_converter.model.job_queue_model import JobQueueModel
 
 
 class MainModel:
@@ -35,3 +36,5 @@ class MainModel:
     def __init__(self) -> None:
         """Initialises the main model."""
         self.converter = ConverterModel()
+        # The conversions run one after the other in the thread of the job queue
+        self.jobs = JobQueueModel()
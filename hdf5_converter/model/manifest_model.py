@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/manifest_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the manifest model of the HDF5 Converter. It is responsible for recording
+# the frames written to an output directory, so that an interrupted conversion can
+# be resumed without converting the verified frames again.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import json
+import os
+import zlib
+from enum import Enum
+from pathlib import Path
+
+
+# The name of the manifest file kept in every output directory
+MANIFEST_NAME = ".hdf5converter_manifest.jsonl"
+
+
+class FrameStatus(Enum):
+    """The state of an output frame, as seen from the manifest of its directory."""
+
+    MISSING = "missing"
+    COMPLETE = "complete"
+    CONFLICT = "conflict"
+
+
+def _output_files(output_path: Path) -> list[Path]:
+    """Returns the files of an output, a directory store such as Zarr being made of all the files below it."""
+    if output_path.is_dir():
+        return sorted(path for path in output_path.rglob("*") if path.is_file())
+    return [output_path]
+
+
+def output_size(output_file: str) -> int:
+    """Returns the size in bytes of the output file or directory."""
+    return sum(path.stat().st_size for path in _output_files(Path(output_file)))
+
+
+def file_checksum(file_name: str) -> str:
+    """Returns the CRC32 checksum of the file, or of the names and contents of the files of a directory, as a hexadecimal string."""
+    output_path = Path(file_name)
+    checksum = 0
+    for path in _output_files(output_path):
+        if path != output_path:
+            checksum = zlib.crc32(path.relative_to(output_path).as_posix().encode(), checksum)
+        with open(path, "rb") as file:
+            while block := file.read(1024 * 1024):
+                checksum = zlib.crc32(block, checksum)
+    return f"{checksum:08x}"
+
+
+def data_checksum(data: bytes) -> str:
+    """Returns the CRC32 checksum of the bytes of a file as a hexadecimal string, the same as file_checksum of the written file."""
+    return f"{zlib.crc32(data):08x}"
+
+
+def record_frame(output_file: str, source: str, dataset: str, frame: int, size: int, crc32: str) -> None:
+    """Appends the record of a frame written with the given size and checksum to the manifest of its directory, before it gets its final name."""
+    output_path = Path(output_file)
+    record = {
+        "file": output_path.name,
+        "source": Path(source).name,
+        "dataset": dataset,
+        "frame": frame,
+        "size": size,
+        "crc32": crc32,
+    }
+
+    # A single append of a whole line, so that concurrent workers never interleave their records
+    line = (json.dumps(record) + "\n").encode()
+    descriptor = os.open(output_path.parent / MANIFEST_NAME, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(descriptor, line)
+    finally:
+        os.close(descriptor)
+
+
+class ManifestModel:
+    """This class is responsible for reading the manifest of an output directory and verifying the recorded frames."""
+
+    def __init__(self, directory: str | Path) -> None:
+        """Initialises the manifest model and loads the records of the directory, if any."""
+        self._path = Path(directory) / MANIFEST_NAME
+        self._records: dict[str, dict] = {}
+        # The bytes of the manifest read so far, the records appended after them being read when they are needed
+        self._offset = 0
+        self._load()
+
+    def _load(self) -> bool:
+        """Loads the records appended since the last load, the latest record of a file replacing the earlier ones, and returns True if there were any."""
+        try:
+            size = self._path.stat().st_size
+        except OSError:
+            return False
+        if size == self._offset:
+            return False
+        if size < self._offset:
+            # The manifest was written again from scratch
+            self._records.clear()
+            self._offset = 0
+
+        loaded = False
+        with open(self._path, "rb") as file:
+            file.seek(self._offset)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    # A record still being appended, or cut short by an interrupted run
+                    break
+                self._offset += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._records[record["file"]] = record
+                loaded = True
+        return loaded
+
+    def status(self, output_file: str, source: str, dataset: str, frame: int) -> FrameStatus:
+        """Returns whether the frame still has to be written, was already written and verified, or belongs to someone else."""
+        output_path = Path(output_file)
+        if not output_path.exists():
+            return FrameStatus.MISSING
+
+        status = self._verify(output_path, source, dataset, frame)
+        # Other processes may have recorded the frame since the manifest was read, e.g. the workers of a warm pool or a worker of another host
+        if status is not FrameStatus.COMPLETE and self._load():
+            status = self._verify(output_path, source, dataset, frame)
+        return status
+
+    def _verify(self, output_path: Path, source: str, dataset: str, frame: int) -> FrameStatus:
+        """Returns the status of an existing output file according to the records read so far."""
+        # Files that were not written by the converter for this frame are never overwritten
+        record = self._records.get(output_path.name)
+        if record is None or (record["source"], record["dataset"], record["frame"]) != (Path(source).name, dataset, frame):
+            return FrameStatus.CONFLICT
+
+        if output_size(str(output_path)) == record["size"] and file_checksum(str(output_path)) == record["crc32"]:
+            return FrameStatus.COMPLETE
+
+        return FrameStatus.MISSING
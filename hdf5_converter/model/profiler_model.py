@@ -0,0 +1,309 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/profiler_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the profiler model of the HDF5 Converter. It is responsible for timing
+# the stages of a conversion, counting the bytes they move and sampling the depth
+# of its queues, and for exporting them as JSON or Chrome trace events.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+
+# The stages of a conversion, in the order of the pipeline
+STAGES = ("open", "read", "decode", "reduce", "encode", "write", "commit")
+
+# The upper bounds of the buckets of the duration histograms in seconds, the last bucket holding the longer spans
+HISTOGRAM_BOUNDS = (0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+
+# Default upper bound for the events kept for the trace, the statistics still counting every event
+DEFAULT_MAX_EVENTS = 1_000_000
+
+# The kinds of events, named after the phases of the Chrome trace events
+SPAN = "X"
+SAMPLE = "C"
+
+
+class Span:
+    """A span of time spent in a stage, whose bytes can be set once they are known."""
+
+    __slots__ = ("nbytes",)
+
+    def __init__(self, nbytes: int = 0) -> None:
+        """Initialises the span with the bytes it moves."""
+        self.nbytes = nbytes
+
+
+@dataclass(frozen=True)
+class StageStats:
+    """The time spent in a stage of a conversion and the bytes it moved."""
+
+    name: str
+    count: int
+    seconds: float
+    nbytes: int
+    max_seconds: float
+    # The spans of each bucket of HISTOGRAM_BOUNDS, followed by the longer ones
+    histogram: tuple[int, ...]
+
+    @property
+    def mean_seconds(self) -> float:
+        """Returns the mean seconds of a span of the stage."""
+        return self.seconds / self.count if self.count else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        """Returns the megabytes moved per second spent in the stage."""
+        return self.nbytes / 1024**2 / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        """Returns the statistics as a single line of text."""
+        throughput = f", {self.mb_per_second:.1f} MB/s" if self.nbytes else ""
+        return f"{self.name}: {self.count} x {self.mean_seconds * 1000:.2f} ms = {self.seconds:.2f} s{throughput}, max {self.max_seconds * 1000:.2f} ms"
+
+
+@dataclass(frozen=True)
+class QueueStats:
+    """The depth of a queue of a conversion, sampled whenever it changes hands."""
+
+    name: str
+    count: int
+    mean: float
+    max: float
+
+    def __str__(self) -> str:
+        """Returns the statistics as a single line of text."""
+        return f"{self.name} queue: mean {self.mean:.1f}, max {self.max:g} ({self.count} samples)"
+
+
+class ProfilerModel:
+    """This class is responsible for collecting the time spent in each stage of a conversion and the depth of its queues."""
+
+    def __init__(self, max_events: int = DEFAULT_MAX_EVENTS) -> None:
+        """Initialises the profiler model, keeping up to max_events events for the trace."""
+        self._max_events = max(0, int(max_events))
+        self._lock = threading.Lock()
+        self.start()
+
+    def start(self) -> None:
+        """Forgets the events collected so far and starts timing a new conversion."""
+        with self._lock:
+            self._events: list[tuple] = []
+            self._dropped = 0
+            # The count, seconds, bytes, longest span and histogram of each stage, and the count, sum and maximum of each queue
+            self._stages: dict[str, list] = {}
+            self._queues: dict[str, list] = {}
+            self._start_time = time.perf_counter()
+            self._elapsed: float | None = None
+
+    def stop(self) -> None:
+        """Stops timing the conversion."""
+        self._elapsed = time.perf_counter() - self._start_time
+
+    @contextmanager
+    def span(self, stage: str, nbytes: int = 0) -> Iterator[Span]:
+        """Times the code run in the context as a span of the stage, which moved nbytes bytes unless the span it yields is told otherwise."""
+        timed = Span(nbytes)
+        start = time.time()
+        begin = time.perf_counter()
+        try:
+            yield timed
+        finally:
+            self._add((SPAN, stage, os.getpid(), threading.get_native_id(), start, time.perf_counter() - begin, timed.nbytes))
+
+    def sample(self, name: str, value: float) -> None:
+        """Records the current depth of a queue."""
+        self._add((SAMPLE, name, os.getpid(), threading.get_native_id(), time.time(), value, 0))
+
+    def take(self) -> dict:
+        """Returns the statistics and events collected so far and forgets them, so that a worker process can send them with each of its results."""
+        with self._lock:
+            profile = {"stages": self._stages, "queues": self._queues, "events": self._events, "dropped": self._dropped}
+            self._stages, self._queues, self._events, self._dropped = {}, {}, [], 0
+        return profile
+
+    def merge(self, profile: dict) -> None:
+        """Adds the statistics and events taken from the profiler of a worker process."""
+        with self._lock:
+            for name, (count, seconds, nbytes, longest, histogram) in profile["stages"].items():
+                stats = self._stages.setdefault(name, [0, 0.0, 0, 0.0, [0] * (len(HISTOGRAM_BOUNDS) + 1)])
+                stats[0] += count
+                stats[1] += seconds
+                stats[2] += nbytes
+                stats[3] = max(stats[3], longest)
+                stats[4] = [total + bucket for total, bucket in zip(stats[4], histogram)]
+            for name, (count, total, largest) in profile["queues"].items():
+                stats = self._queues.setdefault(name, [0, 0.0, 0.0])
+                stats[0] += count
+                stats[1] += total
+                stats[2] = max(stats[2], largest)
+
+            room = max(0, self._max_events - len(self._events))
+            self._events.extend(profile["events"][:room])
+            self._dropped += profile["dropped"] + max(0, len(profile["events"]) - room)
+
+    def _add(self, event: tuple) -> None:
+        """Adds an event to the statistics, and keeps it for the trace while there is room."""
+        kind, name, _, _, _, value, nbytes = event
+        with self._lock:
+            if kind == SPAN:
+                stats = self._stages.setdefault(name, [0, 0.0, 0, 0.0, [0] * (len(HISTOGRAM_BOUNDS) + 1)])
+                stats[0] += 1
+                stats[1] += value
+                stats[2] += nbytes
+                stats[3] = max(stats[3], value)
+                stats[4][bisect.bisect_left(HISTOGRAM_BOUNDS, value)] += 1
+            else:
+                stats = self._queues.setdefault(name, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += value
+                stats[2] = max(stats[2], value)
+
+            if len(self._events) < self._max_events:
+                self._events.append(event)
+            else:
+                self._dropped += 1
+
+    def stages(self) -> list[StageStats]:
+        """Returns the statistics of the stages, in the order of the pipeline."""
+        with self._lock:
+            stages = {name: (count, seconds, nbytes, longest, tuple(histogram)) for name, (count, seconds, nbytes, longest, histogram) in self._stages.items()}
+        order = [name for name in STAGES if name in stages] + sorted(name for name in stages if name not in STAGES)
+        return [StageStats(name, *stages[name]) for name in order]
+
+    def queues(self) -> list[QueueStats]:
+        """Returns the statistics of the sampled queues."""
+        with self._lock:
+            queues = dict(self._queues)
+        return [QueueStats(name, count, total / count, largest) for name, (count, total, largest) in sorted(queues.items())]
+
+    @property
+    def elapsed(self) -> float:
+        """Returns the seconds of the conversion, up to now if it is still running."""
+        return time.perf_counter() - self._start_time if self._elapsed is None else self._elapsed
+
+    @property
+    def dropped(self) -> int:
+        """Returns the number of events left out of the trace once it was full."""
+        return self._dropped
+
+    def summary(self) -> str:
+        """Returns the statistics of every stage and queue, one per line."""
+        stages = self.stages()
+        # The stages overlap across the threads and processes, so their share is of the time spent in all of them
+        total = sum(stats.seconds for stats in stages) or 1.0
+        lines = [f"Profile of {self.elapsed:.2f} s:"]
+        lines.extend(f"{stats} ({stats.seconds / total:.0%})" for stats in stages)
+        lines.extend(str(stats) for stats in self.queues())
+        if self._dropped:
+            lines.append(f"{self._dropped} event(s) were left out of the trace.")
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        """Returns the statistics as a dictionary that can be written as JSON."""
+        buckets = [f"<={bound:g}s" for bound in HISTOGRAM_BOUNDS] + [f">{HISTOGRAM_BOUNDS[-1]:g}s"]
+        return {
+            "elapsed": self.elapsed,
+            "stages": {
+                stats.name: {
+                    "count": stats.count,
+                    "seconds": stats.seconds,
+                    "bytes": stats.nbytes,
+                    "mean_seconds": stats.mean_seconds,
+                    "max_seconds": stats.max_seconds,
+                    "mb_per_second": stats.mb_per_second,
+                    "histogram": dict(zip(buckets, stats.histogram)),
+                }
+                for stats in self.stages()
+            },
+            "queues": {stats.name: {"count": stats.count, "mean": stats.mean, "max": stats.max} for stats in self.queues()},
+            "dropped_events": self._dropped,
+        }
+
+    def to_chrome_trace(self) -> dict:
+        """Returns the events in the Chrome trace event format, which chrome://tracing and Perfetto open."""
+        with self._lock:
+            events = list(self._events)
+        origin = min((event[4] for event in events), default=0.0)
+        main_pid = os.getpid()
+
+        trace = []
+        # Name the processes, the events of the worker processes being sent to the profiler of the main one
+        for number, pid in enumerate(sorted({event[2] for event in events} - {main_pid}), start=1):
+            trace.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"worker {number}"}})
+        trace.append({"name": "process_name", "ph": "M", "pid": main_pid, "args": {"name": "hdf5converter"}})
+
+        for kind, name, pid, tid, start, value, nbytes in events:
+            timestamp = (start - origin) * 1e6
+            if kind == SPAN:
+                trace.append({"name": name, "cat": "stage", "ph": SPAN, "ts": timestamp, "dur": value * 1e6, "pid": pid, "tid": tid, "args": {"bytes": nbytes}})
+            else:
+                trace.append({"name": name, "cat": "queue", "ph": SAMPLE, "ts": timestamp, "pid": pid, "tid": tid, "args": {"depth": value}})
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def save_json(self, file_name: str) -> None:
+        """Writes the statistics to a JSON file."""
+        Path(file_name).write_text(json.dumps(self.to_dict(), indent=2))
+
+    def save_trace(self, file_name: str) -> None:
+        """Writes the events to a Chrome trace file."""
+        Path(file_name).write_text(json.dumps(self.to_chrome_trace()))
+
+
+# The profiler of the current process, None while the conversion is not profiled
+_active: ProfilerModel | None = None
+
+# The context of the spans while the conversion is not profiled, whose span is shared and never recorded
+_NO_SPAN = nullcontext(Span())
+
+
+def activate(profiler: ProfilerModel | None) -> None:
+    """Sends the spans and samples of the current process to the profiler, or nowhere if it is None."""
+    global _active
+    _active = profiler
+
+
+def active() -> ProfilerModel | None:
+    """Returns the profiler of the current process, None while the conversion is not profiled."""
+    return _active
+
+
+def span(stage: str, nbytes: int = 0) -> AbstractContextManager:
+    """Returns a context that times the code it runs as a span of the stage, if the conversion is profiled."""
+    profiler = _active
+    return _NO_SPAN if profiler is None else profiler.span(stage, nbytes)
+
+
+def sample(name: str, value: float) -> None:
+    """Records the current depth of a queue, if the conversion is profiled."""
+    profiler = _active
+    if profiler is not None:
+        profiler.sample(name, value)
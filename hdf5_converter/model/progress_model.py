@@ -0,0 +1,140 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/progress_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This file contains the progress reporting of a conversion: the frames and bytes
+# converted for each file, the throughput and the estimated time left, reported
+# at a bounded rate so that the GUI is never flooded with updates.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+# Default seconds between two progress reports
+DEFAULT_PROGRESS_INTERVAL = 0.25
+
+
+class ConversionCancelled(Exception):
+    """Raised to stop writing a stack when the conversion is cancelled."""
+
+
+@dataclass(frozen=True)
+class Progress:
+    """A snapshot of the progress of a conversion."""
+
+    frames_done: int
+    frames_total: int
+    bytes_done: int
+    bytes_total: int
+    elapsed: float
+    # The frames converted and the total frames of each file
+    files: dict[str, tuple[int, int]] = field(default_factory=dict)
+    finished: bool = False
+
+    @property
+    def fraction(self) -> float:
+        """Returns the fraction of the frames converted, from 0 to 1."""
+        return self.frames_done / self.frames_total if self.frames_total else 1.0
+
+    @property
+    def frames_per_second(self) -> float:
+        """Returns the frames converted per second."""
+        return self.frames_done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        """Returns the megabytes of frames converted per second."""
+        return self.bytes_done / 1024**2 / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> float | None:
+        """Returns the estimated seconds left, None until the throughput is known."""
+        if self.bytes_done == 0 or self.elapsed <= 0:
+            return None
+        return (self.bytes_total - self.bytes_done) * self.elapsed / self.bytes_done
+
+    def __str__(self) -> str:
+        """Returns the progress as a single line of text."""
+        eta = "--:--:--" if self.eta is None else f"{int(self.eta // 3600)}:{int(self.eta % 3600 // 60):02d}:{int(self.eta % 60):02d}"
+        return f"{self.frames_done}/{self.frames_total} frames, {self.mb_per_second:.1f} MB/s, {self.frames_per_second:.1f} frames/s, ETA {eta}"
+
+
+class ProgressModel:
+    """This class is responsible for tracking the progress of a conversion and reporting it at a bounded rate."""
+
+    def __init__(self, on_progress: Callable[[Progress], None] | None = None, interval: float = DEFAULT_PROGRESS_INTERVAL) -> None:
+        """Initialises the progress model, reporting to on_progress at most once per interval seconds."""
+        self._on_progress = on_progress
+        self._interval = interval
+        self._totals: dict[str, tuple[int, int]] = {}
+        self._done: dict[str, tuple[int, int]] = {}
+        self._start_time = time.perf_counter()
+        self._last_report = 0.0
+
+    def start(self, totals: dict[str, tuple[int, int]]) -> None:
+        """Starts tracking a conversion of the given frames and bytes of each file."""
+        self._totals = dict(totals)
+        self._done = {file_name: (0, 0) for file_name in totals}
+        self._start_time = time.perf_counter()
+        self._last_report = 0.0
+        self._report()
+
+    def advance(self, file_name: str, frames: int, nbytes: int) -> None:
+        """Records the frames and bytes converted for a file, reporting the progress if the interval has passed."""
+        done_frames, done_bytes = self._done.get(file_name, (0, 0))
+        self._done[file_name] = (done_frames + frames, done_bytes + nbytes)
+        if time.perf_counter() - self._last_report >= self._interval:
+            self._report()
+
+    def put(self, event: tuple[str, int, int]) -> None:
+        """Records a (file name, frames, bytes) event, the same way as the queue the worker processes report to."""
+        self.advance(*event)
+
+    def finish(self) -> None:
+        """Reports the final progress of the conversion."""
+        self._report(finished=True)
+
+    def snapshot(self, finished: bool = False) -> Progress:
+        """Returns the current progress."""
+        return Progress(
+            sum(frames for frames, _ in self._done.values()),
+            sum(frames for frames, _ in self._totals.values()),
+            sum(nbytes for _, nbytes in self._done.values()),
+            sum(nbytes for _, nbytes in self._totals.values()),
+            time.perf_counter() - self._start_time,
+            {file_name: (self._done[file_name][0], total) for file_name, (total, _) in self._totals.items()},
+            finished,
+        )
+
+    def _report(self, finished: bool = False) -> None:
+        """Passes the current progress to the callback."""
+        self._last_report = time.perf_counter()
+        if self._on_progress is not None:
+            self._on_progress(self.snapshot(finished))
+
+    @property
+    def interval(self) -> float:
+        """Returns the seconds between two progress reports."""
+        return self._interval
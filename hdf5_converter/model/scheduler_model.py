@@ -0,0 +1,851 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/scheduler_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the scheduler model of the HDF5 Converter. It is responsible for splitting
+# the selected files into (file, dataset, frame range) work units and balancing them
+# across a pool of worker processes.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import h5py
+import numpy as np
+
+from hdf5_converter.model.chunk_reader_model import ChunkReaderModel, load_filters
+from hdf5_converter.model.dataset_index_model import DatasetIndexModel, DatasetInfo, default_cache_dir
+from hdf5_converter.model.dataset_rule_model import DatasetRules
+from hdf5_converter.model.format_registry_model import FORMATS
+from hdf5_converter.model.frame_encoder_model import default_workers, frame_file, pool_size, write_frame, write_stack
+from hdf5_converter.model.frame_reduction_model import FrameReduction, reduce_windows
+from hdf5_converter.model.frame_selection_model import FrameSelection
+from hdf5_converter.model.frame_stream_model import FrameStreamModel
+from hdf5_converter.model.manifest_model import FrameStatus, ManifestModel
+from hdf5_converter.model.profiler_model import ProfilerModel, activate, active, span
+from hdf5_converter.model.progress_model import ConversionCancelled, Progress, ProgressModel
+from hdf5_converter.model.settings_model import DEFAULT_MAX_OPEN_FILES, DEFAULT_MEMORY_BUDGET
+from hdf5_converter.model.write_behind_model import WriteBehindModel
+
+
+@dataclass(frozen=True)
+class WorkUnit:
+    """A range of frames of a single dataset, converted by one worker."""
+
+    file_name: str
+    dataset: str
+    start: int
+    stop: int
+    output_file: str
+    output_type: str
+    digits: int
+    is_single_frame: bool
+    nbytes: int
+    compression: str | None = None
+    # Whether the whole dataset goes to a single file of a multi-frame format
+    stack: bool = False
+    # The estimated seconds spent writing the frames of the unit
+    cost: float = 0.0
+    # The frames and the region of each frame to convert, None meaning every frame whole
+    selection: FrameSelection | None = None
+    # The reduction of the frames before they are written, None writing them as they are read
+    reduction: FrameReduction | None = None
+    # The (file, dataset, first frame, frames) blocks of a stack stored in other files, the frames of the unit being numbered across them
+    sources: tuple[tuple[str, str, int, int], ...] = ()
+
+    @property
+    def frames(self) -> range:
+        """Returns the frames of the unit."""
+        return range(self.start, self.stop, 1 if self.selection is None else self.selection.step)
+
+    @property
+    def outputs(self) -> range:
+        """Returns the numbers of the output frames of the unit, one per group of frames when they are combined."""
+        if self.reduction is None:
+            return self.frames
+        first = (self.start - (0 if self.selection is None else self.selection.start)) // self.frames.step // self.reduction.frames
+        return range(first, first + len(self.frames) // self.reduction.frames)
+
+    def source_frames(self, frame_count: int) -> range:
+        """Returns every selected frame of the dataset of the unit, which has frame_count frames."""
+        return range(frame_count) if self.selection is None else self.selection.frames(frame_count)
+
+
+# The HDF5 files opened by the current worker process, most recently used last
+_open_files: OrderedDict[str, h5py.File] = OrderedDict()
+_max_open_files = DEFAULT_MAX_OPEN_FILES
+
+# The (modification time, size) of each open HDF5 file when it was opened
+_file_stamps: dict[str, tuple[int, int] | None] = {}
+
+# The manifests of the output directories read by the current worker process
+_manifests: dict[Path, ManifestModel] = {}
+
+# The direct chunk reader of the current worker process, None when disabled
+_chunk_reader: ChunkReaderModel | None = None
+
+# The memory the current worker process may hold for the frames of a stack unit
+_memory_budget = DEFAULT_MEMORY_BUDGET
+
+# The threads writing the frames encoded by the current worker process
+_writer: WriteBehindModel | None = None
+
+# The queue the current worker process reports its (file name, frames, bytes) progress to, anything with a put method
+_progress: Any = None
+
+# The event set when the conversion is cancelled
+_cancel: Any = None
+
+# Whether the HDF5 files are locked while the current worker process holds them open
+_locking = True
+
+
+def init_worker(
+    max_open_files: int,
+    memory_budget: int,
+    direct_chunks: bool = True,
+    threads: int | None = 1,
+    sync: bool = False,
+    drop_cache: bool = False,
+    progress: Any = None,
+    cancel: Any = None,
+    profile: bool = False,
+    locking: bool = True,
+) -> None:
+    """Sets the number of HDF5 files and the memory the worker process may use, how it opens and reads them, writes the frames and reports its progress."""
+    global _max_open_files, _memory_budget, _chunk_reader, _writer, _progress, _cancel, _locking
+    _max_open_files = max(1, max_open_files)
+    _memory_budget = max(1, memory_budget)
+    _chunk_reader = ChunkReaderModel(threads) if direct_chunks else None
+    _writer = WriteBehindModel(sync=sync, drop_cache=drop_cache)
+    _progress = progress
+    _cancel = cancel
+    _locking = locking
+    # The stages are timed by a profiler of the worker process, taken with the result of every unit
+    activate(ProfilerModel() if profile else None)
+
+
+def _advance(unit: WorkUnit, frames: int) -> None:
+    """Reports that frames of the source frames of the unit were converted."""
+    if _progress is not None and frames:
+        _progress.put((unit.file_name, frames, frames * unit.nbytes // max(1, len(unit.frames))))
+
+
+def _cancelled() -> bool:
+    """Returns True if the conversion was cancelled."""
+    return _cancel is not None and _cancel.is_set()
+
+
+def _get_file(file_name: str) -> h5py.File:
+    """Returns an open handle of the file, closing the least recently used one if needed."""
+    if file_name in _open_files:
+        _open_files.move_to_end(file_name)
+        return _open_files[file_name]
+
+    while len(_open_files) >= _max_open_files:
+        closed_name, file = _open_files.popitem(last=False)
+        _file_stamps.pop(closed_name, None)
+        file.close()
+
+    with span("open"):
+        file = h5py.File(file_name, "r", locking=_locking)
+    _open_files[file_name] = file
+    _file_stamps[file_name] = _file_stamp(file_name)
+    return file
+
+
+def _file_stamp(file_name: str) -> tuple[int, int] | None:
+    """Returns the modification time and the size of the file, None if it cannot be accessed."""
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _close_changed_files(unit: WorkUnit) -> None:
+    """Closes the open files of the unit that changed since they were opened, e.g. between two conversions of a warm pool, so that they are opened again."""
+    for file_name in {unit.file_name, *(source[0] for source in unit.sources)}:
+        if file_name in _open_files and _file_stamps.get(file_name) != _file_stamp(file_name):
+            _file_stamps.pop(file_name, None)
+            _open_files.pop(file_name).close()
+
+
+def _open_dataset(unit: WorkUnit) -> h5py.Dataset:
+    """Returns the dataset of the unit, or the dataset of the first block of a stack stored in other files."""
+    if unit.sources:
+        file_name, name, _, _ = unit.sources[0]
+        return _get_file(file_name)[name]
+    return _get_file(unit.file_name)[unit.dataset]
+
+
+def _frame_count(unit: WorkUnit, dataset: h5py.Dataset) -> int:
+    """Returns the number of frames of the dataset of the unit, across all of its blocks."""
+    return sum(source[3] for source in unit.sources) if unit.sources else dataset.shape[0]
+
+
+def _iter_windows(unit: WorkUnit, stream: FrameStreamModel, dataset: h5py.Dataset, start: int, stop: int, group: int = 1) -> Iterator[tuple[int, np.ndarray]]:
+    """Yields the windows of the selected frames of the unit from start to stop, reading each block of a stack from its own file."""
+    if unit.sources:
+        return stream.iter_linked_windows(unit.sources, lambda file_name, name: _get_file(file_name)[name], start, stop, True, unit.selection, group)
+    return stream.iter_windows(dataset, start, stop, prefetch=True, selection=unit.selection, group=group)
+
+
+def close_files() -> None:
+    """Closes every HDF5 file opened by the current process, forgets the loaded manifests and stops the chunk reader and the writer threads."""
+    global _progress, _cancel
+    _progress, _cancel = None, None
+    activate(None)
+    while _open_files:
+        _, file = _open_files.popitem()
+        file.close()
+    _file_stamps.clear()
+    _manifests.clear()
+    if _chunk_reader is not None:
+        _chunk_reader.shutdown()
+    if _writer is not None:
+        _writer.close()
+
+
+def _get_manifest(directory: Path) -> ManifestModel:
+    """Returns the manifest of the output directory, loaded once per run by each worker process."""
+    if directory not in _manifests:
+        _manifests[directory] = ManifestModel(directory)
+    return _manifests[directory]
+
+
+def _run_stack_unit(unit: WorkUnit, manifest: ManifestModel) -> str | None:
+    """Writes a whole dataset to a single file of a multi-frame format, recorded in the manifest as one frame."""
+    status = manifest.status(unit.output_file, unit.file_name, unit.dataset, 0)
+    if status is FrameStatus.CONFLICT:
+        return f"Error: The file '{unit.output_file}' already exists. Conversion stopped to prevent data loss."
+    if status is FrameStatus.COMPLETE:
+        _advance(unit, len(unit.frames))
+        return None
+
+    dataset = _open_dataset(unit)
+    reduction = unit.reduction
+    dtype = dataset.dtype if reduction is None else reduction.output_dtype(dataset.dtype)
+    if dataset.ndim == 2:
+        frame = FrameStreamModel.read_frame(dataset, unit.selection)
+        frame = frame if reduction is None else reduction.reduce_frame(frame)
+        windows, shape = [frame[np.newaxis]], (1, *frame.shape)
+    else:
+        # The unit holds a window of the selected frames at a time, however large the dataset is
+        stream = FrameStreamModel(_memory_budget, _chunk_reader)
+        group = 1 if reduction is None else reduction.frames
+        read = _iter_windows(unit, stream, dataset, unit.start, unit.stop, group)
+        windows = _checked_windows(unit, reduce_windows(read, unit.source_frames(_frame_count(unit, dataset)), reduction), group)
+        frame_shape = dataset.shape[1:] if unit.selection is None else unit.selection.frame_shape(dataset.shape[1:])
+        shape = (len(unit.outputs), *(frame_shape if reduction is None else reduction.output_shape(frame_shape)))
+
+    try:
+        write_stack(windows, shape, dtype, unit.output_file, unit.output_type, (unit.file_name, unit.dataset), unit.compression)
+    except ConversionCancelled:
+        # The partial file is left unrecorded, and overwritten when the conversion is resumed
+        return None
+    if dataset.ndim == 2:
+        _advance(unit, 1)
+    return None
+
+
+def _checked_windows(unit: WorkUnit, windows: Iterator[tuple[range, np.ndarray]], group: int) -> Iterator[np.ndarray]:
+    """Yields the frames of each window of a stack unit, reporting the progress and stopping the stack when the conversion is cancelled."""
+    for outputs, data in windows:
+        if _cancelled():
+            raise ConversionCancelled()
+        yield data
+        _advance(unit, len(outputs) * group)
+
+
+def run_unit(unit: WorkUnit) -> str | None:
+    """Converts the frames of a work unit and returns an error message if the unit had to stop."""
+    _close_changed_files(unit)
+    manifest = _get_manifest(Path(unit.output_file).parent)
+
+    if unit.stack:
+        return _run_stack_unit(unit, manifest)
+
+    if unit.is_single_frame:
+        status = manifest.status(unit.output_file, unit.file_name, unit.dataset, 0)
+        if status is FrameStatus.CONFLICT:
+            return f"Error: The file '{unit.output_file}' already exists. Conversion stopped to prevent data loss."
+        if status is FrameStatus.MISSING:
+            data = FrameStreamModel.read_frame(_open_dataset(unit), unit.selection)
+            data = data if unit.reduction is None else unit.reduction.reduce_frame(data)
+            write_frame(data, unit.output_file, unit.output_type, (unit.file_name, unit.dataset, 0), unit.compression)
+        _advance(unit, 1)
+        return None
+
+    Path(unit.output_file).parent.mkdir(parents=True, exist_ok=True)
+
+    # Check the frames first, so that the frames already converted are never read again
+    pending: dict[int, str] = {}
+    error = None
+    group = 1 if unit.reduction is None else unit.reduction.frames
+    complete = 0
+    for frame in unit.outputs:
+        output_file_with_frame = frame_file(unit.output_file, frame, unit.digits, unit.output_type)
+        status = manifest.status(output_file_with_frame, unit.file_name, unit.dataset, frame)
+
+        if status is FrameStatus.CONFLICT:
+            # Still write the frames that precede the existing file
+            error = f"Error: The file '{output_file_with_frame}' already exists. Conversion stopped to prevent data loss."
+            break
+        if status is FrameStatus.MISSING:
+            pending[frame] = output_file_with_frame
+        else:
+            complete += 1
+    _advance(unit, complete * group)
+
+    if pending:
+        dataset = _open_dataset(unit)
+
+        # The unit fits in the memory budget of a worker, read in two halves so that the second is read while the first is encoded
+        stream = FrameStreamModel(max(1, unit.nbytes), _chunk_reader)
+        if unit.reduction is None:
+            read = _iter_windows(unit, stream, dataset, min(pending), max(pending) + 1)
+        else:
+            # Every group of frames combined into one is read whole
+            read = _iter_windows(unit, stream, dataset, unit.start, unit.stop, unit.reduction.frames)
+        try:
+            for outputs, data in reduce_windows(read, unit.source_frames(_frame_count(unit, dataset)), unit.reduction):
+                written = 0
+                for i, frame in enumerate(outputs):
+                    # A cancelled conversion stops before the next frame, the frames already written staying recorded
+                    if _cancelled():
+                        break
+                    if frame in pending:
+                        source = (unit.file_name, unit.dataset, frame)
+                        write_frame(data[i], pending[frame], unit.output_type, source, unit.compression, _writer)
+                        written += 1
+                _advance(unit, written * group)
+                if _cancelled():
+                    break
+        finally:
+            # The unit is only reported once its frames are on disk and recorded
+            _writer.flush()
+
+    return error
+
+
+def run_profiled_unit(unit: WorkUnit) -> tuple[str | None, dict]:
+    """Converts the frames of a work unit like run_unit, and returns its error message with the profile of its stages."""
+    # The workers of a warm pool only time the units of the conversions that are profiled
+    profiler = active()
+    if profiler is None:
+        activate(ProfilerModel())
+    try:
+        error = run_unit(unit)
+        return error, active().take()
+    finally:
+        if profiler is None:
+            activate(None)
+
+
+def _warm_up() -> None:
+    """Loads the detector filters in a worker process of a warm pool, before its first unit."""
+    load_filters()
+
+
+class SchedulerModel:
+    """This class is responsible for scheduling the conversion of many files as frame level work units."""
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+        index: DatasetIndexModel | None = None,
+        direct_chunks: bool = True,
+        sync: bool = False,
+        drop_cache: bool = False,
+        persistent: bool = False,
+    ) -> None:
+        """Initialises the scheduler model, keeping its worker processes between conversions if persistent."""
+        self.workers = default_workers() if workers is None else workers
+        self.memory_budget = memory_budget
+        self.max_open_files = max_open_files
+        self.direct_chunks = direct_chunks
+        self.sync = sync
+        self.drop_cache = drop_cache
+        self._index = index if index is not None else DatasetIndexModel(default_cache_dir())
+        # Shared with the worker processes, which check it before every frame
+        self._cancel = multiprocessing.get_context("spawn").Event()
+        self._persistent = persistent
+        # The warm pool of a persistent scheduler and the queue its workers report their progress to
+        self._pool: ProcessPoolExecutor | None = None
+        self._events: Any = None
+
+    def plan(
+        self,
+        file_names: list[str],
+        search_term: str | DatasetRules,
+        output_type: str,
+        digits: int,
+        compression: str | None = None,
+        selection: FrameSelection | None = None,
+        reduction: FrameReduction | None = None,
+    ) -> tuple[list[WorkUnit], list[str]]:
+        """Splits the matching datasets of the files into work units, and returns them with any error messages."""
+        output_format = FORMATS.get(output_type)
+        output_format.check_compression(compression)
+
+        digits = int(digits)
+        # Selecting everything is the same as selecting nothing, and keeps the units free of the selection
+        selection = None if selection is None or selection.is_full else selection
+        reduction = None if reduction is None or reduction.is_identity else reduction
+        units: list[WorkUnit] = []
+        messages: list[str] = []
+        claimed: set[Path] = set()
+        rules = DatasetRules.of(search_term)
+
+        for file_name in file_names:
+            # A conversion cancelled while it is planned indexes no more files
+            if self.cancelled:
+                break
+
+            if not Path(file_name).is_file():
+                messages.append(f"File {file_name} does not exist or cannot be accessed.")
+                continue
+
+            try:
+                # The index only reads the metadata, and is reused as long as the file is unchanged
+                for info in self._index.datasets(file_name, rules):
+                    units.extend(self._plan_dataset(file_name, info, output_type, digits, compression, selection, reduction, claimed, messages))
+            except Exception as e:
+                messages.append(f"Error processing file {file_name}: {e}")
+
+        return units, messages
+
+    def _plan_dataset(
+        self,
+        file_name: str,
+        info: DatasetInfo,
+        output_type: str,
+        digits: int,
+        compression: str | None,
+        selection: FrameSelection | None,
+        reduction: FrameReduction | None,
+        claimed: set[Path],
+        messages: list[str],
+    ) -> list[WorkUnit]:
+        """Splits a single dataset into work units, unless its output is claimed by another dataset of the batch."""
+        # Get the base name and parent directory of the file
+        parent_dir = Path(file_name).parent
+        base_name = Path(file_name).stem
+        output_format = FORMATS.get(output_type)
+        # Reduced outputs are named after their reduction, so that they never mix with the full outputs of the same file
+        suffix = "" if reduction is None else f"_{reduction.suffix}"
+
+        dtype = info.dtype if reduction is None else reduction.output_dtype(info.dtype)
+        if not output_format.supports(dtype):
+            messages.append(f"Error: The {output_type} format cannot write the {dtype} frames of dataset {info.name} of {file_name}.")
+            return []
+
+        # Only the selected frames of stacks, and the selected region of every frame, are converted
+        frames = range(1) if info.is_single_frame else range(info.frame_count) if selection is None else selection.frames(info.frame_count)
+        frame_shape = info.shape[-2:] if info.is_single_frame else info.shape[1:]
+        frame_shape = frame_shape if selection is None else selection.frame_shape(frame_shape)
+        frame_bytes = info.frame_bytes if selection is None else max(1, int(np.prod(frame_shape))) * info.dtype.itemsize
+        if not frames:
+            messages.append(f"No frames of dataset {info.name} of {file_name} are selected.")
+            return []
+        group = 1 if reduction is None or info.is_single_frame else reduction.frames
+        if len(frames) < group:
+            messages.append(f"Dataset {info.name} of {file_name} has fewer than the {group} frames combined into one.")
+            return []
+
+        # The frames of an incomplete last group are dropped
+        complete = len(frames) - len(frames) % group
+        frames = frames[:complete]
+
+        # Writing is estimated from the size of the reduced frames, reading and memory from the size of the source frames
+        output_bytes = frame_bytes if reduction is None else int(np.prod(reduction.output_shape(frame_shape))) * dtype.itemsize // group
+
+        if info.is_single_frame or output_format.multi_frame:
+            # Single frame case, or a whole stack written to a single file by one worker
+            output_file = parent_dir / f"{base_name}{suffix}.{output_format.extension}"
+            if output_file in claimed:
+                messages.append(f"Error: The file '{output_file}' already exists. Conversion stopped to prevent data loss.")
+                return []
+            claimed.add(output_file)
+
+            nbytes = len(frames) * frame_bytes
+            cost = output_format.frame_cost(len(frames) * output_bytes, compression)
+            stack = output_format.multi_frame
+            return [
+                WorkUnit(
+                    file_name,
+                    info.name,
+                    frames.start,
+                    frames.stop,
+                    str(output_file),
+                    output_type,
+                    digits,
+                    info.is_single_frame,
+                    nbytes,
+                    compression,
+                    stack,
+                    cost,
+                    selection,
+                    reduction,
+                    info.sources,
+                )
+            ]
+
+        # Multiple frames case, an existing directory is resumed using its manifest
+        output_dir = parent_dir / f"{base_name}_{output_type}{suffix}"
+        if output_dir in claimed:
+            messages.append(f"Error: The directory '{output_dir}' already exists. Conversion stopped to prevent data loss.")
+            return []
+        claimed.add(output_dir)
+
+        # Every worker gets an equal share of the memory budget, split on chunk aligned boundaries that never split a group of combined frames
+        window = FrameStreamModel(self.memory_budget // self.pool_workers).window_size(info, selection=selection, group=group)
+        units = []
+        for segment in self._segments(frames, info.sources, group):
+            for first in range(0, len(segment), window):
+                unit_frames = segment[first:][:window]
+                nbytes = len(unit_frames) * frame_bytes
+                cost = output_format.frame_cost(len(unit_frames) * output_bytes, compression)
+                start, stop = unit_frames.start, unit_frames[-1] + 1
+                output_file = str(output_dir / base_name)
+                units.append(
+                    WorkUnit(
+                        file_name,
+                        info.name,
+                        start,
+                        stop,
+                        output_file,
+                        output_type,
+                        digits,
+                        False,
+                        nbytes,
+                        compression,
+                        False,
+                        cost,
+                        selection,
+                        reduction,
+                        info.sources,
+                    )
+                )
+        return units
+
+    @staticmethod
+    def _segments(frames: range, sources: tuple[tuple[str, str, int, int], ...], group: int) -> list[range]:
+        """Splits the frames of a stack stored in blocks at the first group of each block, so that the units read the blocks in parallel."""
+        segments = []
+        first = 0
+        boundary = 0
+        for *_, block_frames in sources[:-1]:
+            boundary += block_frames
+            # The selected frames before the boundary, rounded up to a whole group so that no group is split between two units
+            count = len(range(frames.start, max(frames.start, min(boundary, frames.stop)), frames.step))
+            last = min(len(frames), -(-count // group) * group)
+            if last > first:
+                segments.append(frames[first:last])
+                first = last
+        if first < len(frames):
+            segments.append(frames[first:])
+        return segments
+
+    def run(
+        self,
+        units: list[WorkUnit],
+        on_message: Callable[[str], None],
+        on_progress: Callable[[Progress], None] | None = None,
+        profiler: ProfilerModel | None = None,
+    ) -> None:
+        """Converts the work units, keeping the frames in flight within the memory budget, reporting the progress and timing the stages if given a profiler."""
+        if profiler is not None:
+            profiler.start()
+
+        # The totals come from the planned units, so the progress is known before any frame is read
+        totals: dict[str, tuple[int, int]] = {}
+        for unit in units:
+            frames, nbytes = totals.get(unit.file_name, (0, 0))
+            totals[unit.file_name] = (frames + len(unit.frames), nbytes + unit.nbytes)
+        progress = ProgressModel(on_progress)
+        progress.start(totals)
+
+        # Units of the writers that are not safe to run in several processes stay in this one
+        serial, parallel = [], []
+        for unit in units:
+            (parallel if (self.pool_workers > 1 or self._persistent) and FORMATS.get(unit.output_type).parallel_safe else serial).append(unit)
+
+        if serial:
+            self._run_serial(serial, on_message, progress, profiler)
+        if parallel:
+            self._run_parallel(parallel, on_message, progress, profiler)
+
+        if self.cancelled:
+            snapshot = progress.snapshot()
+            on_message(f"Conversion cancelled after {snapshot.frames_done} of {snapshot.frames_total} frames, converting again resumes it.")
+        progress.finish()
+        if profiler is not None:
+            profiler.stop()
+
+    def reset(self) -> None:
+        """Clears the cancellation of the previous conversion, once the next one is accepted and before it is planned."""
+        self._cancel.clear()
+
+    def cancel(self) -> None:
+        """Stops the conversion, the worker processes finishing the frame they are writing."""
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """Returns True if the last conversion was cancelled."""
+        return self._cancel.is_set()
+
+    def _run_serial(self, units: list[WorkUnit], on_message: Callable[[str], None], progress: ProgressModel, profiler: ProfilerModel | None = None) -> None:
+        """Converts the work units one after the other in this process."""
+        # There is nothing to balance, so the chunks are decompressed on every core
+        init_worker(self.max_open_files, self.memory_budget, self.direct_chunks, None, self.sync, self.drop_cache, progress, self._cancel)
+        # The stages run in this process, so they are timed by the profiler of the conversion itself
+        activate(profiler)
+        try:
+            for unit in units:
+                if self.cancelled:
+                    break
+                self._report(unit, self._run_local(unit), on_message)
+        finally:
+            close_files()
+
+    def _run_parallel(self, units: list[WorkUnit], on_message: Callable[[str], None], progress: ProgressModel, profiler: ProfilerModel | None = None) -> None:
+        """Converts the work units in the worker processes, the most expensive first so that the workers finish together."""
+        if self._persistent:
+            # The warm pool keeps its processes, with their libraries and open files, for the next conversion
+            self._schedule(self.warm_up(), self.pool_workers, units, self._events, on_message, progress, profiler)
+            return
+
+        context = multiprocessing.get_context("spawn")
+        workers = min(self.pool_workers, len(units))
+        # The workers report their progress through a queue, drained here between the finished units
+        events = context.SimpleQueue()
+
+        with ProcessPoolExecutor(
+            workers,
+            mp_context=context,
+            initializer=init_worker,
+            initargs=(
+                self.max_open_files // workers,
+                self.memory_budget // workers,
+                self.direct_chunks,
+                1,
+                self.sync,
+                self.drop_cache,
+                events,
+                self._cancel,
+                profiler is not None,
+            ),
+        ) as executor:
+            self._schedule(executor, workers, units, events, on_message, progress, profiler)
+
+    def _schedule(
+        self,
+        executor: ProcessPoolExecutor,
+        workers: int,
+        units: list[WorkUnit],
+        events: Any,
+        on_message: Callable[[str], None],
+        progress: ProgressModel,
+        profiler: ProfilerModel | None = None,
+    ) -> None:
+        """Submits the work units to the worker processes of the executor, keeping the frames in flight within the memory budget."""
+        window = max(1, self.memory_budget // workers)
+        pending = sorted(reversed(units), key=lambda unit: unit.cost)
+        running: dict[Future, WorkUnit] = {}
+        in_flight = 0
+        run = run_unit if profiler is None else run_profiled_unit
+
+        while pending or running:
+            # A cancelled conversion starts no new units, and waits for the running ones to stop
+            if self.cancelled:
+                pending.clear()
+
+            # Queue units while they fit in the memory budget, but always keep at least one running
+            # A stack unit only holds a window of its frames at a time
+            while pending and (not running or in_flight + min(pending[-1].nbytes, window) <= self.memory_budget):
+                unit = pending.pop()
+                running[executor.submit(run, unit)] = unit
+                in_flight += min(unit.nbytes, window)
+            if profiler is not None:
+                profiler.sample("units", len(running))
+
+            done, _ = wait(running, timeout=progress.interval, return_when=FIRST_COMPLETED)
+            self._drain(events, progress)
+            for future in done:
+                unit = running.pop(future)
+                in_flight -= min(unit.nbytes, window)
+                self._report(unit, future, on_message, profiler)
+
+    def warm_up(self) -> ProcessPoolExecutor:
+        """Returns the warm pool of a persistent scheduler, starting its worker processes and loading their libraries on first use."""
+        if self._pool is not None:
+            try:
+                self._pool.submit(_warm_up)
+                return self._pool
+            except BrokenProcessPool:
+                # A worker process died, so the pool takes no more units and is replaced
+                self.shutdown()
+
+        context = multiprocessing.get_context("spawn")
+        workers = self.pool_workers
+        self._events = context.SimpleQueue()
+        self._pool = ProcessPoolExecutor(
+            workers,
+            mp_context=context,
+            initializer=init_worker,
+            initargs=(
+                self.max_open_files // workers,
+                self.memory_budget // workers,
+                self.direct_chunks,
+                1,
+                self.sync,
+                self.drop_cache,
+                self._events,
+                self._cancel,
+                False,
+                # The files stay open between the conversions, without locking out the acquisition that writes them
+                False,
+            ),
+        )
+        wait([self._pool.submit(_warm_up) for _ in range(workers)])
+        return self._pool
+
+    def shutdown(self) -> None:
+        """Stops the worker processes of the warm pool, if any."""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+            self._events = None
+
+    @staticmethod
+    def _drain(events: Any, progress: ProgressModel) -> None:
+        """Passes the progress events reported by the worker processes to the progress model."""
+        # The workers write their events as they report them, so those of a finished unit are read before its result
+        while not events.empty():
+            progress.put(events.get())
+
+    @staticmethod
+    def _run_local(unit: WorkUnit) -> Future:
+        """Runs a work unit in the current process and wraps the outcome in a future."""
+        future: Future = Future()
+        try:
+            future.set_result(run_unit(unit))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    @staticmethod
+    def _report(unit: WorkUnit, future: Future, on_message: Callable[[str], None], profiler: ProfilerModel | None = None) -> None:
+        """Reports the error message or exception of a finished work unit, merging the profile that comes with it into profiler."""
+        error = future.exception()
+        if error is not None:
+            on_message(f"Error processing dataset {unit.dataset} of {unit.file_name}: {error}")
+            return
+
+        result = future.result()
+        if profiler is not None:
+            result, profile = result
+            profiler.merge(profile)
+        if result is not None:
+            on_message(result)
+
+    @property
+    def index(self) -> DatasetIndexModel:
+        """Returns the dataset index used to plan the work units."""
+        return self._index
+
+    @property
+    def workers(self) -> int:
+        """Returns the number of worker processes."""
+        return self._workers
+
+    @workers.setter
+    def workers(self, value: int) -> None:
+        """Sets the number of worker processes."""
+        self._workers = max(1, int(value))
+
+    @property
+    def memory_budget(self) -> int:
+        """Returns the memory budget shared by all the workers, in bytes."""
+        return self._memory_budget
+
+    @memory_budget.setter
+    def memory_budget(self, value: int) -> None:
+        """Sets the memory budget shared by all the workers, in bytes."""
+        self._memory_budget = max(1, int(value))
+
+    @property
+    def max_open_files(self) -> int:
+        """Returns the maximum number of HDF5 files kept open by all the workers together."""
+        return self._max_open_files
+
+    @max_open_files.setter
+    def max_open_files(self, value: int) -> None:
+        """Sets the maximum number of HDF5 files kept open by all the workers together."""
+        self._max_open_files = max(1, int(value))
+
+    @property
+    def pool_workers(self) -> int:
+        """Returns the number of worker processes, at most one per HDF5 file that may be open so that every worker keeps one open."""
+        return max(1, pool_size(min(self.workers, self.max_open_files)))
+
+    @property
+    def direct_chunks(self) -> bool:
+        """Returns True if the workers decompress the supported chunks themselves."""
+        return self._direct_chunks
+
+    @direct_chunks.setter
+    def direct_chunks(self, value: bool) -> None:
+        """Sets whether the workers decompress the supported chunks themselves."""
+        self._direct_chunks = bool(value)
+
+    @property
+    def sync(self) -> bool:
+        """Returns True if the workers flush the frames to disk before recording them."""
+        return self._sync
+
+    @sync.setter
+    def sync(self, value: bool) -> None:
+        """Sets whether the workers flush the frames to disk before recording them."""
+        self._sync = bool(value)
+
+    @property
+    def drop_cache(self) -> bool:
+        """Returns True if the workers tell the kernel to drop the written frames from its cache."""
+        return self._drop_cache
+
+    @drop_cache.setter
+    def drop_cache(self, value: bool) -> None:
+        """Sets whether the workers tell the kernel to drop the written frames from its cache."""
+        self._drop_cache = bool(value)
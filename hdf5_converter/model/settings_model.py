@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/settings_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This file contains the default settings of the HDF5 Converter and the parsing of
+# its network settings, free of heavy imports so that the command line and the API
+# can read them when they start.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import os
+
+
+# Default upper bound for the frames held in memory per window (512 MB)
+DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+
+# Default upper bound for the HDF5 files kept open by all the workers together
+DEFAULT_MAX_OPEN_FILES = 64
+
+# Default port the coordinator listens on
+DEFAULT_PORT = 7733
+
+# Default seconds a worker may hold a work unit without renewing its lease
+DEFAULT_LEASE = 60.0
+
+# The environment variable holding the secret shared by the coordinator and its workers
+KEY_VARIABLE = "HDF5CONVERTER_KEY"
+
+# Default port of the job API of the daemon
+DEFAULT_DAEMON_PORT = 7734
+
+
+def cluster_key(key: str | bytes | None = None) -> bytes:
+    """Returns the secret that authenticates the coordinator and its workers to each other, read from the environment unless given."""
+    key = os.environ.get(KEY_VARIABLE) if key is None else key
+    if not key:
+        raise ValueError(f"Set {KEY_VARIABLE} to the same secret on the coordinator and on every worker.")
+    return key.encode() if isinstance(key, str) else key
+
+
+def parse_address(address: str, default_port: int = DEFAULT_PORT) -> tuple[str, int]:
+    """Returns the (host, port) of a HOST:PORT address, an empty host standing for every interface and a missing port for the default one."""
+    host, _, port = address.rpartition(":") if ":" in address else (address, "", str(default_port))
+    try:
+        return host, int(port)
+    except ValueError:
+        raise ValueError(f"Invalid address '{address}', expected HOST:PORT.") from None
@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/stack_writer_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This file contains the writers of the output formats that store a whole stack
+# in a single file or directory, so that a dataset is written with a few large
+# sequential writes instead of a file per frame.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+from importlib.util import find_spec
+
+import numpy as np
+
+from hdf5_converter.model.tiff_writer_model import TiffWriterModel
+
+# Zarr is optional, the zarr format is only offered when it is installed and it is only imported by the first Zarr writer
+ZARR_AVAILABLE = find_spec("zarr") is not None
+
+
+# The compressors of the Zarr chunks, by compression name
+ZARR_COMPRESSION = ("none", "zstd", "blosc")
+
+# The space left for the page headers when deciding whether a stack fits in a classic TIFF file
+_TIFF_PAGE_OVERHEAD = 4096
+
+
+def tiff_stack_size(shape: tuple, dtype: np.dtype) -> int:
+    """Returns an upper bound of the size of a multipage TIFF file holding the stack uncompressed."""
+    return int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize + shape[0] * _TIFF_PAGE_OVERHEAD
+
+
+def open_tiff_stack(file_name: str, shape: tuple, dtype: np.dtype, compression: str) -> TiffWriterModel:
+    """Opens a multipage TIFF file for the stack, switching to BigTIFF when a classic file could exceed 4 GB."""
+    return TiffWriterModel(file_name, compression, bigtiff=tiff_stack_size(shape, dtype) >= 2**32)
+
+
+class NpyWriterModel:
+    """This class is responsible for writing a stack to a .npy file through a memory map."""
+
+    def __init__(self, file_name: str, shape: tuple, dtype: np.dtype) -> None:
+        """Initialises the .npy writer model, creating the file at its full size."""
+        self._array = np.lib.format.open_memmap(file_name, mode="w+", dtype=np.dtype(dtype), shape=tuple(shape))
+        self._frames = 0
+
+    def write(self, frame: np.ndarray) -> None:
+        """Copies the next frame into the memory map."""
+        if self._frames >= len(self._array):
+            raise ValueError(f"The stack only holds {len(self._array)} frame(s).")
+        self._array[self._frames] = frame
+        self._frames += 1
+
+    def close(self) -> None:
+        """Flushes the written pages to the file and releases the memory map."""
+        if self._array is None:
+            return
+        self._array.flush()
+        # Dropping the only reference unmaps the file, so that it can be renamed
+        self._array = None
+
+    @property
+    def frames(self) -> int:
+        return self._frames
+
+
+class ZarrWriterModel:
+    """This class is responsible for writing a stack to a Zarr directory store, a frame per chunk."""
+
+    def __init__(self, directory: str, shape: tuple, dtype: np.dtype, compression: str) -> None:
+        """Initialises the Zarr writer model, creating the array in the directory."""
+        try:
+            import zarr
+        except ImportError:
+            raise ImportError("The zarr format needs the zarr package, install it with: pip install zarr") from None
+        if compression not in ZARR_COMPRESSION:
+            raise ValueError(f"Unsupported Zarr compression: {compression}")
+
+        self._array = zarr.create_array(
+            store=directory,
+            shape=tuple(shape),
+            chunks=(1, *shape[1:]),
+            dtype=np.dtype(dtype),
+            compressors=self._compressors(compression),
+            overwrite=True,
+        )
+        self._frames = 0
+
+    @staticmethod
+    def _compressors(compression: str) -> tuple:
+        """Returns the Zarr codecs of the compression."""
+        import zarr.codecs
+
+        if compression == "zstd":
+            return (zarr.codecs.ZstdCodec(level=3),)
+        if compression == "blosc":
+            # Bit shuffled LZ4, as used by the detectors themselves
+            return (zarr.codecs.BloscCodec(cname="lz4", clevel=5, shuffle="bitshuffle"),)
+        return ()
+
+    def write(self, frame: np.ndarray) -> None:
+        """Writes the next frame as its own chunk."""
+        if self._frames >= self._array.shape[0]:
+            raise ValueError(f"The stack only holds {self._array.shape[0]} frame(s).")
+        self._array[self._frames] = frame
+        self._frames += 1
+
+    def close(self) -> None:
+        """Nothing is buffered, every chunk is stored as soon as it is written."""
+
+    @property
+    def frames(self) -> int:
+        return self._frames
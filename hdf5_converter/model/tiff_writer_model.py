@@ -0,0 +1,288 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/tiff_writer_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the TIFF writer model of the HDF5 Converter. It is responsible for writing
+# detector frames as baseline TIFF or multi-page BigTIFF files, uncompressed or with
+# deflate or LZW compression, straight from the NumPy buffers of the frames.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import io
+import struct
+import zlib
+from importlib.util import find_spec
+from typing import BinaryIO
+
+import numpy as np
+
+# Whether LZW runs at the speed of a compiled codec, the one of imagecodecs being used when installed and only imported by the first LZW strip
+LZW_ACCELERATED = find_spec("imagecodecs") is not None
+
+
+# The compression schemes and their TIFF codes
+TIFF_COMPRESSION = {None: 1, "none": 1, "lzw": 5, "deflate": 8}
+
+# The TIFF sample formats of the NumPy data type kinds
+_SAMPLE_FORMAT = {"u": 1, "i": 2, "f": 3}
+
+# The zlib level of deflate, detector frames gain little from the slower levels
+DEFLATE_LEVEL = 1
+
+# The bytes of the compressed strips, small enough for readers to decode them one at a time
+STRIP_BYTES = 256 * 1024
+
+# The TIFF field types
+_SHORT = 3
+_LONG = 4
+_LONG8 = 16
+
+# The TIFF tags written for every page
+_IMAGE_WIDTH = 256
+_IMAGE_LENGTH = 257
+_BITS_PER_SAMPLE = 258
+_COMPRESSION = 259
+_PHOTOMETRIC = 262
+_STRIP_OFFSETS = 273
+_SAMPLES_PER_PIXEL = 277
+_ROWS_PER_STRIP = 278
+_STRIP_BYTE_COUNTS = 279
+_PLANAR_CONFIGURATION = 284
+_SAMPLE_FORMAT_TAG = 339
+
+
+def supports_tiff(dtype: np.dtype) -> bool:
+    """Returns True if frames of the data type can be written by the TIFF writer."""
+    dtype = np.dtype(dtype)
+    return dtype.kind in _SAMPLE_FORMAT and dtype.itemsize in ((4,) if dtype.kind == "f" else (1, 2, 4))
+
+
+def _lzw_encode(data: bytes) -> bytes:
+    """Compresses the data with the LZW variant of TIFF, most significant bit first with early code width changes."""
+    clear_code, end_code = 256, 257
+    output = bytearray()
+    bit_buffer, bit_count, width = 0, 0, 9
+
+    def emit(code: int) -> None:
+        nonlocal bit_buffer, bit_count
+        bit_buffer = (bit_buffer << width) | code
+        bit_count += width
+        while bit_count >= 8:
+            bit_count -= 8
+            output.append((bit_buffer >> bit_count) & 0xFF)
+        bit_buffer &= (1 << bit_count) - 1
+
+    emit(clear_code)
+    if not data:
+        emit(end_code)
+        return bytes(output)
+
+    # The strings of the table are keyed by the code of their prefix and their last byte
+    table: dict[int, int] = {}
+    next_code = 258
+
+    def add_code() -> None:
+        nonlocal next_code, width
+        next_code += 1
+        if next_code == 4094:
+            # The table is full, start over
+            emit(clear_code)
+            table.clear()
+            next_code, width = 258, 9
+        elif next_code in (512, 1024, 2048):
+            # The decoder lags one code behind, so it widens its codes at 511, 1023 and 2047
+            width += 1
+
+    prefix = data[0]
+    for byte in data[1:]:
+        key = (prefix << 8) | byte
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+
+        emit(prefix)
+        table[key] = next_code
+        add_code()
+        prefix = byte
+
+    emit(prefix)
+    add_code()
+    emit(end_code)
+    if bit_count:
+        output.append((bit_buffer << (8 - bit_count)) & 0xFF)
+    return bytes(output)
+
+
+def _compress(data: bytes | memoryview, compression: str | None) -> bytes | memoryview:
+    """Compresses a strip with the given scheme."""
+    if compression == "deflate":
+        return zlib.compress(data, DEFLATE_LEVEL)
+    if compression == "lzw":
+        if not LZW_ACCELERATED:
+            return _lzw_encode(bytes(data))
+        import imagecodecs
+
+        return imagecodecs.lzw_encode(data)
+    return data
+
+
+class TiffWriterModel:
+    """This class is responsible for writing frames as the pages of a TIFF or BigTIFF file."""
+
+    def __init__(self, file: str | BinaryIO, compression: str | None = None, bigtiff: bool = False) -> None:
+        """Initialises the TIFF writer model, opening the file if a name is given."""
+        if compression not in TIFF_COMPRESSION:
+            raise ValueError(f"Unsupported TIFF compression: {compression}")
+
+        self._compression = None if compression == "none" else compression
+        self._bigtiff = bigtiff
+        self._owns_file = isinstance(file, str)
+        self._file: BinaryIO = open(file, "wb") if self._owns_file else file
+        self._start = self._file.tell()
+        self._pages = 0
+
+        # The position of the offset that points to the next page, patched when it is written
+        self._next_pointer: int | None = None
+
+    def write(self, frame: np.ndarray) -> None:
+        """Appends a frame to the file as a new page."""
+        if frame.ndim != 2:
+            raise ValueError(f"Only 2D frames can be written as TIFF pages, got shape {frame.shape}")
+        if not supports_tiff(frame.dtype):
+            raise ValueError(f"Unsupported TIFF data type: {frame.dtype}")
+
+        # The pixels are written little endian, as declared by the header
+        frame = np.ascontiguousarray(frame, dtype=frame.dtype.newbyteorder("<"))
+        rows, columns = frame.shape
+        row_bytes = columns * frame.dtype.itemsize
+
+        if self._compression is None:
+            # A single strip, written straight from the frame buffer
+            rows_per_strip = max(1, rows)
+            strips = [memoryview(frame).cast("B")]
+        else:
+            rows_per_strip = max(1, min(rows, STRIP_BYTES // max(1, row_bytes)))
+            strips = [_compress(memoryview(frame[row:][:rows_per_strip]).cast("B"), self._compression) for row in range(0, rows, rows_per_strip)]
+
+        # The first page also writes the header, whose offset to the first page is only known now
+        header_size = (16 if self._bigtiff else 8) if self._pages == 0 else 0
+        data_offset = self._file.seek(0, 2) + header_size
+        offsets, position = [], data_offset
+        for strip in strips:
+            offsets.append(position - self._start)
+            position += len(strip)
+        ifd_offset = position + (position & 1)
+
+        if not self._bigtiff and ifd_offset + 2048 - self._start >= 2**32:
+            raise ValueError("The TIFF file would exceed 4 GB, use BigTIFF instead.")
+
+        tags = [
+            (_IMAGE_WIDTH, _LONG, [columns]),
+            (_IMAGE_LENGTH, _LONG, [rows]),
+            (_BITS_PER_SAMPLE, _SHORT, [frame.dtype.itemsize * 8]),
+            (_COMPRESSION, _SHORT, [TIFF_COMPRESSION[self._compression]]),
+            (_PHOTOMETRIC, _SHORT, [1]),
+            (_STRIP_OFFSETS, _LONG8 if self._bigtiff else _LONG, offsets),
+            (_SAMPLES_PER_PIXEL, _SHORT, [1]),
+            (_ROWS_PER_STRIP, _LONG, [rows_per_strip]),
+            (_STRIP_BYTE_COUNTS, _LONG8 if self._bigtiff else _LONG, [len(strip) for strip in strips]),
+            (_PLANAR_CONFIGURATION, _SHORT, [1]),
+            (_SAMPLE_FORMAT_TAG, _SHORT, [_SAMPLE_FORMAT[frame.dtype.kind]]),
+        ]
+        ifd, next_pointer = self._ifd(tags, ifd_offset - self._start)
+
+        if header_size:
+            if self._bigtiff:
+                self._file.write(struct.pack("<2sHHHQ", b"II", 43, 8, 0, ifd_offset - self._start))
+            else:
+                self._file.write(struct.pack("<2sHI", b"II", 42, ifd_offset - self._start))
+        else:
+            # Link the previous page to this one
+            end = self._file.tell()
+            self._file.seek(self._next_pointer)
+            self._file.write(struct.pack("<Q" if self._bigtiff else "<I", ifd_offset - self._start))
+            self._file.seek(end)
+
+        for strip in strips:
+            self._file.write(strip)
+        if position & 1:
+            self._file.write(b"\0")
+        self._file.write(ifd)
+
+        self._next_pointer = ifd_offset + next_pointer
+        self._pages += 1
+
+    def _ifd(self, tags: list[tuple[int, int, list[int]]], ifd_offset: int) -> tuple[bytes, int]:
+        """Returns the image file directory of a page and the position of its next page offset within it."""
+        count_format, entry_format, offset_format = ("<Q", "<HHQ", "<Q") if self._bigtiff else ("<H", "<HHI", "<I")
+        inline_size = 8 if self._bigtiff else 4
+        value_formats = {_SHORT: "H", _LONG: "I", _LONG8: "Q"}
+
+        entries_size = struct.calcsize(count_format) + len(tags) * (struct.calcsize(entry_format) + inline_size) + struct.calcsize(offset_format)
+        entries = bytearray(struct.pack(count_format, len(tags)))
+        values = bytearray()
+
+        for tag, field_type, data in tags:
+            packed = struct.pack(f"<{len(data)}{value_formats[field_type]}", *data)
+            entries += struct.pack(entry_format, tag, field_type, len(data))
+            if len(packed) <= inline_size:
+                entries += packed.ljust(inline_size, b"\0")
+            else:
+                # Values that do not fit in the entry are stored after the directory
+                entries += struct.pack(offset_format, ifd_offset + entries_size + len(values))
+                values += packed
+                values += b"\0" * (len(values) & 1)
+
+        next_pointer = len(entries)
+        entries += struct.pack(offset_format, 0)
+        return bytes(entries + values), next_pointer
+
+    def close(self) -> None:
+        """Closes the file if it was opened by the writer."""
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self) -> "TiffWriterModel":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def pages(self) -> int:
+        """Returns the number of pages written."""
+        return self._pages
+
+
+def encode_tiff(frame: np.ndarray, compression: str | None = None) -> bytes:
+    """Returns the bytes of a baseline TIFF file holding a single frame."""
+    buffer = io.BytesIO()
+    with TiffWriterModel(buffer, compression) as writer:
+        writer.write(frame)
+    return buffer.getvalue()
+
+
+def write_tiff(file_name: str, frame: np.ndarray, compression: str | None = None) -> None:
+    """Writes a single frame as a baseline TIFF file."""
+    with TiffWriterModel(file_name, compression) as writer:
+        writer.write(frame)
@@ -0,0 +1,345 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/watch_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the watch model of the HDF5 Converter. It is responsible for watching a
+# directory during an acquisition and converting the frames of new or growing HDF5
+# files, including SWMR written ones, as soon as they become readable.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+import h5py
+import numpy as np
+
+from hdf5_converter.model.chunk_reader_model import ChunkReaderModel
+from hdf5_converter.model.dataset_index_model import BLOCK_LINK
+from hdf5_converter.model.dataset_rule_model import DatasetRules
+from hdf5_converter.model.format_registry_model import FORMATS
+from hdf5_converter.model.frame_encoder_model import FrameEncoderModel, frame_file, write_frame
+from hdf5_converter.model.frame_reduction_model import FrameReduction, reduce_windows
+from hdf5_converter.model.frame_selection_model import FrameSelection
+from hdf5_converter.model.frame_stream_model import DEFAULT_MEMORY_BUDGET, FrameStreamModel, find_datasets
+from hdf5_converter.model.manifest_model import FrameStatus, ManifestModel
+
+
+# The extensions of the files picked up by the watcher
+WATCH_EXTENSIONS = (".h5", ".hdf5", ".mh5", ".ph5")
+
+
+class FileNotReady(Exception):
+    """Raised when a watched file cannot be opened or read yet, e.g. while the detector holds it."""
+
+
+class WatchedFile:
+    """The conversion state of a file seen by the watcher."""
+
+    def __init__(self) -> None:
+        self.signature: tuple[int, int] | None = None
+        self.frames_done: dict[str, int] = {}
+        self.skipped: set[str] = set()
+
+
+class WatchModel:
+    """This class is responsible for converting the frames of the files of a directory while they are being written."""
+
+    def __init__(
+        self,
+        directory: str,
+        search_term: str | DatasetRules,
+        output_type: str,
+        digits: int,
+        workers: int = 1,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        poll_interval: float = 0.5,
+        direct_chunks: bool = True,
+        compression: str | None = None,
+        sync: bool = False,
+        drop_cache: bool = False,
+        selection: FrameSelection | None = None,
+        reduction: FrameReduction | None = None,
+    ) -> None:
+        """Initialises the watch model."""
+        # The frames of growing files are written as they arrive, which needs a format with a file per frame
+        output_format = FORMATS.get(output_type)
+        if output_format.multi_frame:
+            raise ValueError(f"The {output_type} format stores whole stacks and cannot be used to watch a folder.")
+        output_format.check_compression(compression)
+
+        self._directory = directory
+        self._rules = DatasetRules.of(search_term)
+        self._output_type = output_type
+        self._digits = int(digits)
+        self._poll_interval = poll_interval
+        self._selection = None if selection is None or selection.is_full else selection
+        self._reduction = None if reduction is None or reduction.is_identity else reduction
+
+        self._chunk_reader = ChunkReaderModel() if direct_chunks else None
+        self._stream = FrameStreamModel(memory_budget, self._chunk_reader)
+        self._encoder = FrameEncoderModel(workers, compression=compression, sync=sync, drop_cache=drop_cache)
+        self._files: dict[str, WatchedFile] = {}
+        self._claimed: dict[Path, tuple[str, str]] = {}
+        self._manifests: dict[Path, ManifestModel] = {}
+        self._stop = threading.Event()
+
+    def run(self, on_message: Callable[[str], None], idle_timeout: float | None = None) -> None:
+        """Watches the directory until stopped, or until no new frames appear for idle_timeout seconds."""
+        self._stop.clear()
+        last_activity = time.monotonic()
+
+        try:
+            while not self._stop.is_set():
+                if self.poll(on_message):
+                    last_activity = time.monotonic()
+                elif idle_timeout is not None and time.monotonic() - last_activity >= idle_timeout:
+                    break
+                self._stop.wait(self._poll_interval)
+        finally:
+            try:
+                self._encoder.shutdown()
+            finally:
+                if self._chunk_reader is not None:
+                    self._chunk_reader.shutdown()
+
+    def stop(self) -> None:
+        """Stops watching after the current poll."""
+        self._stop.set()
+
+    def poll(self, on_message: Callable[[str], None]) -> int:
+        """Converts the frames that became readable since the last poll and returns how many were written."""
+        converted = 0
+
+        for entry in sorted(os.scandir(self._directory), key=lambda entry: entry.name):
+            if self._stop.is_set():
+                break
+            if not entry.is_file() or not entry.name.lower().endswith(WATCH_EXTENSIONS):
+                continue
+
+            # Only reopen the files that were modified since the last poll
+            stat = entry.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+            state = self._files.setdefault(entry.path, WatchedFile())
+            if state.signature == signature:
+                continue
+
+            try:
+                converted += self._convert_file(entry.path, state, on_message)
+            except FileNotReady:
+                # The file is locked or incomplete while the detector writes it, retry on the next poll
+                continue
+
+            state.signature = signature
+
+        return converted
+
+    @staticmethod
+    def _open(file_name: str) -> h5py.File:
+        """Opens the file for SWMR reading, falling back to a plain read for files that do not support it."""
+        try:
+            return h5py.File(file_name, "r", libver="latest", swmr=True)
+        except OSError:
+            return h5py.File(file_name, "r")
+
+    def _convert_file(self, file_name: str, state: WatchedFile, on_message: Callable[[str], None]) -> int:
+        """Converts the new frames of every matching dataset of the file."""
+        converted = 0
+
+        # Only the errors of opening and reading the file are retried, those of the outputs are reported
+        try:
+            file = self._open(file_name)
+        except OSError as e:
+            raise FileNotReady(str(e)) from e
+
+        with file:
+            try:
+                names = find_datasets(file, self._rules)
+                linked = self._linked_stacks(file)
+            except OSError as e:
+                raise FileNotReady(str(e)) from e
+
+            # The stacks of an Eiger master file are numbered across its data files, which may still be missing while they are written
+            for name in linked:
+                if name not in state.skipped:
+                    state.skipped.add(name)
+                    on_message(f"Error: The dataset {name} of {file_name} is stored in other files and cannot be watched, convert it once it is complete.")
+
+            for name in names:
+                if name in state.skipped:
+                    continue
+                try:
+                    converted += self._convert_dataset(file_name, name, file, state, on_message)
+                except FileNotReady:
+                    raise
+                except Exception as e:
+                    state.skipped.add(name)
+                    on_message(f"Error processing dataset {name} of {file_name}: {e}")
+
+        return converted
+
+    def _linked_stacks(self, file: h5py.File) -> list[str]:
+        """Returns the names of the selected stacks the external links of the file point to, named like the index of a whole conversion names them."""
+        blocks: dict[str, list[str]] = {}
+
+        def visit_links(name: str, link: h5py.SoftLink | h5py.ExternalLink | h5py.HardLink) -> None:
+            if isinstance(link, h5py.ExternalLink):
+                match = BLOCK_LINK.fullmatch(name)
+                blocks.setdefault(match["name"] if match else name, []).append(name)
+
+        file.visititems_links(visit_links)
+        # A single link keeps its own name
+        names = [stack if len(links) > 1 else links[0] for stack, links in blocks.items()]
+        return [name for name in names if self._rules.matches(name)]
+
+    @staticmethod
+    def _read(windows: Iterable[tuple[int, np.ndarray]]) -> Iterator[tuple[int, np.ndarray]]:
+        """Yields the windows read from a watched file, an error of a read meaning that the file is not ready yet."""
+        iterator = iter(windows)
+        while True:
+            try:
+                window = next(iterator)
+            except StopIteration:
+                return
+            except OSError as e:
+                raise FileNotReady(str(e)) from e
+            yield window
+
+    def _claim(self, output_path: Path, file_name: str, name: str, state: WatchedFile, on_message: Callable[[str], None]) -> bool:
+        """Claims the output of a dataset the first time it is seen, refusing outputs claimed by another dataset."""
+        owner = self._claimed.get(output_path)
+        if owner == (file_name, name):
+            return True
+
+        if owner is not None:
+            state.skipped.add(name)
+            on_message(f"Error: The file or directory '{output_path}' already exists. Conversion stopped to prevent data loss.")
+            return False
+
+        self._claimed[output_path] = (file_name, name)
+        return True
+
+    def _manifest(self, directory: Path) -> ManifestModel:
+        """Returns the manifest of the output directory, loaded the first time one of its frames is checked."""
+        if directory not in self._manifests:
+            self._manifests[directory] = ManifestModel(directory)
+        return self._manifests[directory]
+
+    def _conflict(self, output_file: str, name: str, state: WatchedFile, on_message: Callable[[str], None]) -> None:
+        """Stops converting a dataset whose output file was not written by the converter."""
+        state.skipped.add(name)
+        on_message(f"Error: The file '{output_file}' already exists. Conversion stopped to prevent data loss.")
+
+    def _convert_dataset(self, file_name: str, name: str, file: h5py.File, state: WatchedFile, on_message: Callable[[str], None]) -> int:
+        """Converts the frames of the dataset that were not converted yet, and returns how many were written."""
+        try:
+            node = file[name]
+        except OSError as e:
+            raise FileNotReady(str(e)) from e
+
+        # Get the base name and parent directory of the file
+        parent_dir = Path(file_name).parent
+        base_name = Path(file_name).stem
+        frames_done = state.frames_done.get(name, 0)
+        reduction = self._reduction
+        suffix = "" if reduction is None else f"_{reduction.suffix}"
+
+        # Datasets that can still grow are always treated as stacks
+        if node.ndim == 2 or (node.ndim == 3 and node.shape[0] == 1 and node.maxshape[0] == 1):
+            # Single frame case
+            output_file = parent_dir / f"{base_name}{suffix}.{FORMATS.get(self._output_type).extension}"
+            if frames_done or not self._claim(output_file, file_name, name, state, on_message):
+                return 0
+
+            status = self._manifest(parent_dir).status(str(output_file), file_name, name, 0)
+            if status is FrameStatus.CONFLICT:
+                self._conflict(str(output_file), name, state, on_message)
+                return 0
+
+            if status is FrameStatus.COMPLETE:
+                state.frames_done[name] = 1
+                return 0
+            try:
+                data = FrameStreamModel.read_frame(node, self._selection)
+            except OSError as e:
+                raise FileNotReady(str(e)) from e
+            data = data if reduction is None else reduction.reduce_frame(data)
+            write_frame(data, str(output_file), self._output_type, (file_name, name, 0), self._encoder.compression)
+            # The frame only counts as done once it is written, so that a failed write is reported rather than forgotten
+            state.frames_done[name] = 1
+            return 1
+
+        # Multiple frames case, only the frames written since the last poll, and only whole groups of the frames combined into one
+        frames = range(node.shape[0]) if self._selection is None else self._selection.frames(node.shape[0])
+        group = 1 if reduction is None else reduction.frames
+        complete = len(frames) - len(frames) % group
+        stop = frames[complete - 1] + 1 if complete else 0
+        if stop <= frames_done:
+            return 0
+
+        output_dir = parent_dir / f"{base_name}_{self._output_type}{suffix}"
+        if not self._claim(output_dir, file_name, name, state, on_message):
+            return 0
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_file = str(output_dir / base_name)
+        manifest = self._manifest(output_dir)
+
+        converted = 0
+        done = frames_done
+        read = self._read(self._stream.iter_windows(node, frames_done, stop, prefetch=True, selection=self._selection, group=group))
+        try:
+            for outputs, data in reduce_windows(read, frames, reduction):
+                # Skip the frames converted before the watcher was restarted
+                indices, output_files, sources = [], [], []
+                conflict = None
+                for i, frame in enumerate(outputs):
+                    output_file_with_frame = frame_file(output_file, frame, self._digits, self._output_type)
+                    status = manifest.status(output_file_with_frame, file_name, name, frame)
+                    if status is FrameStatus.CONFLICT:
+                        conflict = output_file_with_frame
+                        break
+                    if status is FrameStatus.MISSING:
+                        indices.append(i)
+                        output_files.append(output_file_with_frame)
+                        sources.append((file_name, name, frame))
+
+                if indices:
+                    self._encoder.write_frames((data[i] for i in indices), output_files, self._output_type, sources)
+                    converted += len(indices)
+
+                if conflict is not None:
+                    self._conflict(conflict, name, state, on_message)
+                    break
+
+                # The last source frame of the window, the last one of its last group when the frames are combined
+                last_frame = outputs[-1] if reduction is None else frames[(outputs[-1] + 1) * group - 1]
+                done = last_frame + 1
+        finally:
+            # Wait for the frames still being written, so their errors are reported with the dataset
+            self._encoder.flush()
+            # Only the frames confirmed written count as done, the flush raising before this when a write failed
+            state.frames_done[name] = done
+
+        return converted
@@ -0,0 +1,230 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/model/write_behind_model.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This file contains the write stage of the conversion pipeline. Encoded frames
+# are queued and written to disk by a few threads, so that disk latency does not
+# hold up reading and encoding the next frames.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import os
+import queue
+import threading
+from pathlib import Path
+
+from hdf5_converter.model.manifest_model import data_checksum, record_frame
+from hdf5_converter.model.profiler_model import sample, span
+
+
+# The number of threads writing the encoded frames
+DEFAULT_WRITE_THREADS = 2
+
+# Default upper bound for the encoded bytes waiting to be written (64 MB)
+DEFAULT_MAX_PENDING = 64 * 1024 * 1024
+
+# The number of files flushed to disk together when syncing
+DEFAULT_SYNC_BATCH = 32
+
+# Whether the kernel can be told that the written pages will not be read again
+FADVISE_AVAILABLE = hasattr(os, "posix_fadvise")
+
+
+class WriteBehindModel:
+    """This class is responsible for writing the encoded frames in background threads, with a bounded queue."""
+
+    def __init__(
+        self,
+        threads: int = DEFAULT_WRITE_THREADS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        sync: bool = False,
+        sync_batch: int = DEFAULT_SYNC_BATCH,
+        drop_cache: bool = False,
+    ) -> None:
+        """Initialises the write behind model, the threads being started by the first frame."""
+        self._thread_count = max(1, int(threads))
+        self._max_pending = max(1, int(max_pending))
+        self._sync = bool(sync)
+        self._sync_batch = max(1, int(sync_batch))
+        self._drop_cache = bool(drop_cache) and FADVISE_AVAILABLE
+
+        self._queue: queue.Queue = queue.Queue()
+        self._threads: list[threading.Thread] = []
+        self._condition = threading.Condition()
+        # The bytes waiting to be written, and the files waiting to be written or committed
+        self._pending_bytes = 0
+        self._pending_files = 0
+        self._errors: list[BaseException] = []
+
+    def _start(self) -> None:
+        """Starts the writer threads, unless they are running."""
+        with self._condition:
+            if self._threads:
+                return
+            self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(self._thread_count)]
+            for thread in self._threads:
+                thread.start()
+
+    def submit(self, data: bytes, output_file: str, source: tuple[str, str, int] | None = None) -> None:
+        """Queues the bytes of a file, waiting while the queue is full so that encoding never runs far ahead of the disk."""
+        self._raise_errors()
+        self._start()
+
+        with self._condition:
+            while self._pending_bytes and self._pending_bytes + len(data) > self._max_pending:
+                self._condition.wait()
+            self._pending_bytes += len(data)
+            self._pending_files += 1
+            sample("write", self._pending_files)
+        self._queue.put((data, output_file, source))
+
+    def _run(self) -> None:
+        """Writes the queued files, committing them in batches when syncing."""
+        batch: list[tuple[int, str, str, tuple[str, str, int, int, str] | None]] = []
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._commit(batch)
+                return
+
+            data, output_file, source = item
+            try:
+                with span("write", len(data)):
+                    descriptor = self._write(data, output_file)
+                # The size and checksum of the record come from the bytes in memory, the written file is never read back
+                record = None if source is None else (*source, len(data), data_checksum(data))
+                batch.append((descriptor, f"{output_file}.part", output_file, record))
+            except BaseException as e:
+                self._finish(1, e)
+            finally:
+                # The bytes are on their way to the disk, so the encoder may fill the queue again
+                with self._condition:
+                    self._pending_bytes -= len(data)
+                    self._condition.notify_all()
+
+            if not self._sync or len(batch) >= self._sync_batch or self._queue.empty():
+                with span("commit"):
+                    self._commit(batch)
+                batch = []
+
+    @staticmethod
+    def _write(data: bytes, output_file: str) -> int:
+        """Writes the bytes under the temporary name of the file and returns its open descriptor."""
+        descriptor = os.open(f"{output_file}.part", os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                written = os.write(descriptor, view)
+                view = view[written:]
+        except BaseException:
+            os.close(descriptor)
+            raise
+        return descriptor
+
+    def _commit(self, batch: list[tuple[int, str, str, tuple[str, str, int, int, str] | None]]) -> None:
+        """Flushes the batch to disk if syncing, then records the files in the manifests and gives them their final names."""
+        error = None
+        committed = []
+        for descriptor, partial_file, output_file, record in batch:
+            try:
+                if self._sync:
+                    os.fsync(descriptor)
+                if self._drop_cache:
+                    # Starts the write back now and lets the kernel drop the pages, the frames are not read again
+                    os.posix_fadvise(descriptor, 0, 0, os.POSIX_FADV_DONTNEED)
+                os.close(descriptor)
+                # Recorded before the rename, so that an interrupted commit leaves a frame to write again rather than an unknown file
+                if record is not None:
+                    record_frame(output_file, *record)
+                os.replace(partial_file, output_file)
+                committed.append(output_file)
+            except BaseException as e:
+                error = error or e
+
+        try:
+            if self._sync:
+                # One flush per directory makes the renames of the whole batch durable
+                for directory in {Path(output_file).parent for output_file in committed}:
+                    self._sync_directory(directory)
+        except BaseException as e:
+            error = error or e
+
+        self._finish(len(batch), error)
+
+    @staticmethod
+    def _sync_directory(directory: Path) -> None:
+        """Flushes the entries of a directory to disk, where the platform allows it."""
+        if os.name == "nt":
+            return
+        descriptor = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def _finish(self, files: int, error: BaseException | None = None) -> None:
+        """Marks the files as done, keeping the error if any."""
+        with self._condition:
+            self._pending_files -= files
+            if error is not None:
+                self._errors.append(error)
+            self._condition.notify_all()
+
+    def _raise_errors(self) -> None:
+        """Raises the first error of the files written since the last check."""
+        with self._condition:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+    def flush(self) -> None:
+        """Waits for every queued file to be written and recorded, then raises the first error."""
+        with self._condition:
+            while self._pending_files:
+                self._condition.wait()
+        self._raise_errors()
+
+    def close(self) -> None:
+        """Writes the queued files and stops the threads, which are started again by the next frame, then raises the first error."""
+        with self._condition:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+        # The files that failed while the queue was drained are reported like those of a flush
+        self._raise_errors()
+
+    @property
+    def threads(self) -> int:
+        """Returns the number of writer threads."""
+        return self._thread_count
+
+    @property
+    def sync(self) -> bool:
+        """Returns True if the files are flushed to disk before they are recorded."""
+        return self._sync
+
+    @property
+    def drop_cache(self) -> bool:
+        """Returns True if the kernel is told to drop the written pages from its cache."""
+        return self._drop_cache
@@ -27,10 +27,12 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 # ----------------------------------------------------------------------------------
 
-from gsewidgets import Label, SimpleButton, MultiFileBrowserButton, NumericSpinBox, FullComboBox, InputBox
+from gsewidgets import CheckBox, Label, SimpleButton, MultiFileBrowserButton, DirectoryBrowserButton, NumericSpinBox, FullComboBox, InputBox
 from qtpy.QtCore import QSize
 from qtpy.QtWidgets import QFrame, QGridLayout, QHBoxLayout, QSizePolicy
 
+from hdf5_converter.model.frame_encoder_model import default_workers, pool_size
+
 
 class ConverterView(QFrame):
     """Creates the converter view of the HDF5 Converter GUI."""
@@ -44,10 +46,21 @@ class ConverterView(QFrame):
         self.lbl_digits = Label("Number of Digits")
         self.spin_digits = NumericSpinBox(min_value=1, max_value=10, default_value=3, incremental_step=1, size=QSize(32, 32))
         self.btn_convert = SimpleButton("Convert")
+        self.btn_cancel = SimpleButton("Cancel")
         self.lbl_output_type = Label("Output Type")
         self.cmb_output_type = FullComboBox()
-        self.lbl_search_term = Label("Dataset Search Term")
-        self.input_search_term = InputBox(placeholder="Enter search term", size=QSize(200, 32))
+        self.lbl_search_term = Label("Dataset Rules")
+        self.input_search_term = InputBox(placeholder="Enter dataset rules", size=QSize(200, 32))
+        self.btn_browse = SimpleButton("Browse")
+        self.lbl_workers = Label("Workers")
+        self.spin_workers = NumericSpinBox(min_value=1, max_value=pool_size(64), default_value=default_workers(), incremental_step=1, size=QSize(32, 32))
+        self.lbl_frames = Label("Frames")
+        self.input_frames = InputBox(placeholder="start:stop:step", size=QSize(120, 32))
+        self.lbl_roi = Label("ROI")
+        self.input_roi = InputBox(placeholder="x,y,width,height", size=QSize(120, 32))
+        self.chk_profile = CheckBox("Profile")
+        self.btn_watch = DirectoryBrowserButton(text="Watch Folder", caption="Select Folder")
+        self.btn_stop_watch = SimpleButton("Stop Watching")
 
         # Configure the widgets
         self._configure_widgets()
@@ -57,17 +70,31 @@ class ConverterView(QFrame):
 
     def _configure_widgets(self) -> None:
         """Configures the widgets of the converter view."""
-        # Set the default output type
-        self.cmb_output_type.addItem("tiff")
-        self.cmb_output_type.addItem("cbf")
-        self.cmb_output_type.setCurrentIndex(0)
-
         self.btn_input.clicked.connect(self._update_load_file_button)
         self.btn_convert.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.btn_stop_watch.setEnabled(False)
+        self.btn_cancel.setEnabled(False)
 
         # Set the default search term value
         self.input_search_term.setText("data")
 
+        self.input_search_term.setToolTip(
+            "Space separated rules selecting the datasets by their path: a term found in the path, a glob matching the whole path, "
+            "'re:' followed by a regular expression, and '!' before any of them to exclude the matching datasets."
+        )
+        self.btn_browse.setToolTip("Browse the datasets of the loaded files, preview their frames and edit the rules.")
+
+        # An empty selection converts every frame whole
+        self.input_frames.setToolTip("Frames of each stack to convert, counted from 0, e.g. 100:500 or ::10. Leave empty for all frames.")
+        self.input_roi.setToolTip("Region of each frame to convert, in pixels. Leave empty for the whole frame.")
+        self.chk_profile.setToolTip("Time every stage of the conversion and show where the time went once it is done.")
+
+    def set_output_types(self, output_types: list[str]) -> None:
+        """Fills the output type combo box, selecting the first type."""
+        self.cmb_output_type.clear()
+        self.cmb_output_type.addItems(output_types)
+        self.cmb_output_type.setCurrentIndex(0)
+
     def _update_load_file_button(self) -> None:
         """Updates the load file button with the selected file paths."""
         if self.btn_input.file_path:
@@ -95,15 +122,36 @@ class ConverterView(QFrame):
         layout_search_term.setSpacing(0)
         layout_search_term.addWidget(self.lbl_search_term)
         layout_search_term.addWidget(self.input_search_term)
+        layout_search_term.addWidget(self.btn_browse)
+
+        layout_workers = QHBoxLayout()
+        layout_workers.setContentsMargins(0, 0, 0, 0)
+        layout_workers.setSpacing(0)
+        layout_workers.addWidget(self.lbl_workers)
+        layout_workers.addWidget(self.spin_workers)
+
+        layout_selection = QHBoxLayout()
+        layout_selection.setContentsMargins(0, 0, 0, 0)
+        layout_selection.setSpacing(0)
+        layout_selection.addWidget(self.lbl_frames)
+        layout_selection.addWidget(self.input_frames)
+        layout_selection.addWidget(self.lbl_roi)
+        layout_selection.addWidget(self.input_roi)
+        layout_selection.addWidget(self.chk_profile)
 
         layout = QGridLayout()
         layout.setContentsMargins(0, 0, 0, 0)
-        layout.addWidget(self.btn_input, 0, 0, 1, 3)
+        layout.addWidget(self.btn_input, 0, 0, 1, 4)
         layout.addLayout(layout_search_term, 1, 0, 1, 1)
         layout.addLayout(layout_digits, 1, 1, 1, 1)
         layout.addLayout(layout_output_type, 1, 2, 1, 1)
-        layout.setColumnStretch(3, 1)
-        layout.addWidget(self.btn_convert, 0, 3, 2, 2)
+        layout.addLayout(layout_workers, 1, 3, 1, 1)
+        layout.setColumnStretch(4, 1)
+        layout.addWidget(self.btn_convert, 0, 4, 2, 2)
+        layout.addLayout(layout_selection, 2, 0, 1, 4)
+        layout.addWidget(self.btn_cancel, 2, 4, 1, 2)
+        layout.addWidget(self.btn_watch, 3, 0, 1, 4)
+        layout.addWidget(self.btn_stop_watch, 3, 4, 1, 2)
 
         # Set the layout to the converter view
         self.setLayout(layout)
@@ -115,3 +163,9 @@ class ConverterView(QFrame):
         self.cmb_output_type.setEnabled(status)
         self.btn_convert.setEnabled(status)
         self.input_search_term.setEnabled(status)
+        self.btn_browse.setEnabled(status)
+        self.spin_workers.setEnabled(status)
+        self.input_frames.setEnabled(status)
+        self.input_roi.setEnabled(status)
+        self.chk_profile.setEnabled(status)
+        self.btn_watch.setEnabled(status)
@@ -0,0 +1,205 @@
+#!/usr/bin/python3
+# ----------------------------------------------------------------------------------
+# Project: HDF5 Converter
+# File: hdf5_converter/view/dataset_browser_view.py
+# ----------------------------------------------------------------------------------
+# Purpose:
+# This is the dataset browser view of the HDF5 Converter GUI. It shows the tree of
+# an HDF5 file, the metadata and a preview of its datasets, and the rules that
+# select the datasets to convert.
+# ----------------------------------------------------------------------------------
+# Author: Christofanis Skordas
+#
+# Copyright (c) 2025 GSECARS, The University of Chicago
+# Copyright (c) 2025 NSF SEES, Synchrotron Earth and Environmental Science
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# ----------------------------------------------------------------------------------
+
+import numpy as np
+from gsewidgets import FullComboBox, InputBox, Label, SimpleButton
+from qtpy.QtCore import QSize, Qt
+from qtpy.QtGui import QImage, QPixmap
+from qtpy.QtWidgets import QDialog, QFileDialog, QGridLayout, QHBoxLayout, QLabel, QSpinBox, QTreeWidget, QTreeWidgetItem, QVBoxLayout
+
+from hdf5_converter.model.dataset_browser_model import BrowserNode
+from hdf5_converter.model.dataset_rule_model import DatasetRules
+
+
+# The columns of the tree
+COLUMN_NAME = 0
+COLUMN_DESCRIPTION = 1
+COLUMN_SELECTED = 2
+
+# The side of the preview, in pixels
+PREVIEW_PIXELS = 256
+
+# The file dialog filter of the saved rule sets
+RULES_FILTER = "Dataset rules (*.json)"
+
+
+class DatasetBrowserView(QDialog):
+    """Creates the dataset browser view of the HDF5 Converter GUI."""
+
+    def __init__(self, parent=None) -> None:
+        """Initialises the dataset browser view."""
+        super(DatasetBrowserView, self).__init__(parent)
+
+        # Create the widgets
+        self.lbl_file = Label("File")
+        self.cmb_file = FullComboBox()
+        self.tree = QTreeWidget()
+        self.lbl_info = Label("")
+        self.lbl_preview = QLabel()
+        self.lbl_frame = Label("Frame")
+        self.spin_frame = QSpinBox()
+        self.lbl_rules = Label("Dataset Rules")
+        self.input_rules = InputBox(placeholder="data, entry/*/data or re:^entry/data/", size=QSize(300, 32))
+        self.lbl_rules_status = Label("")
+        self.btn_include = SimpleButton("Include")
+        self.btn_exclude = SimpleButton("Exclude")
+        self.btn_load_rules = SimpleButton("Load Rules")
+        self.btn_save_rules = SimpleButton("Save Rules")
+        self.btn_apply = SimpleButton("Apply")
+
+        # Configure the widgets
+        self._configure_widgets()
+
+        # Set the layout of the dataset browser view
+        self._layout()
+
+    def _configure_widgets(self) -> None:
+        """Configures the widgets of the dataset browser view."""
+        self.setWindowTitle("Browse Datasets")
+        self.setMinimumSize(900, 600)
+
+        self.tree.setHeaderLabels(["Name", "Description", "Selected"])
+        self.tree.setColumnWidth(COLUMN_NAME, 260)
+        self.tree.setColumnWidth(COLUMN_DESCRIPTION, 320)
+
+        # The frames of the current dataset set the range, until one is shown there is only the first
+        self.spin_frame.setRange(0, 0)
+        self.spin_frame.setMinimumWidth(80)
+
+        self.lbl_info.setWordWrap(True)
+        self.lbl_preview.setFixedSize(PREVIEW_PIXELS, PREVIEW_PIXELS)
+        self.lbl_preview.setAlignment(Qt.AlignCenter)
+
+        self.input_rules.setToolTip(
+            "Space separated rules: a term found in the path of the dataset, a glob matching the whole path (* also matches the groups), "
+            "'re:' followed by a regular expression, and '!' before any of them to exclude the matching datasets."
+        )
+        self.btn_include.setToolTip("Add a rule selecting the dataset, or every dataset of the group.")
+        self.btn_exclude.setToolTip("Add a rule excluding the dataset, or every dataset of the group.")
+
+    def _layout(self) -> None:
+        """Sets the layout of the dataset browser view."""
+        layout_file = QHBoxLayout()
+        layout_file.setContentsMargins(0, 0, 0, 0)
+        layout_file.addWidget(self.lbl_file)
+        layout_file.addWidget(self.cmb_file, 1)
+
+        layout_frame = QHBoxLayout()
+        layout_frame.setContentsMargins(0, 0, 0, 0)
+        layout_frame.addWidget(self.lbl_frame)
+        layout_frame.addWidget(self.spin_frame)
+        layout_frame.addStretch(1)
+
+        layout_details = QVBoxLayout()
+        layout_details.setContentsMargins(0, 0, 0, 0)
+        layout_details.addWidget(self.lbl_preview)
+        layout_details.addLayout(layout_frame)
+        layout_details.addWidget(self.lbl_info)
+        layout_details.addStretch(1)
+
+        layout_rules = QHBoxLayout()
+        layout_rules.setContentsMargins(0, 0, 0, 0)
+        layout_rules.addWidget(self.lbl_rules)
+        layout_rules.addWidget(self.input_rules, 1)
+        layout_rules.addWidget(self.btn_include)
+        layout_rules.addWidget(self.btn_exclude)
+
+        layout_buttons = QHBoxLayout()
+        layout_buttons.setContentsMargins(0, 0, 0, 0)
+        layout_buttons.addWidget(self.lbl_rules_status, 1)
+        layout_buttons.addWidget(self.btn_load_rules)
+        layout_buttons.addWidget(self.btn_save_rules)
+        layout_buttons.addWidget(self.btn_apply)
+
+        layout = QGridLayout()
+        layout.addLayout(layout_file, 0, 0, 1, 2)
+        layout.addWidget(self.tree, 1, 0, 1, 1)
+        layout.addLayout(layout_details, 1, 1, 1, 1)
+        layout.setColumnStretch(0, 1)
+        layout.addLayout(layout_rules, 2, 0, 1, 2)
+        layout.addLayout(layout_buttons, 3, 0, 1, 2)
+
+        # Set the layout to the dataset browser view
+        self.setLayout(layout)
+
+    def add_nodes(self, nodes: list[BrowserNode], parent: QTreeWidgetItem | None = None) -> None:
+        """Adds the nodes to the tree, the groups with members getting an empty child until they are expanded."""
+        for node in nodes:
+            item = QTreeWidgetItem([node.base_name, "" if node.kind == "group" else node.describe(), ""])
+            item.setData(COLUMN_NAME, Qt.UserRole, node)
+            if node.has_children:
+                item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+            if parent is None:
+                self.tree.addTopLevelItem(item)
+            else:
+                parent.addChild(item)
+
+    @staticmethod
+    def node(item: QTreeWidgetItem | None) -> BrowserNode | None:
+        """Returns the node of a tree item."""
+        return None if item is None else item.data(COLUMN_NAME, Qt.UserRole)
+
+    def mark_selected(self, rules: DatasetRules) -> int:
+        """Marks the datasets of the tree selected by the rules, and returns how many are."""
+        selected = 0
+        items = [self.tree.topLevelItem(i) for i in range(self.tree.topLevelItemCount())]
+        while items:
+            item = items.pop()
+            items.extend(item.child(i) for i in range(item.childCount()))
+            node = self.node(item)
+            matched = node is not None and node.kind == "dataset" and rules.matches(node.rule_name)
+            selected += matched
+            item.setText(COLUMN_SELECTED, "yes" if matched else "")
+        return selected
+
+    def show_preview(self, image: np.ndarray | None) -> None:
+        """Shows an 8 bit gray level image scaled to the preview, or clears it."""
+        if image is None:
+            self.lbl_preview.clear()
+            return
+        height, width = image.shape
+        # The image keeps the array alive until it is copied into the pixmap
+        qimage = QImage(image.data, width, height, image.strides[0], QImage.Format_Grayscale8)
+        pixmap = QPixmap.fromImage(qimage.copy()).scaled(PREVIEW_PIXELS, PREVIEW_PIXELS, Qt.KeepAspectRatio, Qt.FastTransformation)
+        self.lbl_preview.setPixmap(pixmap)
+
+    def ask_rules_file(self, save: bool) -> str:
+        """Asks for the file of a rule set to save or load, and returns it or an empty string."""
+        if save:
+            file_name, _ = QFileDialog.getSaveFileName(self, "Save Dataset Rules", "dataset_rules.json", RULES_FILTER)
+        else:
+            file_name, _ = QFileDialog.getOpenFileName(self, "Load Dataset Rules", "", RULES_FILTER)
+        return file_name
+
+    def clear(self) -> None:
+        """Clears the tree, the details and the preview."""
+        self.tree.clear()
+        self.lbl_info.setText("")
+        self.show_preview(None)
+        self.spin_frame.setMaximum(0)
@@ -31,6 +31,7 @@ from qtpy.QtCore import Qt
 from qtpy.QtGui import QCloseEvent
 
 from hdf5_converter.view.converter_view import ConverterView
+from hdf5_converter.view.dataset_browser_view import DatasetBrowserView
 from hdf5_converter.view.status_view import StatusView
 
 
@@ -43,10 +44,10 @@ class MainView(QMainWindow):
         # Create the widgets
         self.converter_view = ConverterView()
         self.status_view = StatusView()
+        self.browser_view = DatasetBrowserView(self)
 
         # Helper variables
         self._terminated = False
-        self._worker_finished = False
 
         # Run the configuration methods
         self._configure_view()
@@ -88,11 +89,8 @@ class MainView(QMainWindow):
 
         if _msg_question == QMessageBox.Yes:
 
+            # The running conversion is cancelled and joined once the event loop has exited
             self._terminated = True
-
-            while not self._worker_finished:
-                continue
-
             event.accept()
         else:
             event.ignore()
@@ -26,25 +26,41 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 # ----------------------------------------------------------------------------------
 
-from gsewidgets import TextInfoBox, HorizontalLine
-from qtpy.QtWidgets import QFrame, QVBoxLayout
+from gsewidgets import Label, TextInfoBox, HorizontalLine
+from qtpy.QtWidgets import QFrame, QHBoxLayout, QProgressBar, QVBoxLayout
 from qtpy.QtCore import QObject, Signal
 
+from hdf5_converter.model.profiler_model import ProfilerModel
+from hdf5_converter.model.progress_model import Progress
+
+
+# The steps of the progress bar
+PROGRESS_STEPS = 1000
+
 
 class StatusView(QFrame):
     """Creates the status view of the HDF5 Converter GUI."""
 
     update_status = Signal(str)
+    update_progress = Signal(object)
+    update_profile = Signal(object)
 
     def __init__(self) -> None:
         """Initialises the status view."""
         super(StatusView, self).__init__()
 
         self.txt_info = TextInfoBox()
+        self.progress_bar = QProgressBar()
+        self.lbl_progress = Label("")
         self._line_number = 0
 
+        # The progress bar counts in fractions of the frames, so that large conversions still move it smoothly
+        self.progress_bar.setRange(0, PROGRESS_STEPS)
+
         # Set the layout of the status view
         self.update_status.connect(self._add_status_message)
+        self.update_progress.connect(self._show_progress)
+        self.update_profile.connect(self._show_profile)
         self._layout()
 
     def _add_status_message(self, message: str) -> None:
@@ -52,10 +68,21 @@ class StatusView(QFrame):
         self._line_number += 1
         self.txt_info.append(f"{self._line_number}. {message}")
 
+    def _show_progress(self, progress: Progress) -> None:
+        """Shows the progress of the conversion in the progress bar."""
+        self.progress_bar.setValue(int(progress.fraction * PROGRESS_STEPS))
+        self.lbl_progress.setText(str(progress))
+
+    def _show_profile(self, profiler: ProfilerModel) -> None:
+        """Adds the summary of the stages of a profiled conversion to the status view."""
+        self._add_status_message(profiler.summary())
+
     def clear(self) -> None:
-        """Clears the status view."""
+        """Clears the status view and resets the progress bar."""
         self.txt_info.clear()
         self._line_number = 0
+        self.progress_bar.reset()
+        self.lbl_progress.setText("")
 
     def _layout(self) -> None:
         """Sets the layout of the status view."""
@@ -64,5 +91,11 @@ class StatusView(QFrame):
         layout.addWidget(HorizontalLine())
         layout.addWidget(self.txt_info)
 
+        layout_progress = QHBoxLayout()
+        layout_progress.setContentsMargins(0, 0, 0, 0)
+        layout_progress.addWidget(self.progress_bar)
+        layout_progress.addWidget(self.lbl_progress)
+        layout.addLayout(layout_progress)
+
         # Set the layout to the status view
         self.setLayout(layout)